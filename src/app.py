@@ -1,32 +1,52 @@
-from typing import Dict, Any
-from .config.settings import Settings
-from .models.model_factory import ModelFactory
-from .graphs.workflow import create_workflow
+import json
+from typing import Any, AsyncGenerator, Dict, Union
+from .config.settings import get_settings
+from .models.model_factory import get_model_factory
+from .graphs.workflow import Workflow, WorkflowJson
+from .graphs.compiler import CompiledWorkflow, get_compiled_workflow
+from .graphs.workflow_executor import WorkflowExecutor
 
 class AgentApp:
-    def __init__(self):
-        self.settings = Settings()
-        self.model_factory = ModelFactory()
-        self.workflow = create_workflow()
-    
+    def __init__(self, workflow: Union[Workflow, WorkflowJson, CompiledWorkflow]):
+        """
+        Args:
+            workflow: 工作流定义，构造时编译一次，之后每次运行直接复用编译结果
+        """
+        self.settings = get_settings()
+        self.model_factory = get_model_factory()
+        self.workflow = workflow if isinstance(workflow, CompiledWorkflow) else get_compiled_workflow(workflow)
+
+    @classmethod
+    def from_file(cls, path: str) -> "AgentApp":
+        """
+        从工作流JSON文件（如 template.json）创建应用
+        Args:
+            path: 文件路径
+        Returns:
+            AgentApp: 应用
+        """
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(WorkflowJson(**json.load(f)))
+
     @property
     def llm(self):
         """获取语言模型"""
         return self.model_factory.chat_model
-    
+
     @property
     def embeddings(self):
         """获取嵌入模型"""
         return self.model_factory.embedding_model
-    
-    async def run(self, input_data: dict):
-        # 确保输入数据包含所需字段
-        initial_state = {
-            "input": input_data["input"],
-            "context": input_data["context"],
-            "output": None
-        }
-        
-        # 运行工作流
-        result = self.workflow.compile().invoke(initial_state)
-        return result 
\ No newline at end of file
+
+    async def run(self, input_data: Dict[str, Any]) -> AsyncGenerator[str, None]:
+        """
+        运行工作流，返回流式结果
+        Args:
+            input_data: 开始节点的输入，如 {"question": "..."}
+        Returns:
+            AsyncGenerator[str, None]: 结束节点输出的token流
+        """
+        # 传入编译结果和共享的模型工厂，创建执行器不再哈希工作流JSON
+        executor = WorkflowExecutor(self.workflow, model_factory=self.model_factory)
+        async for chunk in executor.run(input_data):
+            yield chunk
@@ -0,0 +1,192 @@
+import asyncio
+import hashlib
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from src.models.async_support import aembed_documents, aembed_query
+
+# 一次 SQLite 查询最多带的键数（低于 SQLite 默认的变量数上限）
+DISK_LOOKUP_CHUNK = 500
+
+class CachedEmbeddings(Embeddings):
+    """
+    带缓存的 embedding 模型
+    键为 (模型名, 文本哈希)；内存层为有大小上限的LRU，可选的磁盘层为SQLite文件。
+    只有未命中的文本才会请求远端模型，并按 batch_size 分批合并请求。
+    """
+
+    def __init__(
+        self,
+        model: Embeddings,
+        model_name: str,
+        max_entries: int = 10000,
+        disk_path: Optional[str] = None,
+        batch_size: int = 64,
+    ):
+        """
+        Args:
+            model: 实际的 embedding 模型
+            model_name: 模型名，作为缓存键的一部分，换模型后旧向量不会被误用
+            max_entries: 内存层最多保存的向量数
+            disk_path: SQLite 文件路径，None 表示不启用磁盘层
+            batch_size: 未命中文本每批请求的最大条数
+        """
+        self.model = model
+        self.model_name = model_name
+        self.max_entries = max_entries
+        self.batch_size = batch_size
+        self._memory: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "misses": 0, "memory_hits": 0, "disk_hits": 0}
+        self._db: Optional[sqlite3.Connection] = None
+        if disk_path:
+            directory = os.path.dirname(disk_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._db = sqlite3.connect(disk_path, check_same_thread=False, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS embedding_cache (key TEXT PRIMARY KEY, vector BLOB NOT NULL)"
+            )
+
+    def make_key(self, text: str) -> str:
+        """生成缓存键"""
+        return hashlib.sha256(f"{self.model_name}\0{text}".encode("utf-8")).hexdigest()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """批量计算文档向量，只对未命中的文本请求模型"""
+        keys, found, pending = self._lookup_memory(texts)
+        if pending and self._db is not None:
+            self._merge_disk(found, pending, self._get_disk(list(pending)))
+        missing = self._count_misses(pending)
+        for start in range(0, len(missing), self.batch_size):
+            batch = missing[start:start + self.batch_size]
+            computed = self._store(batch, self.model.embed_documents(batch), found)
+            if self._db is not None:
+                self._set_disk(computed)
+        return [found[key].tolist() for key in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        """计算查询文本的向量"""
+        keys, found, pending = self._lookup_memory([text])
+        if pending and self._db is not None:
+            self._merge_disk(found, pending, self._get_disk(list(pending)))
+        if self._count_misses(pending):
+            computed = self._store([text], [self.model.embed_query(text)], found)
+            if self._db is not None:
+                self._set_disk(computed)
+        return found[keys[0]].tolist()
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        """异步批量计算文档向量，磁盘层访问放到线程中执行"""
+        keys, found, pending = self._lookup_memory(texts)
+        if pending and self._db is not None:
+            self._merge_disk(found, pending, await asyncio.to_thread(self._get_disk, list(pending)))
+        missing = self._count_misses(pending)
+        for start in range(0, len(missing), self.batch_size):
+            batch = missing[start:start + self.batch_size]
+            computed = self._store(batch, await aembed_documents(self.model, batch), found)
+            if self._db is not None:
+                await asyncio.to_thread(self._set_disk, computed)
+        return [found[key].tolist() for key in keys]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        """异步计算查询文本的向量"""
+        keys, found, pending = self._lookup_memory([text])
+        if pending and self._db is not None:
+            self._merge_disk(found, pending, await asyncio.to_thread(self._get_disk, list(pending)))
+        if self._count_misses(pending):
+            computed = self._store([text], [await aembed_query(self.model, text)], found)
+            if self._db is not None:
+                await asyncio.to_thread(self._set_disk, computed)
+        return found[keys[0]].tolist()
+
+    def stats(self) -> Dict[str, int]:
+        """返回命中/未命中计数和内存层条目数"""
+        with self._lock:
+            return {**self._counters, "size": len(self._memory)}
+
+    def close(self) -> None:
+        """关闭磁盘层连接"""
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    def _lookup_memory(self, texts: List[str]) -> Tuple[List[str], Dict[str, np.ndarray], Dict[str, str]]:
+        """
+        在内存层查找
+        Returns:
+            (每个文本的键, 已命中的 键->向量, 去重后未命中的 键->文本)
+        """
+        keys = [self.make_key(text) for text in texts]
+        found: Dict[str, np.ndarray] = {}
+        pending: Dict[str, str] = {}
+        with self._lock:
+            for key, text in zip(keys, texts):
+                if key in found or key in pending:
+                    continue
+                vector = self._memory.get(key)
+                if vector is None:
+                    pending[key] = text
+                    continue
+                self._memory.move_to_end(key)
+                found[key] = vector
+                self._counters["hits"] += 1
+                self._counters["memory_hits"] += 1
+        return keys, found, pending
+
+    def _merge_disk(self, found: Dict[str, np.ndarray], pending: Dict[str, str], disk_found: Dict[str, np.ndarray]) -> None:
+        """合并磁盘层命中的向量并回填内存层"""
+        found.update(disk_found)
+        with self._lock:
+            for key, vector in disk_found.items():
+                del pending[key]
+                self._set_memory(key, vector)
+            self._counters["hits"] += len(disk_found)
+            self._counters["disk_hits"] += len(disk_found)
+
+    def _count_misses(self, pending: Dict[str, str]) -> List[str]:
+        with self._lock:
+            self._counters["misses"] += len(pending)
+        return list(pending.values())
+
+    def _store(self, texts: List[str], vectors: List[List[float]], found: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+        """把新计算的向量写入内存层，返回 键->向量 供写磁盘层"""
+        computed = {self.make_key(text): np.asarray(vector, dtype=np.float32) for text, vector in zip(texts, vectors)}
+        found.update(computed)
+        with self._lock:
+            for key, vector in computed.items():
+                self._set_memory(key, vector)
+        return computed
+
+    def _set_memory(self, key: str, vector: np.ndarray) -> None:
+        # 调用方持有 self._lock
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _get_disk(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        found = {}
+        with self._lock:
+            for start in range(0, len(keys), DISK_LOOKUP_CHUNK):
+                chunk = keys[start:start + DISK_LOOKUP_CHUNK]
+                rows = self._db.execute(
+                    f"SELECT key, vector FROM embedding_cache WHERE key IN ({','.join('?' * len(chunk))})", chunk
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype=np.float32)
+        return found
+
+    def _set_disk(self, vectors: Dict[str, np.ndarray]) -> None:
+        with self._lock:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO embedding_cache (key, vector) VALUES (?, ?)",
+                [(key, vector.tobytes()) for key, vector in vectors.items()],
+            )
@@ -0,0 +1,199 @@
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple
+
+def stable_hash(value: Any) -> str:
+    """
+    计算任意JSON兼容值的稳定哈希（与字典键顺序无关）
+    Args:
+        value: 待哈希的值
+    Returns:
+        str: sha256 十六进制摘要
+    """
+    encoded = json.dumps(value, sort_keys=True, ensure_ascii=False, separators=(",", ":"), default=str)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+class NodeOutputCache:
+    """
+    节点输出缓存
+    键为 (节点ID, 节点配置哈希, 解析后输入的哈希)；内存层为有大小上限的LRU，
+    可选的磁盘层为SQLite文件，内存未命中时回查磁盘并回填内存。
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        ttl: Optional[float] = None,
+        disk_path: Optional[str] = None,
+        namespace: str = "",
+    ):
+        """
+        Args:
+            max_entries: 内存层最多保存的条目数
+            ttl: 默认过期时间（秒），None 表示永不过期
+            disk_path: SQLite 文件路径，None 表示不启用磁盘层
+            namespace: 键前缀，用于隔离不同模型或环境的缓存
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.namespace = namespace
+        self._memory: "OrderedDict[str, Tuple[Optional[float], Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {
+            "hits": 0,
+            "misses": 0,
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "evictions": 0,
+            "expirations": 0,
+        }
+        self._db: Optional[sqlite3.Connection] = None
+        if disk_path:
+            directory = os.path.dirname(disk_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._db = sqlite3.connect(disk_path, check_same_thread=False, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS node_cache ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL)"
+            )
+
+    def make_key(self, node_id: str, config_hash: str, inputs: Dict[str, Any]) -> str:
+        """
+        生成缓存键
+        Args:
+            node_id: 节点ID
+            config_hash: 节点配置哈希
+            inputs: 解析后的节点输入
+        Returns:
+            str: 缓存键
+        """
+        return f"{self.namespace}:{node_id}:{config_hash}:{stable_hash(inputs)}"
+
+    def get(self, key: str) -> Optional[Any]:
+        """
+        读取缓存（同步，磁盘层在调用线程中访问）
+        Args:
+            key: 缓存键
+        Returns:
+            缓存的值，未命中或已过期返回None
+        """
+        value = self._get_memory(key)
+        if value is not None:
+            return value
+        value = self._get_disk(key) if self._db is not None else None
+        self._record_disk_result(key, value)
+        return value
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        """
+        写入缓存（同步）
+        Args:
+            key: 缓存键
+            value: JSON兼容的值
+            ttl: 过期时间（秒），默认使用构造时的 ttl
+        """
+        expires_at = self._expires_at(ttl)
+        self._set_memory(key, value, expires_at)
+        if self._db is not None:
+            self._set_disk(key, value, expires_at)
+
+    async def aget(self, key: str) -> Optional[Any]:
+        """异步读取缓存，磁盘层访问放到线程中执行"""
+        value = self._get_memory(key)
+        if value is not None:
+            return value
+        value = await asyncio.to_thread(self._get_disk, key) if self._db is not None else None
+        self._record_disk_result(key, value)
+        return value
+
+    async def aset(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        """异步写入缓存，磁盘层访问放到线程中执行"""
+        expires_at = self._expires_at(ttl)
+        self._set_memory(key, value, expires_at)
+        if self._db is not None:
+            await asyncio.to_thread(self._set_disk, key, value, expires_at)
+
+    def clear(self) -> None:
+        """清空内存层和磁盘层"""
+        with self._lock:
+            self._memory.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM node_cache")
+
+    def stats(self) -> Dict[str, int]:
+        """返回命中/未命中等计数"""
+        with self._lock:
+            return {**self._counters, "size": len(self._memory)}
+
+    def close(self) -> None:
+        """关闭磁盘层连接"""
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    def _expires_at(self, ttl: Optional[float]) -> Optional[float]:
+        ttl = self.ttl if ttl is None else ttl
+        return time.time() + ttl if ttl is not None else None
+
+    def _get_memory(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at is not None and expires_at <= time.time():
+                del self._memory[key]
+                self._counters["expirations"] += 1
+                return None
+            self._memory.move_to_end(key)
+            self._counters["hits"] += 1
+            self._counters["memory_hits"] += 1
+            return value
+
+    def _set_memory(self, key: str, value: Any, expires_at: Optional[float]) -> None:
+        with self._lock:
+            self._memory[key] = (expires_at, value)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+                self._counters["evictions"] += 1
+
+    def _record_disk_result(self, key: str, value: Optional[Any]) -> None:
+        with self._lock:
+            if value is None:
+                self._counters["misses"] += 1
+            else:
+                self._counters["hits"] += 1
+                self._counters["disk_hits"] += 1
+
+    def _get_disk(self, key: str) -> Optional[Any]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT value, expires_at FROM node_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if row[1] is not None and row[1] <= time.time():
+                self._db.execute("DELETE FROM node_cache WHERE key = ?", (key,))
+                self._counters["expirations"] += 1
+                return None
+        value = json.loads(row[0])
+        # 回填内存层
+        self._set_memory(key, value, row[1])
+        return value
+
+    def _set_disk(self, key: str, value: Any, expires_at: Optional[float]) -> None:
+        encoded = json.dumps(value, ensure_ascii=False)
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO node_cache (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, encoded, expires_at),
+            )
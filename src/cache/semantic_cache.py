@@ -0,0 +1,187 @@
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from src.models.async_support import aembed_query
+
+# 与已有条目相似度达到该值时视为同一提示词，直接覆盖旧结果
+DUPLICATE_SIMILARITY = 0.9999
+
+# 最近计算过的提示词向量的缓存条目数，循环重试同一提示词时不再重复请求embedding
+EMBEDDING_MEMO_SIZE = 1024
+
+@dataclass
+class SemanticLookup:
+    """语义缓存查询结果"""
+    completion: Optional[str]   # 命中的缓存结果，未命中为None
+    similarity: float           # 最近邻的余弦相似度，没有条目时为 -1
+    embedding: np.ndarray       # 提示词的归一化向量，写缓存时复用
+
+class _ScopeStore:
+    """同一作用域（节点+配置）下的向量存储，行号紧凑排列"""
+
+    def __init__(self, dim: int, capacity: int = 64):
+        self.matrix = np.zeros((capacity, dim), dtype=np.float32)
+        self.completions: List[str] = []
+        self.entry_ids: List[int] = []
+
+    @property
+    def size(self) -> int:
+        return len(self.completions)
+
+    def append(self, entry_id: int, vector: np.ndarray, completion: str) -> int:
+        if self.size == self.matrix.shape[0]:
+            grown = np.zeros((self.matrix.shape[0] * 2, self.matrix.shape[1]), dtype=np.float32)
+            grown[:self.size] = self.matrix[:self.size]
+            self.matrix = grown
+        row = self.size
+        self.matrix[row] = vector
+        self.completions.append(completion)
+        self.entry_ids.append(entry_id)
+        return row
+
+    def remove(self, row: int) -> Optional[int]:
+        """删除一行（用最后一行填补），返回被移动条目的ID"""
+        last = self.size - 1
+        moved = None
+        if row != last:
+            self.matrix[row] = self.matrix[last]
+            self.completions[row] = self.completions[last]
+            self.entry_ids[row] = self.entry_ids[last]
+            moved = self.entry_ids[row]
+        self.completions.pop()
+        self.entry_ids.pop()
+        return moved
+
+class SemanticCache:
+    """
+    LLM语义缓存
+    用embedding模型把最终提示词向量化，在本地向量存储中查找相似度超过阈值的最近邻并返回其结果。
+    条目按作用域（节点ID + 节点配置哈希）隔离；总条目数超过上限时淘汰最久未使用的条目。
+    使用方式为单个事件循环内调用，不做线程同步。
+    """
+
+    def __init__(
+        self,
+        embedding_model: Embeddings,
+        max_entries: int = 10000,
+        threshold: float = 0.95,
+        default_enabled: bool = True,
+    ):
+        """
+        Args:
+            embedding_model: embedding模型
+            max_entries: 最多保存的条目数
+            threshold: 默认相似度阈值，节点可通过 llmParam 的 semanticCacheThreshold 覆盖
+            default_enabled: 节点未在 llmParam 中配置 semanticCache 时是否启用
+        """
+        self.embedding_model = embedding_model
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self.default_enabled = default_enabled
+        self._scopes: Dict[str, _ScopeStore] = {}
+        # 条目ID -> (作用域, 行号)，按最近使用排序
+        self._entries: "OrderedDict[int, Tuple[str, int]]" = OrderedDict()
+        self._next_id = 0
+        self._embedding_memo: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def is_enabled(self, node_settings: Dict[str, object]) -> bool:
+        """根据节点的 llmParam 判断是否启用语义缓存"""
+        return bool(node_settings.get("semanticCache", self.default_enabled))
+
+    def threshold_for(self, node_settings: Dict[str, object]) -> float:
+        """根据节点的 llmParam 获取相似度阈值"""
+        return float(node_settings.get("semanticCacheThreshold", self.threshold))
+
+    async def alookup(self, scope: str, prompt: str, threshold: Optional[float] = None) -> SemanticLookup:
+        """
+        查找语义相近的缓存结果
+        Args:
+            scope: 作用域
+            prompt: 最终提示词
+            threshold: 相似度阈值，默认使用构造时的阈值
+        Returns:
+            SemanticLookup: 查询结果
+        """
+        vector = await self.aembed(prompt)
+        row, similarity = self._nearest(scope, vector)
+        threshold = self.threshold if threshold is None else threshold
+        if row is None or similarity < threshold:
+            self.misses += 1
+            return SemanticLookup(None, similarity, vector)
+
+        store = self._scopes[scope]
+        self._entries.move_to_end(store.entry_ids[row])
+        self.hits += 1
+        return SemanticLookup(store.completions[row], similarity, vector)
+
+    def add(self, scope: str, embedding: np.ndarray, completion: str) -> None:
+        """
+        写入一条缓存
+        Args:
+            scope: 作用域
+            embedding: alookup 返回的归一化向量
+            completion: LLM结果
+        """
+        row, similarity = self._nearest(scope, embedding)
+        store = self._scopes.get(scope)
+        if row is not None and similarity >= DUPLICATE_SIMILARITY:
+            store.completions[row] = completion
+            self._entries.move_to_end(store.entry_ids[row])
+            return
+
+        if store is None:
+            store = self._scopes[scope] = _ScopeStore(embedding.shape[0])
+        entry_id = self._next_id
+        self._next_id += 1
+        self._entries[entry_id] = (scope, store.append(entry_id, embedding, completion))
+        while len(self._entries) > self.max_entries:
+            self._evict_oldest()
+
+    def stats(self) -> Dict[str, int]:
+        """返回命中/未命中计数和条目数"""
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._entries)}
+
+    async def aembed(self, prompt: str) -> np.ndarray:
+        """
+        计算提示词的归一化向量，最近用过的提示词直接复用
+        Args:
+            prompt: 提示词
+        Returns:
+            np.ndarray: 归一化向量
+        """
+        vector = self._embedding_memo.get(prompt)
+        if vector is not None:
+            self._embedding_memo.move_to_end(prompt)
+            return vector
+        vector = np.asarray(await aembed_query(self.embedding_model, prompt), dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        if norm > 0:
+            vector = vector / norm
+        self._embedding_memo[prompt] = vector
+        while len(self._embedding_memo) > EMBEDDING_MEMO_SIZE:
+            self._embedding_memo.popitem(last=False)
+        return vector
+
+    def _nearest(self, scope: str, vector: np.ndarray) -> Tuple[Optional[int], float]:
+        store = self._scopes.get(scope)
+        if store is None or store.size == 0:
+            return None, -1.0
+        similarities = store.matrix[:store.size] @ vector
+        row = int(np.argmax(similarities))
+        return row, float(similarities[row])
+
+    def _evict_oldest(self) -> None:
+        _, (scope, row) = self._entries.popitem(last=False)
+        store = self._scopes[scope]
+        moved = store.remove(row)
+        if moved is not None:
+            # 给已有键赋值不改变其在 OrderedDict 中的位置，被移动条目保持原有的使用顺序
+            self._entries[moved] = (scope, row)
+        if store.size == 0:
+            del self._scopes[scope]
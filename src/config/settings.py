@@ -1,3 +1,4 @@
+import functools
 from typing import Dict, Any
 from pydantic_settings import BaseSettings
 
@@ -8,14 +9,48 @@ class Settings(BaseSettings):
     CHAT_API_KEY: str
     CHAT_BASE_URL: str
     CHAT_MODEL: str
+    # LLM节点 modelType 或 modleName -> {"base_url", "api_key", "model"}，缺省字段沿用上面的默认配置
+    CHAT_MODEL_MAP: Dict[str, Dict[str, str]] = {}
     
     # Embedding模型配置
     EMBEDDING_API_KEY: str
     EMBEDDING_BASE_URL: str
     EMBEDDING_MODEL: str
+    EMBEDDING_BATCH_SIZE: int = 64                              # 未命中文本每批请求的最大条数
+    EMBEDDING_CACHE_SIZE: int = 10000                           # 向量缓存内存层条目数
+    EMBEDDING_CACHE_PATH: str = "data/cache/embeddings.sqlite"  # 向量缓存磁盘层，留空则只用内存层
+    EMBEDDING_COALESCE_MAX_BATCH: int = 64                      # 并发查询合并的最大批大小
+    EMBEDDING_COALESCE_WAIT: float = 0.005                      # 并发查询合并的时间窗口（秒）
+    
+    # 模型接口HTTP连接池配置，同一主机上的所有模型客户端共享连接
+    HTTP_MAX_CONNECTIONS_PER_HOST: int = 100     # 每个主机的最大连接数
+    HTTP_MAX_KEEPALIVE_CONNECTIONS: int = 20     # 每个主机保持的空闲长连接数
+    HTTP_KEEPALIVE_EXPIRY: float = 30.0          # 空闲长连接的保留时间（秒）
+    HTTP2: bool = False                          # 是否启用 HTTP/2（需要安装 h2）
+    
+    # 知识库配置
+    KB_INDEX_DIR: str = "data/kb"  # 本地知识库索引根目录
     
     # 其他配置项
     DEBUG: bool = False
     
     class Config:
-        env_file = ".env" 
\ No newline at end of file
+        env_file = ".env"
+
+@functools.lru_cache(maxsize=None)
+def get_settings() -> Settings:
+    """
+    获取进程级共享的配置，.env 和环境变量只在第一次调用时读取和校验
+    Returns:
+        Settings: 配置
+    """
+    return Settings()
+
+def reload_settings() -> Settings:
+    """
+    丢弃已加载的配置并重新读取（.env 或环境变量修改后调用）
+    Returns:
+        Settings: 新的配置
+    """
+    get_settings.cache_clear()
+    return get_settings()
@@ -0,0 +1,106 @@
+from typing import Dict, Any, List, NamedTuple, Optional, Tuple
+
+from .workflow import Workflow
+
+class Binding(NamedTuple):
+    """
+    编译后的输入绑定
+    字面量：block_id 为 None，literal 为已按声明类型转换好的值
+    引用：从 node_outputs[block_id][output_name] 取值
+    """
+    name: str                   # 参数名称
+    type: str                   # 声明类型
+    block_id: Optional[str]     # 引用的节点ID
+    output_name: Optional[str]  # 引用的输出名称
+    literal: Any = None         # 字面量值
+
+def _to_bool(value: Any) -> bool:
+    if isinstance(value, str):
+        return value.strip().lower() in ("true", "1", "yes")
+    return bool(value)
+
+# 声明类型 -> 字面量转换函数
+LITERAL_CONVERTERS = {
+    "string": str,
+    "integer": int,
+    "float": float,
+    "boolean": _to_bool,
+}
+
+def _declared_outputs(workflow: Workflow, node_id: str) -> List[str]:
+    node = workflow.get_node_by_id(node_id)
+    node_data = node.data if isinstance(node.data, dict) else node.data.__dict__
+    return [output["name"] for output in node_data.get("outputs") or []]
+
+def compile_binding(name: str, input_value: Dict[str, Any], workflow: Workflow, owner_id: str) -> Binding:
+    """
+    把一个输入配置编译为绑定，引用的节点或输出不存在时立即报错
+    Args:
+        name: 参数名称
+        input_value: 形如 {"type": ..., "value": {"type": "ref"|"literal", "content": ...}} 的输入配置
+        workflow: 工作流定义
+        owner_id: 该输入所属的节点ID（用于报错信息）
+    Returns:
+        Binding: 编译后的绑定
+    """
+    declared_type = input_value.get("type", "string")
+    value = input_value["value"]
+    if value["type"] == "ref":
+        block_id = value["content"]["blockID"]
+        output_name = value["content"]["name"]
+        if workflow.get_node_by_id(block_id) is None:
+            raise ValueError(f"节点 {owner_id} 的参数 {name} 引用了不存在的节点: {block_id}")
+        if output_name not in _declared_outputs(workflow, block_id):
+            raise ValueError(f"节点 {owner_id} 的参数 {name} 引用了节点 {block_id} 不存在的输出: {output_name}")
+        return Binding(name, declared_type, block_id, output_name)
+
+    converter = LITERAL_CONVERTERS.get(declared_type, lambda v: v)
+    try:
+        literal = converter(value["content"])
+    except (TypeError, ValueError):
+        raise ValueError(
+            f"节点 {owner_id} 的参数 {name} 字面量无法转换为 {declared_type}: {value['content']!r}"
+        ) from None
+    return Binding(name, declared_type, None, None, literal)
+
+def compile_parameters(params: Optional[List[Dict[str, Any]]], workflow: Workflow, owner_id: str) -> Tuple[Binding, ...]:
+    """
+    编译 inputParameters / llmParam 形式的参数列表
+    Args:
+        params: 参数列表
+        workflow: 工作流定义
+        owner_id: 参数所属的节点ID
+    Returns:
+        Tuple[Binding, ...]: 绑定元组
+    """
+    return tuple(
+        compile_binding(param["name"], param["input"], workflow, owner_id)
+        for param in params or []
+    )
+
+def compile_operand(operand: Dict[str, Any], workflow: Workflow, owner_id: str) -> Binding:
+    """
+    编译条件的左值或右值（形如 {"input": {...}}，取第一个输入）
+    Args:
+        operand: 条件操作数配置
+        workflow: 工作流定义
+        owner_id: 条件节点ID
+    Returns:
+        Binding: 编译后的绑定
+    """
+    for name, input_value in operand.items():
+        return compile_binding(name, input_value, workflow, owner_id)
+    raise ValueError(f"条件节点 {owner_id} 存在空的条件操作数")
+
+def resolve(binding: Binding, node_outputs: Dict[str, Dict[str, Any]]) -> Any:
+    """
+    在运行时解析绑定的值
+    Args:
+        binding: 绑定
+        node_outputs: 状态中的节点输出
+    Returns:
+        Any: 绑定的值
+    """
+    if binding.block_id is None:
+        return binding.literal
+    return node_outputs[binding.block_id][binding.output_name]["value"]
@@ -0,0 +1,299 @@
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, asdict, field
+from typing import Dict, Any, TypedDict, Union, Optional, Tuple, Set, Callable
+
+from src.cache.node_cache import stable_hash
+from src.kb.metadata import MetadataFilter, compile_filter
+from src.models.chat_models import LLMConfig, compile_llm_config
+from .workflow import (
+    Workflow,
+    WorkflowJson,
+    NodeType,
+    Node,
+    create_workflow_from_json,
+)
+from .scheduler import SchedulePlan, build_schedule_plan, _forward_reachable
+from .bindings import Binding, compile_parameters, compile_operand
+from .prompts import CompiledPrompt, compile_prompt
+from .conditions import (
+    CompiledCondition,
+    CompiledBranch,
+    EarlyDecision,
+    ELSE_PORT,
+    branch_port,
+    validate_ports,
+    compile_branch_predicate,
+    compile_router,
+    compile_partial_router,
+)
+
+class NodeOutput(TypedDict):
+    """节点输出定义"""
+    value: Any
+    type: str
+
+class WorkflowState(TypedDict):
+    """工作流状态定义"""
+    # 存储每个节点的输出，格式为 {node_id: {output_name: NodeOutput}}
+    node_outputs: Dict[str, Dict[str, NodeOutput]]
+    # 当前正在处理的节点ID
+    current_node: str
+    # 最终输出结果
+    final_output: str
+    # 最近一次条件节点选择的端口
+    condition_result: str
+
+SUPPORTED_NODE_TYPES = {node_type.value for node_type in NodeType}
+
+# 进程级编译缓存的最大条目数
+COMPILED_CACHE_SIZE = 256
+
+# KB 节点的元数据过滤表达式参数名（datasetParam 或 inputParameters 中）
+KB_FILTER_PARAM = "filter"
+
+@dataclass(frozen=True)
+class CompiledNode:
+    """编译后的节点：输入配置已展开为扁平的绑定元组，运行时无需再遍历嵌套字典"""
+    id: str
+    type: str
+    config_hash: str = ""                         # 节点输入配置的哈希（用于节点输出缓存）
+    inputs: Tuple[Binding, ...] = ()              # inputParameters
+    llm_params: Tuple[Binding, ...] = ()          # llmParam
+    llm_settings: Dict[str, Any] = field(default_factory=dict)  # llmParam 中的字面量配置，按名称索引
+    llm_config: Optional[LLMConfig] = None        # LLM节点的模型和生成参数
+    prompt: Optional[CompiledPrompt] = None       # LLM节点的提示词模板
+    kb_params: Tuple[Binding, ...] = ()           # datasetParam
+    kb_filter: Optional[MetadataFilter] = None    # 字面量的元数据过滤表达式，编译期已编译
+    branches: Tuple[CompiledBranch, ...] = ()     # 条件分支
+    route: Optional[Callable[[Dict[str, Any]], str]] = None  # 条件节点的路由函数，返回选中的端口
+
+    @property
+    def ref_sources(self) -> Set[str]:
+        """该节点引用的所有节点ID"""
+        bindings = list(self.inputs) + list(self.llm_params) + list(self.kb_params)
+        for branch in self.branches:
+            for condition in branch.conditions:
+                bindings += [condition.left, condition.right]
+        return {binding.block_id for binding in bindings if binding.block_id is not None}
+
+@dataclass(frozen=True)
+class CompiledWorkflow:
+    """
+    编译后的工作流（不可变，可被任意多个执行器和请求复用）
+    运行时依赖（模型、运行上下文）由执行器在每次运行时提供
+    """
+    workflow: Workflow       # 工作流定义（只读）
+    content_hash: str        # 工作流内容哈希
+    plan: SchedulePlan       # 并行调度计划
+    nodes: Dict[str, CompiledNode]  # 节点ID -> 编译后的节点
+    stream_node_id: Optional[str] = None  # 为结束节点提供输出的LLM节点（流式输出源）
+    stream_buffered: bool = False         # 流式输出源位于循环中时按尝试缓冲
+    # LLM节点ID -> 可在其流式输出过程中提前判定的条件节点
+    early_decisions: Dict[str, Tuple[EarlyDecision, ...]] = field(default_factory=dict)
+
+def workflow_content_hash(workflow: Union[Workflow, WorkflowJson]) -> str:
+    """
+    计算工作流内容的稳定哈希（与字典键顺序、对象身份无关）
+    Args:
+        workflow: 工作流或工作流JSON
+    Returns:
+        str: sha256 十六进制摘要
+    """
+    if isinstance(workflow, WorkflowJson):
+        workflow = create_workflow_from_json(workflow)
+    return stable_hash({
+        "nodes": [asdict(node) for node in workflow.nodes],
+        "edges": [asdict(edge) for edge in workflow.edges],
+        "versions": workflow.versions,
+    })
+
+def compile_node(node: Node, workflow: Workflow) -> CompiledNode:
+    """
+    编译单个节点的输入配置
+    Args:
+        node: 节点
+        workflow: 工作流定义
+    Returns:
+        CompiledNode: 编译后的节点
+    """
+    node_data = node.data if isinstance(node.data, dict) else node.data.__dict__
+    inputs_data = node_data.get("inputs") or {}
+    branches = []
+    for index, branch in enumerate(inputs_data.get("branches") or []):
+        condition_config = branch["condition"]
+        conditions = tuple(
+            CompiledCondition(
+                compile_operand(condition["left"], workflow, node.id),
+                condition["operator"],
+                compile_operand(condition["right"], workflow, node.id),
+            )
+            for condition in condition_config["conditions"]
+        )
+        logic = condition_config.get("logic")
+        branches.append(CompiledBranch(
+            conditions=conditions,
+            logic=logic,
+            port=branch_port(index),
+            predicate=compile_branch_predicate(conditions, logic, node.id),
+        ))
+
+    route = None
+    if node.type == NodeType.CONDITION.value:
+        # 出边只能使用分支端口或 false 端口，拼错的端口在编译期报错，而不是运行时该分支静默走不到
+        validate_ports(node.id, len(branches), workflow.port_successors.get(node.id, {}))
+        # 没有配置分支的条件节点直接放行
+        route = compile_router(tuple(branches)) if branches else (lambda node_outputs: "true")
+    llm_params = compile_parameters(inputs_data.get("llmParam"), workflow, node.id)
+    inputs = compile_parameters(inputs_data.get("inputParameters"), workflow, node.id)
+    kb_params = compile_parameters(inputs_data.get("datasetParam"), workflow, node.id)
+    llm_settings = {binding.name: binding.literal for binding in llm_params if binding.block_id is None}
+    llm_config = prompt = None
+    if node.type == NodeType.LLM.value:
+        llm_config = compile_llm_config(llm_settings, node.id)
+        prompt = compile_prompt(llm_params, inputs, node.id)
+    kb_filter = None
+    if node.type == NodeType.KB.value:
+        for binding in kb_params + inputs:
+            if binding.name == KB_FILTER_PARAM and binding.block_id is None:
+                try:
+                    kb_filter = compile_filter(binding.literal)
+                except ValueError as e:
+                    raise ValueError(f"知识库节点 {node.id} 的过滤表达式无效: {e}") from None
+    return CompiledNode(
+        id=node.id,
+        type=node.type,
+        config_hash=stable_hash({"type": node.type, "inputs": inputs_data}),
+        inputs=inputs,
+        llm_params=llm_params,
+        llm_settings=llm_settings,
+        llm_config=llm_config,
+        prompt=prompt,
+        kb_params=kb_params,
+        kb_filter=kb_filter,
+        branches=tuple(branches),
+        route=route,
+    )
+
+def resolve_stream_node(workflow: Workflow, end_node: CompiledNode) -> Optional[str]:
+    """
+    找到为结束节点输出提供数据的LLM节点（与结束节点取第一个引用参数的规则一致）
+    Args:
+        workflow: 工作流定义
+        end_node: 编译后的结束节点
+    Returns:
+        Optional[str]: LLM节点ID，结束节点输出不来自LLM节点时返回None
+    """
+    for binding in end_node.inputs:
+        if binding.block_id is not None:
+            if workflow.get_node_by_id(binding.block_id).type == NodeType.LLM.value:
+                return binding.block_id
+            return None
+    return None
+
+def compile_early_decisions(workflow: Workflow, nodes: Dict[str, CompiledNode]) -> Dict[str, Tuple[EarlyDecision, ...]]:
+    """
+    找出只以一个LLM节点为前驱、且条件只引用该节点输出和字面量的条件节点，
+    这类条件可以在LLM流式输出的过程中随token到达增量求值
+    Args:
+        workflow: 工作流定义
+        nodes: 编译后的节点
+    Returns:
+        Dict[str, Tuple[EarlyDecision, ...]]: LLM节点ID -> 可提前判定的条件节点
+    """
+    decisions: Dict[str, list] = {}
+    for node_id, node in nodes.items():
+        if node.type != NodeType.CONDITION.value or not node.branches:
+            continue
+        sources = set(workflow.predecessors[node_id])
+        if len(sources) != 1:
+            continue
+        source_id = sources.pop()
+        if nodes[source_id].type != NodeType.LLM.value:
+            continue
+        route = compile_partial_router(node.branches, source_id, node_id)
+        if route is None:
+            continue
+
+        ports = [branch.port for branch in node.branches] + [ELSE_PORT]
+        # 只回到该LLM节点重新生成的端口：选中后本次输出会被丢弃，可以直接停止生成；
+        # 其他引用该LLM输出的节点都必须在条件节点之后，才不会读到被截断的输出
+        descendants = _forward_reachable(workflow, node_id)
+        readers = {other for other, compiled in nodes.items() if source_id in compiled.ref_sources}
+        discard_ports = frozenset()
+        if readers - {node_id} <= descendants:
+            discard_ports = frozenset(
+                port for port in ports
+                if workflow.get_port_targets(node_id, port) and all(
+                    target == source_id and workflow.is_back_edge(node_id, target)
+                    for target in workflow.get_port_targets(node_id, port)
+                )
+            )
+        final_ports = frozenset(
+            port for port in ports if workflow.end_node_id in workflow.get_port_targets(node_id, port)
+        )
+        decisions.setdefault(source_id, []).append(EarlyDecision(node_id, route, discard_ports, final_ports))
+    return {source_id: tuple(items) for source_id, items in decisions.items()}
+
+def compile_workflow(workflow: Workflow, content_hash: str = None) -> CompiledWorkflow:
+    """
+    编译工作流（不经过缓存）
+    Args:
+        workflow: 工作流定义
+        content_hash: 已计算好的内容哈希（可选）
+    Returns:
+        CompiledWorkflow: 编译结果
+    """
+    if not workflow.validate():
+        raise ValueError("工作流缺少开始节点或结束节点")
+    for node in workflow.nodes:
+        if node.type not in SUPPORTED_NODE_TYPES:
+            raise ValueError(f"不支持的节点类型: {node.type}")
+
+    nodes = {node.id: compile_node(node, workflow) for node in workflow.nodes}
+    stream_node_id = resolve_stream_node(workflow, nodes[workflow.end_node_id])
+    ref_sources = {node_id: node.ref_sources for node_id, node in nodes.items()}
+    return CompiledWorkflow(
+        workflow=workflow,
+        content_hash=content_hash or workflow_content_hash(workflow),
+        plan=build_schedule_plan(workflow, ref_sources, max_steps=len(workflow.nodes) * 2),
+        nodes=nodes,
+        stream_node_id=stream_node_id,
+        stream_buffered=stream_node_id is not None and workflow.in_cycle(stream_node_id),
+        early_decisions=compile_early_decisions(workflow, nodes),
+    )
+
+_compiled_cache: "OrderedDict[str, CompiledWorkflow]" = OrderedDict()
+_compiled_cache_lock = threading.Lock()
+
+def get_compiled_workflow(workflow: Union[Workflow, WorkflowJson]) -> CompiledWorkflow:
+    """
+    获取编译后的工作流，相同内容的工作流在进程内只编译一次
+    Args:
+        workflow: 工作流或工作流JSON
+    Returns:
+        CompiledWorkflow: 编译结果
+    """
+    if isinstance(workflow, WorkflowJson):
+        workflow = create_workflow_from_json(workflow)
+    content_hash = workflow_content_hash(workflow)
+
+    with _compiled_cache_lock:
+        compiled = _compiled_cache.get(content_hash)
+        if compiled is not None:
+            _compiled_cache.move_to_end(content_hash)
+            return compiled
+
+    # 编译在锁外进行；并发编译同一工作流时以先写入者为准
+    compiled = compile_workflow(workflow, content_hash)
+    with _compiled_cache_lock:
+        compiled = _compiled_cache.setdefault(content_hash, compiled)
+        _compiled_cache.move_to_end(content_hash)
+        while len(_compiled_cache) > COMPILED_CACHE_SIZE:
+            _compiled_cache.popitem(last=False)
+    return compiled
+
+def clear_compiled_workflow_cache() -> None:
+    """清空进程级编译缓存"""
+    with _compiled_cache_lock:
+        _compiled_cache.clear()
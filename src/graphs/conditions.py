@@ -0,0 +1,218 @@
+from dataclasses import dataclass
+from typing import Dict, Any, Callable, Iterable, NamedTuple, Optional, Tuple
+
+from .bindings import Binding
+
+# 比较操作符
+OPERATOR_EQUAL = 1          # 等于
+OPERATOR_NOT_EQUAL = 2      # 不等于
+OPERATOR_LENGTH_GT = 3      # 长度大于
+OPERATOR_LENGTH_LT = 4      # 长度小于
+LENGTH_OPERATORS = (OPERATOR_LENGTH_GT, OPERATOR_LENGTH_LT)
+
+# 分支内多个条件的逻辑关系
+LOGIC_OR = 1
+LOGIC_AND = 2
+
+# 所有分支都不成立时走的端口
+ELSE_PORT = "false"
+
+Predicate = Callable[[Dict[str, Any]], bool]
+
+class CompiledCondition(NamedTuple):
+    """编译后的单个比较条件"""
+    left: Binding      # 左值绑定
+    operator: int      # 操作符
+    right: Binding     # 右值绑定
+
+@dataclass(frozen=True)
+class CompiledBranch:
+    """编译后的条件分支"""
+    conditions: Tuple[CompiledCondition, ...]  # 条件列表
+    logic: int                                 # 逻辑操作符
+    port: str                                  # 分支成立时走的端口
+    predicate: Predicate                       # 分支谓词，参数为 node_outputs
+
+def branch_port(index: int) -> str:
+    """第 index 个分支对应的端口：第一个为 true，之后为 true_1、true_2 ..."""
+    return "true" if index == 0 else f"true_{index}"
+
+def validate_ports(owner_id: str, branch_count: int, ports: Iterable[str]) -> None:
+    """
+    检查条件节点出边使用的端口：只能是各分支的 true / true_N 端口或 ELSE_PORT
+    Args:
+        owner_id: 条件节点ID
+        branch_count: 分支数（没有配置分支的节点按一个 true 分支处理）
+        ports: 出边的源端口ID
+    """
+    valid = {branch_port(index) for index in range(max(branch_count, 1))} | {ELSE_PORT}
+    unknown = sorted(set(ports) - valid)
+    if unknown:
+        raise ValueError(f"条件节点 {owner_id} 的出边使用了不存在的端口: {', '.join(unknown)}（可用端口: {', '.join(sorted(valid))}）")
+
+def _operand_getter(binding: Binding) -> Callable[[Dict[str, Any]], Any]:
+    if binding.block_id is None:
+        literal = binding.literal
+        return lambda node_outputs: literal
+    block_id, output_name = binding.block_id, binding.output_name
+    return lambda node_outputs: node_outputs[block_id][output_name]["value"]
+
+def compile_condition(condition: CompiledCondition, owner_id: str) -> Predicate:
+    """
+    把单个条件编译为谓词，字面量操作数在编译期完成类型转换
+    Args:
+        condition: 条件
+        owner_id: 条件节点ID（用于报错信息）
+    Returns:
+        Predicate: 谓词
+    """
+    left = _operand_getter(condition.left)
+    operator = condition.operator
+
+    if operator in LENGTH_OPERATORS:
+        if condition.right.block_id is None:
+            try:
+                threshold = int(condition.right.literal)
+            except (TypeError, ValueError):
+                raise ValueError(
+                    f"条件节点 {owner_id} 的长度比较右值不是整数: {condition.right.literal!r}"
+                ) from None
+            if operator == OPERATOR_LENGTH_GT:
+                return lambda node_outputs: len(left(node_outputs)) > threshold
+            return lambda node_outputs: len(left(node_outputs)) < threshold
+
+        right = _operand_getter(condition.right)
+        if operator == OPERATOR_LENGTH_GT:
+            return lambda node_outputs: len(left(node_outputs)) > int(right(node_outputs))
+        return lambda node_outputs: len(left(node_outputs)) < int(right(node_outputs))
+
+    right = _operand_getter(condition.right)
+    if operator == OPERATOR_EQUAL:
+        return lambda node_outputs: left(node_outputs) == right(node_outputs)
+    if operator == OPERATOR_NOT_EQUAL:
+        return lambda node_outputs: left(node_outputs) != right(node_outputs)
+    raise ValueError(f"条件节点 {owner_id} 使用了不支持的操作符: {operator}")
+
+def compile_branch_predicate(conditions: Tuple[CompiledCondition, ...], logic: int, owner_id: str) -> Predicate:
+    """
+    把分支内的条件按逻辑关系组合为一个短路求值的谓词
+    Args:
+        conditions: 条件列表
+        logic: 逻辑操作符（1 或，2 且）
+        owner_id: 条件节点ID
+    Returns:
+        Predicate: 分支谓词
+    """
+    predicates = tuple(compile_condition(condition, owner_id) for condition in conditions)
+    if len(predicates) == 1:
+        return predicates[0]
+    # all/any 遇到第一个决定结果的条件就停止求值
+    if logic == LOGIC_AND:
+        return lambda node_outputs: all(predicate(node_outputs) for predicate in predicates)
+    return lambda node_outputs: any(predicate(node_outputs) for predicate in predicates)
+
+def compile_router(branches: Tuple[CompiledBranch, ...]) -> Callable[[Dict[str, Any]], str]:
+    """
+    生成条件节点的路由函数：按顺序返回第一个成立分支的端口，都不成立时返回 false
+    Args:
+        branches: 编译后的分支
+    Returns:
+        Callable: 参数为 node_outputs，返回端口ID
+    """
+    routes = tuple((branch.predicate, branch.port) for branch in branches)
+
+    def route(node_outputs: Dict[str, Any]) -> str:
+        for predicate, port in routes:
+            if predicate(node_outputs):
+                return port
+        return ELSE_PORT
+    return route
+
+# 流式部分结果上的三值谓词：True/False 表示结果已确定，None 表示还要看后续的token
+PartialPredicate = Callable[[str], Optional[bool]]
+
+class EarlyDecision(NamedTuple):
+    """条件节点可以在其唯一输入的LLM节点流式输出过程中提前判定"""
+    condition_id: str                               # 条件节点ID
+    route: Callable[[str], Optional[str]]           # 参数为已生成的文本，结果确定时返回端口
+    discard_ports: frozenset                        # 选中后LLM输出会被丢弃（回到该LLM节点重试）的端口
+    final_ports: frozenset                          # 直接连到结束节点的端口
+
+def _constant(value: bool) -> PartialPredicate:
+    return lambda text: value
+
+def compile_partial_condition(condition: CompiledCondition, source_id: str, owner_id: str) -> Optional[PartialPredicate]:
+    """
+    把单个条件编译为流式部分结果上的三值谓词，只对随token增加结果单调确定的比较提前给出结果：
+    长度大于（超过阈值后恒真）、长度小于（达到阈值后恒假）、与字面量相等/不等（不再是其前缀后确定）
+    Args:
+        condition: 条件
+        source_id: 流式输出的LLM节点ID，操作数只能引用它的 output 或字面量
+        owner_id: 条件节点ID
+    Returns:
+        Optional[PartialPredicate]: 谓词，条件引用了其他节点时返回None
+    """
+    operands = (condition.left, condition.right)
+    for binding in operands:
+        if binding.block_id is not None and (binding.block_id != source_id or binding.output_name != "output"):
+            return None
+    streamed = [binding.block_id is not None for binding in operands]
+    if not any(streamed):
+        try:
+            return _constant(compile_condition(condition, owner_id)({}))
+        except (TypeError, ValueError):
+            return None
+    if all(streamed):
+        return lambda text: None
+
+    operator = condition.operator
+    if operator in LENGTH_OPERATORS:
+        if streamed[1]:
+            # 右值是流式文本：要等生成结束才能转成整数
+            return lambda text: None
+        threshold = int(condition.right.literal)
+        if operator == OPERATOR_LENGTH_GT:
+            return lambda text: True if len(text) > threshold else None
+        return lambda text: False if len(text) >= threshold else None
+
+    literal = condition.right.literal if streamed[0] else condition.left.literal
+    equal = operator == OPERATOR_EQUAL
+    if not isinstance(literal, str):
+        # LLM输出是字符串，与非字符串字面量永远不相等
+        return _constant(not equal)
+    return lambda text: (not equal) if not literal.startswith(text) else None
+
+def compile_partial_router(branches: Tuple[CompiledBranch, ...], source_id: str, owner_id: str) -> Optional[Callable[[str], Optional[str]]]:
+    """
+    生成条件节点在流式部分结果上的路由函数：按分支顺序三值求值，
+    前面的分支都已确定不成立、且当前分支确定成立时返回其端口，所有分支都确定不成立时返回 false
+    Args:
+        branches: 编译后的分支
+        source_id: 流式输出的LLM节点ID
+        owner_id: 条件节点ID
+    Returns:
+        Optional[Callable]: 参数为已生成的文本，结果未确定时返回None；条件引用了其他节点时返回None
+    """
+    routes = []
+    for branch in branches:
+        predicates = []
+        for condition in branch.conditions:
+            predicate = compile_partial_condition(condition, source_id, owner_id)
+            if predicate is None:
+                return None
+            predicates.append(predicate)
+        routes.append((tuple(predicates), branch.logic == LOGIC_AND or len(predicates) == 1, branch.port))
+
+    def route(text: str) -> Optional[str]:
+        for predicates, conjunction, port in routes:
+            results = [predicate(text) for predicate in predicates]
+            if conjunction:
+                value = False if False in results else (True if all(results) else None)
+            else:
+                value = True if True in results else (False if all(r is False for r in results) else None)
+            if value is None:
+                return None
+            if value:
+                return port
+        return ELSE_PORT
+    return route
@@ -0,0 +1,125 @@
+import json
+import re
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
+
+from .bindings import Binding, resolve
+
+# 提示词中的变量占位符，变量名为LLM节点 inputParameters 中的参数名
+VARIABLE_PATTERN = re.compile(r"\{\{\s*([^{}\s]+)\s*\}\}")
+
+# 模板片段：静态文本或绑定
+Segment = Union[str, Binding]
+
+def to_text(value: Any) -> str:
+    """把节点输出转换为可拼进提示词的文本，字典和列表序列化为JSON"""
+    if isinstance(value, str):
+        return value
+    if value is None:
+        return ""
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False)
+    return str(value)
+
+def compile_template(template: str, inputs: Tuple[Binding, ...], owner_id: str) -> Tuple[Segment, ...]:
+    """
+    把 {{变量}} 模板解析为片段元组，变量在编译期替换为对应输入参数的绑定，字面量输入直接并入静态文本
+    Args:
+        template: 模板文本
+        inputs: 节点的输入绑定
+        owner_id: LLM节点ID（用于报错信息）
+    Returns:
+        Tuple[Segment, ...]: 片段元组，相邻的静态文本已合并
+    """
+    by_name = {binding.name: binding for binding in inputs}
+    segments: List[Segment] = []
+    position = 0
+    for match in VARIABLE_PATTERN.finditer(template):
+        segments.append(template[position:match.start()])
+        name = match.group(1)
+        binding = by_name.get(name)
+        if binding is None:
+            raise ValueError(f"LLM节点 {owner_id} 的提示词引用了不存在的输入参数: {name}")
+        segments.append(to_text(binding.literal) if binding.block_id is None else binding)
+        position = match.end()
+    segments.append(template[position:])
+
+    merged: List[Segment] = []
+    for segment in segments:
+        if isinstance(segment, str):
+            if not segment:
+                continue
+            if merged and isinstance(merged[-1], str):
+                merged[-1] += segment
+                continue
+        merged.append(segment)
+    return tuple(merged)
+
+def render_segments(segments: Tuple[Segment, ...], node_outputs: Dict[str, Any]) -> str:
+    """
+    渲染片段元组
+    Args:
+        segments: 片段元组
+        node_outputs: 状态中的节点输出
+    Returns:
+        str: 渲染结果
+    """
+    return "".join([
+        segment if segment.__class__ is str else to_text(resolve(segment, node_outputs))
+        for segment in segments
+    ])
+
+@dataclass(frozen=True)
+class CompiledPrompt:
+    """编译后的LLM节点提示词"""
+    user: Tuple[Segment, ...]                      # 用户提示词片段
+    system: Tuple[Segment, ...] = ()               # 系统提示词片段
+    system_message: Optional[SystemMessage] = None # 不含变量的系统提示词，编译期已构建好消息
+
+    def render(self, node_outputs: Dict[str, Any]) -> Tuple[List[BaseMessage], str]:
+        """
+        渲染为消息列表
+        Args:
+            node_outputs: 状态中的节点输出
+        Returns:
+            Tuple[List[BaseMessage], str]: 消息列表，以及用作缓存键的提示词文本（系统提示词含变量时包含渲染后的系统提示词）
+        """
+        user = render_segments(self.user, node_outputs)
+        if self.system_message is not None:
+            return [self.system_message, HumanMessage(user)], user
+        if not self.system:
+            return [HumanMessage(user)], user
+        system = render_segments(self.system, node_outputs)
+        return [SystemMessage(system), HumanMessage(user)], f"{system}\n\n{user}"
+
+def compile_prompt(llm_params: Tuple[Binding, ...], inputs: Tuple[Binding, ...], owner_id: str) -> CompiledPrompt:
+    """
+    编译LLM节点的 prompt / systemPrompt；未配置 prompt 时按顺序拼接所有输入参数
+    Args:
+        llm_params: 节点的 llmParam 绑定
+        inputs: 节点的 inputParameters 绑定
+        owner_id: LLM节点ID
+    Returns:
+        CompiledPrompt: 编译后的提示词
+    """
+    params = {binding.name: binding for binding in llm_params}
+
+    def compile_param(name: str) -> Tuple[Segment, ...]:
+        binding = params.get(name)
+        if binding is None:
+            return ()
+        if binding.block_id is not None:
+            # 引用上游输出的提示词在运行时才知道内容，整体作为一个片段
+            return (binding,)
+        return compile_template(to_text(binding.literal), inputs, owner_id)
+
+    user = compile_param("prompt")
+    if not user:
+        user = tuple(to_text(binding.literal) if binding.block_id is None else binding for binding in inputs)
+    system = compile_param("systemPrompt")
+    system_message = None
+    if system and all(isinstance(segment, str) for segment in system):
+        system_message = SystemMessage("".join(system))
+    return CompiledPrompt(user=user, system=system, system_message=system_message)
@@ -0,0 +1,72 @@
+import asyncio
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Set
+
+from src.models.batching import ChatBatcher
+
+_STREAM_END = object()
+
+class TokenStream:
+    """
+    单次运行的token流
+    只转发给结束节点提供输出的那个LLM节点产生的token。
+    源节点位于循环中时，每次尝试的token先缓冲，尝试被提交（确定会成为最终输出）后才下发，
+    避免把会被重试丢弃的内容推给调用方。
+    """
+
+    def __init__(self, node_id: Optional[str], buffered: bool = False):
+        self.node_id = node_id          # 流式输出的源节点ID
+        self.buffered = buffered        # 是否按尝试缓冲
+        self.emitted = False            # 是否已经向调用方下发过内容
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._pending: List[str] = []
+        self._committed = not buffered
+
+    def begin_attempt(self, node_id: str) -> None:
+        """源节点开始新一次生成，丢弃上一次未提交的缓冲"""
+        if node_id != self.node_id:
+            return
+        self._pending = []
+        self._committed = not self.buffered
+
+    def push(self, node_id: str, token: str) -> None:
+        """写入一个token"""
+        if node_id != self.node_id or not token:
+            return
+        if self._committed:
+            self._emit(token)
+        else:
+            self._pending.append(token)
+
+    def commit(self) -> None:
+        """提交当前尝试：下发缓冲内容，之后的token直接下发"""
+        if self._committed:
+            return
+        self._committed = True
+        if self._pending:
+            self._emit("".join(self._pending))
+            self._pending = []
+
+    def close(self) -> None:
+        """结束token流"""
+        self._queue.put_nowait(_STREAM_END)
+
+    def _emit(self, token: str) -> None:
+        self.emitted = True
+        self._queue.put_nowait(token)
+
+    async def __aiter__(self) -> AsyncIterator[str]:
+        while True:
+            token = await self._queue.get()
+            if token is _STREAM_END:
+                return
+            yield token
+
+@dataclass
+class RunContext:
+    """单次工作流运行的上下文，随每次运行创建，节点处理函数共享"""
+    stream: Optional[TokenStream] = None       # token流（不需要流式输出时为None）
+    llm_batcher: Optional[ChatBatcher] = None  # 批量运行时跨实例合并LLM调用
+    attempts: Dict[str, int] = field(default_factory=dict)  # 节点ID -> 本次运行中已执行的次数
+    decide: Optional[Callable[[str, Dict[str, Any]], None]] = None  # 提前提交条件节点结果（由调度器提供）
+    truncated: Set[str] = field(default_factory=set)  # 本次输出因结果会被丢弃而提前停止生成的LLM节点
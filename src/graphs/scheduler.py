@@ -0,0 +1,260 @@
+import asyncio
+from dataclasses import dataclass
+from typing import Dict, Any, List, Optional, Tuple, Set, Callable, Awaitable
+
+from .workflow import Workflow, NodeType
+
+@dataclass(frozen=True)
+class OutEdge:
+    """调度用的出边"""
+    target: str      # 目标节点ID
+    port: str        # 源端口ID，普通边为空字符串
+    is_back: bool    # 是否为循环回边
+    is_exit: bool    # 是否为离开循环的边（源在循环内，目标不在同一循环）
+
+@dataclass(frozen=True)
+class SchedulePlan:
+    """
+    编译期生成的调度计划（不可变）
+    去掉回边后的图是有向无环图；节点在所有前向入边都到达信号、且引用的数据都就绪后启动
+    """
+    start_node_id: str
+    end_node_id: str
+    node_types: Dict[str, str]                     # 节点ID -> 节点类型
+    out_edges: Dict[str, Tuple[OutEdge, ...]]      # 节点ID -> 出边
+    latched_edges: Dict[str, frozenset]            # 节点ID -> 来自循环外的入边 (源节点ID, 端口)，到达一次后一直有效
+    wave_in_degree: Dict[str, int]                 # 节点ID -> 同一循环内的前向入边数，每轮执行都要重新到达
+    data_deps: Dict[str, frozenset]                # 节点ID -> 需要等待其输出的被引用节点
+    data_dependents: Dict[str, frozenset]          # 节点ID -> 引用其输出并等待它的节点
+    max_steps: int                                 # 单次运行最多执行的节点次数
+
+def _forward_reachable(workflow: Workflow, root: str) -> Set[str]:
+    """沿前向边（不含回边）从root出发可达的节点"""
+    seen = {root}
+    stack = [root]
+    while stack:
+        node_id = stack.pop()
+        for target in workflow.successors[node_id]:
+            if target not in seen and not workflow.is_back_edge(node_id, target):
+                seen.add(target)
+                stack.append(target)
+    return seen
+
+def build_schedule_plan(workflow: Workflow, ref_sources: Dict[str, Set[str]], max_steps: int) -> SchedulePlan:
+    """
+    根据工作流的边和输入引用生成调度计划
+    Args:
+        workflow: 工作流定义
+        ref_sources: 节点ID -> 其输入绑定引用的节点ID
+        max_steps: 单次运行最多执行的节点次数
+    Returns:
+        SchedulePlan: 调度计划
+    """
+    def same_cycle(a: str, b: str) -> bool:
+        group = workflow.cycle_group_of.get(a)
+        return group is not None and group == workflow.cycle_group_of.get(b)
+
+    out_edges: Dict[str, List[OutEdge]] = {node.id: [] for node in workflow.nodes}
+    latched: Dict[str, Set[Tuple[str, str]]] = {node.id: set() for node in workflow.nodes}
+    wave_in_degree = {node.id: 0 for node in workflow.nodes}
+    for edge in workflow.edges:
+        source, target = edge.sourceNodeID, edge.targetNodeID
+        if source not in out_edges or target not in out_edges:
+            continue
+        is_back = workflow.is_back_edge(source, target)
+        is_exit = source in workflow.cycle_group_of and not same_cycle(source, target)
+        out_edges[source].append(OutEdge(target, edge.sourcePortID, is_back, is_exit))
+        if is_back:
+            continue
+        if same_cycle(source, target):
+            wave_in_degree[target] += 1
+        else:
+            latched[target].add((source, edge.sourcePortID))
+
+    reachable = _forward_reachable(workflow, workflow.start_node_id)
+    data_deps: Dict[str, frozenset] = {}
+    dependents: Dict[str, Set[str]] = {node.id: set() for node in workflow.nodes}
+    for node in workflow.nodes:
+        descendants = _forward_reachable(workflow, node.id)
+        # 只等待不会反过来依赖本节点的被引用节点，避免死锁
+        deps = {
+            source for source in ref_sources.get(node.id, ())
+            if source in reachable and source not in descendants
+        }
+        data_deps[node.id] = frozenset(deps)
+        for source in deps:
+            dependents[source].add(node.id)
+
+    return SchedulePlan(
+        start_node_id=workflow.start_node_id,
+        end_node_id=workflow.end_node_id,
+        node_types={node.id: node.type for node in workflow.nodes},
+        out_edges={node_id: tuple(edges) for node_id, edges in out_edges.items()},
+        latched_edges={node_id: frozenset(edges) for node_id, edges in latched.items()},
+        wave_in_degree=wave_in_degree,
+        data_deps=data_deps,
+        data_dependents={node_id: frozenset(nodes) for node_id, nodes in dependents.items()},
+        max_steps=max_steps,
+    )
+
+NodeRunner = Callable[[str, Dict[str, Any]], Awaitable[Dict[str, Any]]]
+
+class WorkflowScheduler:
+    """
+    单次运行的并行调度器
+    所有输入就绪的节点同时启动；条件节点未选中的分支做死路径消除，汇合节点等待全部前驱到达
+    """
+
+    def __init__(self, plan: SchedulePlan, run_node: NodeRunner):
+        self.plan = plan
+        self.run_node = run_node
+        # 当前一轮已到达的循环内入边信号：节点ID -> [已到达数, 是否有激活信号]
+        self._arrivals: Dict[str, List] = {}
+        # 已到达的循环外入边：节点ID -> {(源节点ID, 端口): 是否激活}
+        self._latched: Dict[str, Dict[Tuple[str, str], bool]] = {}
+        # 收到尚未消费的循环外激活信号的节点
+        self._fresh: Set[str] = set()
+        # 已执行过或已被判定不会执行的节点
+        self._resolved: Set[str] = set()
+        # 控制流已就绪、等待引用数据的节点
+        self._waiting_data: Set[str] = set()
+        self._running: Dict[asyncio.Task, str] = {}
+        self._deferred: Set[str] = set()
+        # 已提前判定结果、控制流到达时不再执行的条件节点
+        self._decided: Set[str] = set()
+        self._state: Dict[str, Any] = {}
+        self._steps = 0
+        # 运行循环等待期间有新任务启动（条件节点提前判定）时唤醒它，把新任务纳入等待
+        self._wakeup: Optional[asyncio.Future] = None
+
+    async def run(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        执行工作流直到结束节点完成
+        Args:
+            state: 初始状态，node_outputs 在所有节点间共享
+        Returns:
+            Dict[str, Any]: 结束节点返回的状态
+        """
+        self._state = state
+        self._launch(self.plan.start_node_id)
+        try:
+            loop = asyncio.get_running_loop()
+            while self._running:
+                self._wakeup = loop.create_future()
+                done, _ = await asyncio.wait([*self._running, self._wakeup], return_when=asyncio.FIRST_COMPLETED)
+                self._wakeup.cancel()
+                self._wakeup = None
+                for task in done:
+                    if task not in self._running:
+                        continue
+                    node_id = self._running.pop(task)
+                    result = task.result()
+                    if node_id == self.plan.end_node_id:
+                        return result
+                    self._complete(node_id, result)
+                    if node_id in self._deferred:
+                        self._deferred.discard(node_id)
+                        self._launch(node_id)
+        finally:
+            await self._cancel_running()
+        raise RuntimeError("工作流未到达结束节点")
+
+    def decide(self, node_id: str, result: Dict[str, Any]) -> None:
+        """
+        条件节点在其唯一的前驱节点运行期间已确定结果：立即按选中的端口向下游传播，
+        不依赖前驱输出的下游节点可以提前启动，引用前驱输出的节点仍等本次输出完成；
+        之后控制流到达该条件节点时直接跳过
+        Args:
+            node_id: 条件节点ID
+            result: 条件节点的结果，包含 condition_result
+        """
+        self._decided.add(node_id)
+        self._complete(node_id, result)
+
+    def _launch(self, node_id: str) -> None:
+        if node_id in self._decided:
+            self._decided.discard(node_id)
+            return
+        if node_id in self._running.values():
+            # 循环中节点在上一次执行结束前再次被触发，结束后补跑
+            self._deferred.add(node_id)
+            return
+        self._steps += 1
+        if self._steps > self.plan.max_steps:
+            raise RuntimeError(f"超过最大执行步数 {self.plan.max_steps}，工作流可能陷入死循环")
+        # 循环中重新执行的节点：上一轮的输出作废，引用它的节点要等本轮执行完成
+        self._resolved.discard(node_id)
+        # 每个节点拿到独立的状态视图，node_outputs 共享
+        view = {**self._state, "current_node": node_id}
+        task = asyncio.ensure_future(self.run_node(node_id, view))
+        self._running[task] = node_id
+        if self._wakeup is not None and not self._wakeup.done():
+            self._wakeup.set_result(None)
+
+    def _complete(self, node_id: str, result: Dict[str, Any]) -> None:
+        port = None
+        if self.plan.node_types[node_id] == NodeType.CONDITION.value:
+            port = result.get("condition_result", "false")
+        self._resolve(node_id)
+        for edge in self.plan.out_edges[node_id]:
+            active = not edge.port or edge.port == port
+            if edge.is_back:
+                if active:
+                    self._launch(edge.target)
+            elif active or not edge.is_exit:
+                # 离开循环的边在未被选中时不传播死路径，循环之后的迭代仍可能选中它
+                self._signal(node_id, edge, active)
+
+    def _skip(self, node_id: str) -> None:
+        """节点不会执行：向下游传播未激活信号"""
+        self._resolve(node_id)
+        for edge in self.plan.out_edges[node_id]:
+            if not edge.is_back:
+                self._signal(node_id, edge, False)
+
+    def _signal(self, source: str, edge: OutEdge, active: bool) -> None:
+        target = edge.target
+        key = (source, edge.port)
+        if key in self.plan.latched_edges[target]:
+            latched = self._latched.setdefault(target, {})
+            latched[key] = latched.get(key, False) or active
+            if active:
+                self._fresh.add(target)
+        else:
+            arrivals = self._arrivals.setdefault(target, [0, False])
+            arrivals[0] += 1
+            arrivals[1] = arrivals[1] or active
+
+        arrivals = self._arrivals.get(target, [0, False])
+        if (len(self._latched.get(target, ())) < len(self.plan.latched_edges[target])
+                or arrivals[0] < self.plan.wave_in_degree[target]):
+            return
+        # 本轮全部入边已到达：有任一激活信号则执行，否则整条路径不会执行
+        self._arrivals.pop(target, None)
+        fresh = target in self._fresh
+        self._fresh.discard(target)
+        if arrivals[1] or fresh:
+            self._on_control_ready(target)
+        else:
+            self._skip(target)
+
+    def _on_control_ready(self, node_id: str) -> None:
+        if self.plan.data_deps[node_id] <= self._resolved:
+            self._launch(node_id)
+        else:
+            self._waiting_data.add(node_id)
+
+    def _resolve(self, node_id: str) -> None:
+        self._resolved.add(node_id)
+        for dependent in self.plan.data_dependents[node_id]:
+            if dependent in self._waiting_data and self.plan.data_deps[dependent] <= self._resolved:
+                self._waiting_data.discard(dependent)
+                self._launch(dependent)
+
+    async def _cancel_running(self) -> None:
+        tasks = list(self._running)
+        self._running.clear()
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
@@ -1,5 +1,5 @@
-from dataclasses import dataclass
-from typing import List, Dict, Any, Optional, Union, Literal
+from dataclasses import dataclass, field
+from typing import List, Dict, Any, Optional, Union, Literal, Set, Tuple
 from enum import Enum
 
 class NodeType(Enum):
@@ -92,6 +92,7 @@ class NodeInputs:
     inputParameters: Optional[List[InputParameter]] = None  # 输入参数列表
     branches: Optional[List[Branch]] = None                # 分支列表
     llmParam: Optional[List[InputParameter]] = None        # LLM参数列表
+    datasetParam: Optional[List[InputParameter]] = None    # 知识库检索参数列表（datasetList/topK/minScore）
     terminatePlan: Optional[str] = None                    # 终止计划
     settingOnError: Optional[Dict[str, str]] = None        # 错误处理配置
 
@@ -143,6 +144,147 @@ class Workflow:
     edges: List[Edge]      # 边列表
     versions: Dict[str, str]  # 版本信息
 
+    # 以下索引在构造时一次性建立，供执行器在每一步中 O(1) 查询
+    node_index: Dict[str, Node] = field(init=False, repr=False, compare=False)
+    successors: Dict[str, List[str]] = field(init=False, repr=False, compare=False)
+    predecessors: Dict[str, List[str]] = field(init=False, repr=False, compare=False)
+    port_successors: Dict[str, Dict[str, List[str]]] = field(init=False, repr=False, compare=False)
+    topological_order: List[str] = field(init=False, repr=False, compare=False)
+    cycle_groups: List[List[str]] = field(init=False, repr=False, compare=False)
+    cycle_group_of: Dict[str, int] = field(init=False, repr=False, compare=False)
+    back_edges: Set[Tuple[str, str]] = field(init=False, repr=False, compare=False)
+    start_node_id: Optional[str] = field(init=False, repr=False, compare=False)
+    end_node_id: Optional[str] = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        self.build_index()
+
+    def build_index(self) -> None:
+        """
+        建立节点索引、正反向邻接表、按端口划分的后继表以及拓扑序
+        nodes/edges 被修改后需要重新调用
+        """
+        self.node_index = {node.id: node for node in self.nodes}
+        self.successors = {node.id: [] for node in self.nodes}
+        self.predecessors = {node.id: [] for node in self.nodes}
+        self.port_successors = {}
+        self.start_node_id = next(
+            (node.id for node in self.nodes if node.type == NodeType.START.value), None
+        )
+        self.end_node_id = next(
+            (node.id for node in self.nodes if node.type == NodeType.END.value), None
+        )
+
+        for edge in self.edges:
+            source, target = edge.sourceNodeID, edge.targetNodeID
+            if source not in self.node_index or target not in self.node_index:
+                continue
+            self.successors[source].append(target)
+            self.predecessors[target].append(source)
+            if edge.sourcePortID:
+                ports = self.port_successors.setdefault(source, {})
+                ports.setdefault(edge.sourcePortID, []).append(target)
+
+        self._build_topological_order()
+        self._classify_back_edges()
+
+    def _build_topological_order(self) -> None:
+        """
+        使用 Tarjan 算法计算强连通分量，并按缩点后的拓扑序排列节点
+        含环（循环）的分量记录在 cycle_groups 中
+        """
+        index_of: Dict[str, int] = {}
+        lowlink: Dict[str, int] = {}
+        on_stack = set()
+        stack: List[str] = []
+        components: List[List[str]] = []
+        counter = 0
+
+        for root in self.node_index:
+            if root in index_of:
+                continue
+            # 迭代实现，避免大图触发递归深度限制
+            work = [(root, 0)]
+            while work:
+                node_id, child_pos = work.pop()
+                if child_pos == 0:
+                    index_of[node_id] = lowlink[node_id] = counter
+                    counter += 1
+                    stack.append(node_id)
+                    on_stack.add(node_id)
+                children = self.successors[node_id]
+                if child_pos < len(children):
+                    work.append((node_id, child_pos + 1))
+                    child = children[child_pos]
+                    if child not in index_of:
+                        work.append((child, 0))
+                    elif child in on_stack:
+                        lowlink[node_id] = min(lowlink[node_id], index_of[child])
+                    continue
+                if lowlink[node_id] == index_of[node_id]:
+                    component = []
+                    while True:
+                        member = stack.pop()
+                        on_stack.discard(member)
+                        component.append(member)
+                        if member == node_id:
+                            break
+                    components.append(component)
+                if work:
+                    parent = work[-1][0]
+                    lowlink[parent] = min(lowlink[parent], lowlink[node_id])
+
+        # Tarjan 按逆拓扑序产出分量
+        components.reverse()
+        declaration_order = {node.id: i for i, node in enumerate(self.nodes)}
+        self.topological_order = []
+        self.cycle_groups = []
+        self.cycle_group_of = {}
+        for component in components:
+            # 分量内保持节点声明顺序，保证结果稳定
+            component.sort(key=declaration_order.__getitem__)
+            self.topological_order.extend(component)
+            is_cycle = len(component) > 1 or component[0] in self.successors[component[0]]
+            if is_cycle:
+                group_id = len(self.cycle_groups)
+                self.cycle_groups.append(component)
+                for member in component:
+                    self.cycle_group_of[member] = group_id
+
+    def _classify_back_edges(self) -> None:
+        """
+        从开始节点做深度优先遍历，指向遍历栈上节点的边记为回边（循环的回跳边）
+        去掉回边后剩余的图是有向无环图
+        """
+        self.back_edges = set()
+        visited = set()
+        roots = [self.start_node_id] if self.start_node_id else []
+        roots += [node.id for node in self.nodes]
+        for root in roots:
+            if root in visited:
+                continue
+            visited.add(root)
+            path = {root}
+            work = [(root, 0)]
+            while work:
+                node_id, child_pos = work.pop()
+                children = self.successors[node_id]
+                if child_pos == len(children):
+                    path.discard(node_id)
+                    continue
+                work.append((node_id, child_pos + 1))
+                child = children[child_pos]
+                if child in path:
+                    self.back_edges.add((node_id, child))
+                elif child not in visited:
+                    visited.add(child)
+                    path.add(child)
+                    work.append((child, 0))
+
+    def is_back_edge(self, source_id: str, target_id: str) -> bool:
+        """判断边是否为循环的回边"""
+        return (source_id, target_id) in self.back_edges
+
     def get_node_by_id(self, node_id: str) -> Optional[Node]:
         """
         根据ID获取节点
@@ -151,10 +293,7 @@ class Workflow:
         Returns:
             Node: 找到的节点，如果未找到返回None
         """
-        for node in self.nodes:
-            if node.id == node_id:
-                return node
-        return None
+        return self.node_index.get(node_id)
 
     def get_next_nodes(self, node_id: str) -> List[Node]:
         """
@@ -164,13 +303,42 @@ class Workflow:
         Returns:
             List[Node]: 下一个节点列表
         """
-        next_nodes = []
-        for edge in self.edges:
-            if edge.sourceNodeID == node_id:
-                next_node = self.get_node_by_id(edge.targetNodeID)
-                if next_node:
-                    next_nodes.append(next_node)
-        return next_nodes
+        return [self.node_index[target] for target in self.successors.get(node_id, [])]
+
+    def get_prev_nodes(self, node_id: str) -> List[Node]:
+        """
+        获取指定节点的上一个节点列表
+        Args:
+            node_id: 当前节点ID
+        Returns:
+            List[Node]: 上一个节点列表
+        """
+        return [self.node_index[source] for source in self.predecessors.get(node_id, [])]
+
+    def get_port_targets(self, node_id: str, port_id: str) -> List[str]:
+        """
+        获取节点某个输出端口连接的目标节点ID列表
+        Args:
+            node_id: 源节点ID
+            port_id: 源端口ID
+        Returns:
+            List[str]: 目标节点ID列表
+        """
+        return self.port_successors.get(node_id, {}).get(port_id, [])
+
+    def in_cycle(self, node_id: str) -> bool:
+        """判断节点是否位于循环中"""
+        return node_id in self.cycle_group_of
+
+    @property
+    def start_node(self) -> Optional[Node]:
+        """开始节点"""
+        return self.node_index.get(self.start_node_id)
+
+    @property
+    def end_node(self) -> Optional[Node]:
+        """结束节点"""
+        return self.node_index.get(self.end_node_id)
 
     def validate(self) -> bool:
         """
@@ -179,15 +347,7 @@ class Workflow:
         Returns:
             bool: 验证结果
         """
-        has_start = False
-        has_end = False
-        for node in self.nodes:
-            if node.type == NodeType.START.value:
-                has_start = True
-            elif node.type == NodeType.END.value:
-                has_end = True
-        
-        return has_start and has_end
+        return self.start_node is not None and self.end_node is not None
 
 def create_workflow_from_json(json_data: WorkflowJson) -> Workflow:
     """
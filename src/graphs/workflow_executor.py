@@ -1,40 +1,83 @@
 import asyncio
-from typing import Dict, Any, Callable, TypedDict, Optional, AsyncGenerator
-from langgraph.graph import StateGraph, END
-from langchain_core.output_parsers import StrOutputParser
+import logging
+from contextlib import aclosing
 
-from src.models.model_factory import ModelFactory
+import numpy as np
+from typing import Dict, Any, Callable, Optional, AsyncGenerator, Union, List, Tuple
+
+from src.models.model_factory import ModelFactory, get_model_factory
+from src.models.async_support import astream_chat, aembed_query
+from src.models.batching import ChatBatcher
+from src.cache.node_cache import NodeOutputCache
+from src.cache.semantic_cache import SemanticCache
+from src.kb.hybrid import DEFAULT_CANDIDATES, DEFAULT_RRF_K, SEARCH_MODE_LEXICAL, SEARCH_MODE_VECTOR, merge_hits
+from src.kb.metadata import compile_filter
+from src.kb.registry import KnowledgeBaseRegistry, get_registry
+from src.kb.vector_store import SearchHit
 from .workflow import (
     Workflow, 
+    WorkflowJson,
     NodeType, 
-    InputValue,
 )
+from .compiler import (
+    NodeOutput,
+    WorkflowState,
+    CompiledWorkflow,
+    KB_FILTER_PARAM,
+    get_compiled_workflow,
+)
+from .conditions import EarlyDecision
+from .scheduler import WorkflowScheduler
+from .run_context import RunContext, TokenStream
+from .bindings import resolve
+
+# run_batch 默认的最大并发实例数
+DEFAULT_BATCH_CONCURRENCY = 32
+
+# 知识库节点未配置 datasetList / topK 时的默认值
+DEFAULT_KB_NAME = "default"
+DEFAULT_KB_TOP_K = 3
 
-class NodeOutput(TypedDict):
-    """节点输出定义"""
-    value: Any
-    type: str
+logger = logging.getLogger(__name__)
 
-class WorkflowState(TypedDict):
-    """工作流状态定义"""
-    # 存储每个节点的输出，格式为 {node_id: {output_name: NodeOutput}}
-    node_outputs: Dict[str, Dict[str, NodeOutput]]
-    # 当前正在处理的节点ID
-    current_node: str
-    # 最终输出结果
-    final_output: str
+# 已记录过警告的缺失知识库，每个名称只警告一次
+_missing_kbs = set()
+
+# 启用节点输出缓存时参与缓存的节点类型
+CACHEABLE_NODE_TYPES = {NodeType.LLM.value, NodeType.KB.value}
+
+def _dataset_names(settings: Dict[str, Any]) -> List[str]:
+    """知识库节点解析后的 datasetParam 中要检索的知识库名称"""
+    dataset_names = settings.get("datasetList") or [DEFAULT_KB_NAME]
+    return [dataset_names] if isinstance(dataset_names, str) else list(dataset_names)
 
 class WorkflowExecutor:
     """工作流执行器"""
     
-    def __init__(self, workflow: Workflow):
-        self.workflow = workflow
-        # 定义状态模式
-        self.graph = StateGraph(state_schema=WorkflowState)
-        # 创建ModelFactory实例
-        self.model_factory = ModelFactory()
+    def __init__(
+        self,
+        workflow: Union[Workflow, WorkflowJson, CompiledWorkflow],
+        node_cache: Optional[NodeOutputCache] = None,
+        semantic_cache: Optional[SemanticCache] = None,
+        kb_registry: Optional[KnowledgeBaseRegistry] = None,
+        model_factory: Optional[ModelFactory] = None,
+    ):
+        # 编译结果按内容哈希在进程内共享，执行器只持有引用
+        if isinstance(workflow, CompiledWorkflow):
+            self.compiled = workflow
+        else:
+            self.compiled = get_compiled_workflow(workflow)
+        self.workflow = self.compiled.workflow
+        # 节点输出缓存（可选），LLM和知识库节点的输出按配置和输入缓存
+        self.node_cache = node_cache
+        # LLM语义缓存（可选），节点可在 llmParam 中用 semanticCache / semanticCacheThreshold 单独配置
+        self.semantic_cache = semantic_cache
+        # 模型工厂默认使用进程级单例，配置只加载一次，模型客户端在执行器之间复用
+        self.model_factory = model_factory or get_model_factory()
         self.chat_model = self.model_factory.chat_model
         self.embedding_model = self.model_factory.embedding_model
+        # 知识库注册表，默认使用按 KB_INDEX_DIR 进程级共享的注册表
+        self.kb_registry = kb_registry or get_registry(self.model_factory.settings.KB_INDEX_DIR)
         
     def create_node_handler(self, node_type: str) -> Callable:
         """根据节点类型创建处理函数"""
@@ -51,53 +94,69 @@ class WorkflowExecutor:
         else:
             raise ValueError(f"不支持的节点类型: {node_type}")
 
-    def _handle_start_node(self, state: WorkflowState) -> WorkflowState:
-        """处理开始节点"""
-        node = self.workflow.get_node_by_id(state["current_node"])
-        node_data = node.data if isinstance(node.data, dict) else node.data.__dict__
-        
-        # 获取节点定义的输出参数
-        outputs = node_data.get("outputs", [])
-        
-        # 将输入参数保存到节点输出中
-        # state["node_outputs"][node.id] = {}
-        # for output in outputs:
-        #     output_name = output["name"]
-        #     state["node_outputs"][node.id][output_name] = {
-        #         "value": state["node_outputs"][node.id].get(output_name, {}).get("value", ""),
-        #         "type": output["type"]
-        #     }
+    async def _handle_start_node(self, state: WorkflowState, ctx: RunContext) -> WorkflowState:
+        """处理开始节点：运行输入已在初始状态中写入开始节点的输出"""
         return state
 
-    def _handle_llm_node(self, state: WorkflowState) -> WorkflowState:
+    async def _handle_llm_node(self, state: WorkflowState, ctx: RunContext) -> WorkflowState:
         """处理LLM节点"""
-        node = self.workflow.get_node_by_id(state["current_node"])
-        
-        # 获取输入参数配置
-        node_data = node.data if isinstance(node.data, dict) else node.data.__dict__
-        inputs_data = node_data.get("inputs", {})
-        input_params = inputs_data.get("inputParameters", [])
-        print(f"input_params: {input_params}")
-        # 构建输入数据
-        inputs = {}
-        for param in input_params:
-            if param["input"]["value"]["type"] == "ref":
-                # 从其他节点获取输入
-                source_node = param["input"]["value"]["content"]["blockID"]
-                output_name = param["input"]["value"]["content"]["name"]
-                inputs[param["name"]] = state["node_outputs"][source_node][output_name]["value"]
+        node = self.compiled.nodes[state["current_node"]]
+
+        # 按编译好的提示词模板渲染消息列表：静态片段已合并，变量只做一次绑定查找
+        messages, input_str = node.prompt.render(state["node_outputs"])
+        # 节点在 llmParam 中配置的模型和生成参数，客户端按 (接口, 模型) 共享
+        chat_model = self.model_factory.chat_model_for(node.llm_config)
+
+        embedding = None
+        if self.semantic_cache is not None and self.semantic_cache.is_enabled(node.llm_settings):
+            scope = f"{node.id}:{node.config_hash}"
+            if ctx.attempts.get(node.id, 1) > 1:
+                # 循环中的重试不查缓存，否则会一直拿到刚被丢弃的结果；只计算向量用于写回
+                embedding = await self.semantic_cache.aembed(input_str)
+                cached = None
             else:
-                # 使用字面量
-                inputs[param["name"]] = param["input"]["value"]["content"]
-
-        print(f"state: {state}")
-        print(f"调用LLM节点，输入: {inputs}")
-        # 将inputs里所有value组成一个字符串
-        input_str = "".join(inputs.values())
-        print(f"input_str: {input_str}")
-        output = self.chat_model.invoke(input_str).content
-        print(f"output: {output}")
-        # output = "LLM节点的输出"  # 这里应该是实际调用LLM的地方
+                threshold = self.semantic_cache.threshold_for(node.llm_settings)
+                lookup = await self.semantic_cache.alookup(scope, input_str, threshold)
+                embedding, cached = lookup.embedding, lookup.completion
+            if cached is not None:
+                if ctx.stream is not None:
+                    ctx.stream.begin_attempt(node.id)
+                    ctx.stream.push(node.id, cached)
+                state["node_outputs"][node.id] = {
+                    "output": {
+                        "value": cached,
+                        "type": "string"
+                    }
+                }
+                return state
+
+        if ctx.llm_batcher is not None:
+            # 批量运行：与其他实例同一时间窗口内的调用合并为一次 abatch
+            output = (await ctx.llm_batcher.invoke(chat_model, messages)).content
+        else:
+            # 流式调用，逐块转发给token流；不支持异步的客户端回退到有界线程池
+            if ctx.stream is not None:
+                ctx.stream.begin_attempt(node.id)
+            ctx.truncated.discard(node.id)
+            # 下游条件节点随token到达增量求值，结果确定后立即提交
+            pending = list(self.compiled.early_decisions.get(node.id, ())) if ctx.decide is not None else []
+            chunks = []
+            text = ""
+            # 提前退出时关闭生成器，底层的流式请求随之取消
+            async with aclosing(astream_chat(chat_model, messages)) as stream:
+                async for chunk in stream:
+                    chunks.append(chunk.content)
+                    if ctx.stream is not None:
+                        ctx.stream.push(node.id, chunk.content)
+                    if pending:
+                        text += chunk.content
+                        if self._decide_early(node.id, pending, text, ctx):
+                            ctx.truncated.add(node.id)
+                            break
+            output = "".join(chunks)
+
+        if embedding is not None and node.id not in ctx.truncated:
+            self.semantic_cache.add(scope, embedding, output)
         
         # 保存输出
         state["node_outputs"][node.id] = {
@@ -109,114 +168,104 @@ class WorkflowExecutor:
         
         return state
 
-    def _handle_condition_node(self, state: WorkflowState) -> WorkflowState:
+    def _decide_early(self, node_id: str, pending: List[EarlyDecision], text: str, ctx: RunContext) -> bool:
+        """
+        用LLM节点已生成的文本对下游条件节点做三值求值，结果确定的条件节点立即提交给调度器
+        Args:
+            node_id: LLM节点ID
+            pending: 尚未确定结果的条件节点，确定后从中移除
+            text: 已生成的文本
+            ctx: 运行上下文
+        Returns:
+            bool: 选中的端口会丢弃本次输出（回到该LLM节点重试）时返回True，应停止生成
+        """
+        for decision in list(pending):
+            port = decision.route(text)
+            if port is None:
+                continue
+            pending.remove(decision)
+            if port in decision.discard_ports:
+                # 不提前提交：截断后的输出使条件节点得到同样的结果，由它正常触发重试
+                return True
+            ctx.decide(decision.condition_id, {"condition_result": port})
+            if port in decision.final_ports and ctx.stream is not None and ctx.stream.node_id == node_id:
+                # 本次尝试确定会成为最终输出，缓冲的token不必等生成结束
+                ctx.stream.commit()
+        return False
+
+    async def _handle_condition_node(self, state: WorkflowState, ctx: RunContext) -> WorkflowState:
         """处理条件节点"""
-        node = self.workflow.get_node_by_id(state["current_node"])
-        
-        # 获取条件配置
-        node_data = node.data if isinstance(node.data, dict) else node.data.__dict__
-        inputs_data = node_data.get("inputs", {})
-        branches = inputs_data.get("branches", [])
-        
-        if not branches:
-            state["condition_result"] = "true"
-            return state
-            
-        branch = branches[0]  # 获取第一个分支的条件
-        conditions = branch["condition"]["conditions"]
-        
-        # 评估条件
-        for condition in conditions:
-            # 获取左值
-            left_value = self._get_condition_value(condition["left"], state)
-            # 获取右值
-            right_value = self._get_condition_value(condition["right"], state)
-
-            print(f"left_value: {left_value}, right_value: {right_value}")
-            
-            # 根据操作符比较值的长度
-
-            if self._compare_values(left_value, condition["operator"], right_value):
-                print("compare true")
-                state["condition_result"] = "true"
-                return state
-        
-        print("compare false")
-        state["condition_result"] = "false"
+        node = self.compiled.nodes[state["current_node"]]
+        # 编译好的路由函数依次短路求值各分支，返回第一个成立分支的端口
+        state["condition_result"] = node.route(state["node_outputs"])
         return state
 
-    def _get_condition_value(self, value_dict: Dict[str, Any], state: WorkflowState) -> Any:
-        """从条件配置中获取实际值"""
-        for _, input_value in value_dict.items():
-            if input_value["value"]["type"] == "ref":
-                # 从其他节点获取值
-                source_node = input_value["value"]["content"]["blockID"]
-                output_name = input_value["value"]["content"]["name"]
-                return state["node_outputs"][source_node][output_name]["value"]
-            else:
-                # 返回字面量
-                return input_value["value"]["content"]
-
-    def _compare_values(self, left: Any, operator: int, right: Any) -> bool:
-        """比较两个值"""
-        if operator == 1:  # 等于
-            return left == right
-        elif operator == 2:  # 不等于
-            return left != right
-        elif operator == 3:  # 长度大于
-            return len(left) > int(right)
-        elif operator == 4:  # 长度小于
-            return len(left) < int(right)
-        return False
-
-    def _handle_end_node(self, state: WorkflowState) -> WorkflowState:
+    async def _handle_end_node(self, state: WorkflowState, ctx: RunContext) -> WorkflowState:
         """处理结束节点"""
-        print("处理结束节点")
-        print(f"state: {state}")
-        
-        # 获取节点配置
-        node = self.workflow.get_node_by_id(state["current_node"])
-        node_data = node.data if isinstance(node.data, dict) else node.data.__dict__
-        inputs_data = node_data.get("inputs", {})
-        input_params = inputs_data.get("inputParameters", [])
+        node = self.compiled.nodes[state["current_node"]]
         
         # 获取输出内容
-        for param in input_params:
-            if param["input"]["value"]["type"] == "ref":
-                source_node = param["input"]["value"]["content"]["blockID"]
-                output_name = param["input"]["value"]["content"]["name"]
-                final_output = state["node_outputs"][source_node][output_name]["value"]
+        for binding in node.inputs:
+            if binding.block_id is not None:
+                final_output = resolve(binding, state["node_outputs"])
                 # 将最终输出存储在状态中
                 state = {**state, "final_output": final_output}
+                # 流式输出源的本次结果已成为最终输出
+                if ctx.stream is not None:
+                    ctx.stream.commit()
                 break
         
         return state
 
-    def should_continue(self, state: WorkflowState) -> str:
-        """判断是否继续执行，返回字符串 'true' 或 'false'"""
-        return state.get("condition_result", "false")
-
-    def _handle_kb_node(self, state: WorkflowState) -> WorkflowState:
+    async def _handle_kb_node(self, state: WorkflowState, ctx: RunContext) -> WorkflowState:
         """处理知识库检索节点"""
-        node = self.workflow.get_node_by_id(state["current_node"])
-        node_data = node.data if isinstance(node.data, dict) else node.data.__dict__
-        
-        # 获取查询参数
-        inputs_data = node_data.get("inputs", {})
-        input_params = inputs_data.get("inputParameters", [])
+        node = self.compiled.nodes[state["current_node"]]
         
         # 构建查询
         query = ""
-        for param in input_params:
-            if param["input"]["value"]["type"] == "ref":
-                source_node = param["input"]["value"]["content"]["blockID"]
-                output_name = param["input"]["value"]["content"]["name"]
-                query = state["node_outputs"][source_node][output_name]["value"]
+        expression = None
+        for binding in node.inputs:
+            if binding.name == KB_FILTER_PARAM:
+                expression = resolve(binding, state["node_outputs"])
+            elif binding.block_id is not None:
+                query = resolve(binding, state["node_outputs"])
         
-        # 这里应该是实际的知识库检索逻辑
-        # 示例：使用 embedding_model 进行检索
-        print(f"知识库检索，查询: {query}")
-        context = "这里是从知识库检索到的相关内容..."
+        settings = {binding.name: resolve(binding, state["node_outputs"]) for binding in node.kb_params}
+        # 字面量过滤表达式已在编译期编译，引用上游输出的表达式按文本缓存编译结果
+        metadata_filter = node.kb_filter or compile_filter(settings.get(KB_FILTER_PARAM) or expression)
+        dataset_names = _dataset_names(settings)
+        top_k = int(settings.get("topK", DEFAULT_KB_TOP_K))
+        min_score = settings.get("minScore")
+        min_score = float(min_score) if min_score is not None else None
+        nprobe = settings.get("nprobe")
+        nprobe = int(nprobe) if nprobe is not None else None
+        rescore = int(settings.get("rescore", 0))
+        mode = settings.get("searchMode") or SEARCH_MODE_VECTOR
+        prefilter = bool(settings.get("lexicalPrefilter", False))
+        candidates = int(settings.get("candidates", DEFAULT_CANDIDATES))
+        rrf_k = int(settings.get("rrfK", DEFAULT_RRF_K))
+
+        # 按节点配置的模式检索：向量（精确或 IVF 近似）、BM25，或两者用 RRF 融合；各段、多个知识库的向量结果按分数合并，其他模式按名次融合
+        vector = None
+        if mode != SEARCH_MODE_LEXICAL:
+            vector = np.asarray(await aembed_query(self.embedding_model, str(query)), dtype=np.float32)
+        # mmap 打分、FTS5 查询和元数据过滤都是同步的，放到线程中执行，不阻塞其他运行和token流
+        hits = await asyncio.to_thread(
+            self._retrieve,
+            dataset_names,
+            str(query),
+            vector,
+            top_k,
+            mode=mode,
+            min_score=min_score,
+            nprobe=nprobe,
+            rescore=rescore,
+            prefilter=prefilter,
+            candidates=candidates,
+            rrf_k=rrf_k,
+            metadata_filter=metadata_filter,
+        )
+        context = "\n\n".join(hit.text for hit in hits)
         
         # 保存检索结果
         state["node_outputs"][node.id] = {
@@ -228,71 +277,44 @@ class WorkflowExecutor:
         
         return state
 
-    def build(self) -> StateGraph:
-        """构建工作流图"""
-        # 添加所有节点
-        for node in self.workflow.nodes:
-            # 创建一个闭包来捕获节点ID
-            def create_handler(node_id: str, handler: Callable) -> Callable:
-                def wrapped_handler(state: WorkflowState) -> WorkflowState:
-                    # 更新当前节点ID
-                    state["current_node"] = node_id
-                    # 调用实际的处理函数
-                    return handler(state)
-                return wrapped_handler
-
-            if node.type == NodeType.CONDITION.value:
-                self.graph.add_node(
-                    node.id, 
-                    create_handler(node.id, self.create_node_handler(node.type))
-                )
-            else:
-                self.graph.add_node(
-                    node.id, 
-                    create_handler(node.id, self.create_node_handler(node.type))
-                )
-
-        # 添加边
-        condition_edges = {}  # 存储条件节点的边 {source_node: {condition: target_node}}
-        
-        # 先收集所有条件边
-        for edge in self.workflow.edges:
-            if edge.sourcePortID:
-                if edge.sourceNodeID not in condition_edges:
-                    condition_edges[edge.sourceNodeID] = {}
-                condition_edges[edge.sourceNodeID][edge.sourcePortID] = edge.targetNodeID
-        
-        print(f"condition_edges: {condition_edges}")
-
-        # 添加条件边
-        for source_node, paths in condition_edges.items():
-            self.graph.add_conditional_edges(
-                source_node,
-                self.should_continue,  # 使用类方法
-                paths  # 直接使用收集到的路径映射
-            )
-
-        # 添加普通边
-        for edge in self.workflow.edges:
-            if not edge.sourcePortID:
-                self.graph.add_edge(edge.sourceNodeID, edge.targetNodeID)
-
-        # 设置开始和结束节点
-        start_node = next(node for node in self.workflow.nodes if node.type == NodeType.START.value)
-        end_node = next(node for node in self.workflow.nodes if node.type == NodeType.END.value)
-        
-        self.graph.set_entry_point(start_node.id)
-        self.graph.set_finish_point(end_node.id)
+    def _retrieve(self, dataset_names: List[str], query: str, vector: Optional[np.ndarray], top_k: int, **options) -> List[SearchHit]:
+        """
+        在多个知识库中检索（同步执行）；索引不存在的知识库记录一次警告，按没有结果处理
+        Args:
+            dataset_names: 知识库名称列表
+            query: 查询文本
+            vector: 查询向量
+            top_k: 返回数量
+            options: 传给 KnowledgeBase.retrieve 的检索参数
+        Returns:
+            List[SearchHit]: 合并后按相关性降序排列的前 top_k 条结果（见 hybrid.merge_hits）
+        """
+        results = []
+        for name in dataset_names:
+            try:
+                kb = self.kb_registry.get(name)
+            except FileNotFoundError as e:
+                if name not in _missing_kbs:
+                    _missing_kbs.add(name)
+                    logger.warning("知识库 %s 不可用，检索结果为空（先用 python -m src.kb.ingest 导入文档）: %s", name, e)
+                continue
+            results.append(kb.retrieve(query, vector, top_k, **options))
+        return merge_hits(results, top_k, options.get("mode", SEARCH_MODE_VECTOR), options.get("rrf_k", DEFAULT_RRF_K))
 
-        return self.graph
+    def _kb_generations(self, dataset_names: List[str]) -> Dict[str, Optional[int]]:
+        """各知识库当前快照的 catalog 代数（同步执行），索引不存在的知识库为None"""
+        generations = {}
+        for name in dataset_names:
+            try:
+                generations[name] = self.kb_registry.get(name).snapshot.generation
+            except FileNotFoundError:
+                generations[name] = None
+        return generations
 
-    async def run(self, inputs: Dict[str, Any]) -> AsyncGenerator[str, None]:
-        """运行工作流，返回流式结果"""
-        # 找到开始节点
-        start_node = next(node for node in self.workflow.nodes if node.type == NodeType.START.value)
-        
-        # 初始化状态
-        initial_state = {
+    def _initial_state(self, inputs: Dict[str, Any]) -> WorkflowState:
+        """根据运行输入构建初始状态"""
+        start_node = self.workflow.start_node
+        return {
             "node_outputs": {
                 start_node.id: {  # 初始化开始节点的输出
                     "question": {
@@ -304,14 +326,151 @@ class WorkflowExecutor:
             "current_node": start_node.id,  # 从开始节点开始
             "final_output": ""  # 初始化最终输出
         }
-        
-        graph = self.build()
-        app = graph.compile()
-        
-        # 执行工作流
-        final_state = await app.ainvoke(initial_state, {"recursion_limit": len(self.workflow.nodes) * 2})
-        print(f"final_state: {final_state}")
-        # 流式返回最终结果
-        final_output = final_state.get("final_output", "")
-        for char in final_output:
-            yield char 
\ No newline at end of file
+
+    async def _execute(self, inputs: Dict[str, Any], ctx: RunContext) -> WorkflowState:
+        """按编译好的调度计划并行执行一次工作流，输入就绪的节点同时启动"""
+        async def run_node(node_id: str, state: WorkflowState) -> WorkflowState:
+            node_type = self.compiled.plan.node_types[node_id]
+            handler = self.create_node_handler(node_type)
+            attempt = ctx.attempts.get(node_id, 0)
+            ctx.attempts[node_id] = attempt + 1
+            if self.node_cache is None or node_type not in CACHEABLE_NODE_TYPES:
+                return await handler(state, ctx)
+            return await self._run_cached(node_id, handler, state, ctx, read=attempt == 0)
+
+        scheduler = WorkflowScheduler(self.compiled.plan, run_node)
+        ctx.decide = scheduler.decide
+        return await scheduler.run(self._initial_state(inputs))
+
+    async def _run_cached(
+        self,
+        node_id: str,
+        handler: Callable,
+        state: WorkflowState,
+        ctx: RunContext,
+        read: bool,
+    ) -> WorkflowState:
+        """
+        带节点输出缓存执行节点
+        循环中的重试（同一次运行中第二次及以后执行）跳过读缓存，否则会一直拿到被丢弃的旧结果；
+        每次执行都写缓存，最后被接受的那次结果会留在缓存中
+        """
+        node = self.compiled.nodes[node_id]
+        node_outputs = state["node_outputs"]
+        inputs = {binding.name: resolve(binding, node_outputs) for binding in node.inputs + node.llm_params}
+        if self.compiled.plan.node_types[node_id] == NodeType.KB.value:
+            # 检索结果还取决于 datasetParam（知识库名称可以引用上游输出）和知识库内容：
+            # 键中加入解析后的参数和各知识库的 catalog 代数，写入、删除或合并后旧结果不再命中
+            settings = {binding.name: resolve(binding, node_outputs) for binding in node.kb_params}
+            generations = await asyncio.to_thread(self._kb_generations, _dataset_names(settings))
+            inputs = {"inputs": inputs, "datasetParam": settings, "generations": generations}
+        key = self.node_cache.make_key(node_id, node.config_hash, inputs)
+
+        if read:
+            cached = await self.node_cache.aget(key)
+            if cached is not None:
+                node_outputs[node_id] = cached
+                if ctx.stream is not None and ctx.stream.node_id == node_id:
+                    ctx.stream.begin_attempt(node_id)
+                    for output in cached.values():
+                        ctx.stream.push(node_id, str(output["value"]))
+                return state
+
+        state = await handler(state, ctx)
+        # 提前停止生成的输出不完整，不写缓存
+        if node_id not in ctx.truncated:
+            await self.node_cache.aset(key, state["node_outputs"][node_id])
+        return state
+
+    async def run(self, inputs: Dict[str, Any]) -> AsyncGenerator[str, None]:
+        """运行工作流，返回流式结果"""
+        # 为结束节点提供输出的LLM节点的token边生成边转发
+        stream = None
+        if self.compiled.stream_node_id is not None:
+            stream = TokenStream(self.compiled.stream_node_id, buffered=self.compiled.stream_buffered)
+        ctx = RunContext(stream=stream)
+
+        task = asyncio.ensure_future(self._execute(inputs, ctx))
+        try:
+            if stream is not None:
+                task.add_done_callback(lambda _: stream.close())
+                async for token in stream:
+                    yield token
+            final_state = await task
+        finally:
+            if not task.done():
+                task.cancel()
+
+        # 结束节点的输出不来自LLM节点时，一次性返回最终结果
+        if stream is None or not stream.emitted:
+            final_output = final_state.get("final_output", "")
+            if final_output:
+                yield final_output
+
+    async def run_batch_as_completed(
+        self,
+        inputs: List[Dict[str, Any]],
+        max_concurrency: int = DEFAULT_BATCH_CONCURRENCY,
+        return_exceptions: bool = False,
+    ) -> AsyncGenerator[Tuple[int, Any], None]:
+        """
+        批量运行工作流，按完成顺序流式返回结果
+        所有实例共享同一个编译结果，并发中的LLM调用按时间窗口合并为 abatch
+        Args:
+            inputs: 输入列表
+            max_concurrency: 同时运行的最大实例数
+            return_exceptions: 为True时失败的实例以异常对象作为结果返回，否则直接抛出
+        Returns:
+            AsyncGenerator: (输入下标, 最终输出) 元组
+        """
+        batcher = ChatBatcher(max_batch_size=max_concurrency)
+
+        async def run_item(index: int, item: Dict[str, Any]) -> Tuple[int, Any]:
+            try:
+                final_state = await self._execute(item, RunContext(llm_batcher=batcher))
+                return index, final_state.get("final_output", "")
+            except Exception as e:
+                if not return_exceptions:
+                    raise
+                return index, e
+
+        # 只保持 max_concurrency 个实例在运行，输入再多内存占用也不变
+        pending = iter(enumerate(inputs))
+        running = set()
+        try:
+            for index, item in pending:
+                running.add(asyncio.ensure_future(run_item(index, item)))
+                if len(running) >= max_concurrency:
+                    break
+            while running:
+                done, running = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    yield task.result()
+                    next_item = next(pending, None)
+                    if next_item is not None:
+                        running.add(asyncio.ensure_future(run_item(*next_item)))
+        finally:
+            for task in running:
+                task.cancel()
+            if running:
+                await asyncio.gather(*running, return_exceptions=True)
+
+    async def run_batch(
+        self,
+        inputs: List[Dict[str, Any]],
+        max_concurrency: int = DEFAULT_BATCH_CONCURRENCY,
+        return_exceptions: bool = False,
+    ) -> List[Any]:
+        """
+        批量运行工作流，按输入顺序返回结果
+        Args:
+            inputs: 输入列表
+            max_concurrency: 同时运行的最大实例数
+            return_exceptions: 为True时失败的实例以异常对象作为结果返回，否则直接抛出
+        Returns:
+            List[Any]: 与输入顺序一致的最终输出列表
+        """
+        results: List[Any] = [None] * len(inputs)
+        async for index, result in self.run_batch_as_completed(inputs, max_concurrency, return_exceptions):
+            results[index] = result
+        return results
@@ -0,0 +1,126 @@
+"""
+近似检索（IVF）与量化存储（float16 / int8）相对 float32 精确检索的召回率、延迟和内存对比
+
+    python -m src.kb.benchmark                         # 合成数据
+    python -m src.kb.benchmark --index data/kb/default # 已有知识库目录
+    python -m src.kb.benchmark --only quantize         # 只跑量化对比
+"""
+import argparse
+import time
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from .ivf import IVFVectorStore
+from .vector_store import VectorStore
+
+def synthetic_store(size: int, dim: int, clusters: int = 256, seed: int = 0) -> VectorStore:
+    """生成带聚类结构的合成向量库（真实 embedding 分布也是成簇的）"""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim)).astype(np.float32)
+    embeddings = centers[rng.integers(0, clusters, size)] + 0.5 * rng.normal(size=(size, dim)).astype(np.float32)
+    return VectorStore(embeddings, [""] * size)
+
+def sample_queries(store: VectorStore, count: int, seed: int = 1) -> np.ndarray:
+    """在库中随机取向量并加噪声作为查询"""
+    rng = np.random.default_rng(seed)
+    rows = np.sort(rng.choice(store.size, min(count, store.size), replace=False))
+    base = np.asarray(store.embeddings[rows], dtype=np.float32)
+    return base + 0.1 * rng.normal(size=base.shape).astype(np.float32) / np.sqrt(store.dim)
+
+def _timed_search(store: VectorStore, queries: np.ndarray, top_k: int, **kwargs):
+    rows, latencies = [], []
+    for query in queries:
+        start = time.perf_counter()
+        hits = store.search(query, top_k, **kwargs)
+        latencies.append(time.perf_counter() - start)
+        rows.append({hit.row for hit in hits})
+    return rows, np.asarray(latencies) * 1000
+
+def run_benchmark(
+    store: VectorStore,
+    queries: np.ndarray,
+    top_k: int = 10,
+    nlist: Optional[int] = None,
+    nprobes: Sequence[int] = (1, 2, 4, 8, 16, 32, 64),
+) -> List[Dict[str, float]]:
+    """
+    对比精确检索与不同 nprobe 下的 IVF 检索
+    Returns:
+        List[Dict[str, float]]: 每种配置的召回率和延迟（毫秒）
+    """
+    exact_rows, exact_ms = _timed_search(store, queries, top_k)
+    results = [{"mode": "exact", "nprobe": 0, "recall": 1.0,
+                "mean_ms": float(exact_ms.mean()), "p95_ms": float(np.percentile(exact_ms, 95))}]
+
+    start = time.perf_counter()
+    ivf = IVFVectorStore.build(store, nlist=nlist)
+    build_seconds = time.perf_counter() - start
+    print(f"IVF 构建: nlist={ivf.nlist}, 耗时 {build_seconds:.2f}s")
+
+    for nprobe in nprobes:
+        if nprobe > ivf.nlist:
+            break
+        rows, ms = _timed_search(ivf, queries, top_k, nprobe=nprobe)
+        recall = np.mean([len(r & e) / max(len(e), 1) for r, e in zip(rows, exact_rows)])
+        results.append({"mode": "ivf", "nprobe": nprobe, "recall": float(recall),
+                        "mean_ms": float(ms.mean()), "p95_ms": float(np.percentile(ms, 95))})
+    return results
+
+def run_quantization_benchmark(
+    store: VectorStore,
+    queries: np.ndarray,
+    top_k: int = 10,
+    rescore: int = 100,
+) -> List[Dict[str, float]]:
+    """
+    对比不同存储类型（以及 float32 精确重打分）相对 float32 的内存占用和召回率
+    Returns:
+        List[Dict[str, float]]: 每种配置的内存（MB）、节省比例、召回率和延迟（毫秒）
+    """
+    baseline = store.quantize("float32")
+    exact_rows, exact_ms = _timed_search(baseline, queries, top_k)
+    base_bytes = baseline.memory_bytes
+    results = [{"dtype": "float32", "rescore": 0, "memory_mb": base_bytes / 2**20, "saved": 0.0,
+                "recall": 1.0, "mean_ms": float(exact_ms.mean())}]
+    for dtype in ("float16", "int8"):
+        quantized = store.quantize(dtype, keep_exact=True)
+        for k in (0, rescore):
+            rows, ms = _timed_search(quantized, queries, top_k, rescore=k)
+            recall = np.mean([len(r & e) / max(len(e), 1) for r, e in zip(rows, exact_rows)])
+            results.append({"dtype": dtype, "rescore": k, "memory_mb": quantized.memory_bytes / 2**20,
+                            "saved": 1 - quantized.memory_bytes / base_bytes,
+                            "recall": float(recall), "mean_ms": float(ms.mean())})
+    return results
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="IVF 与精确检索的召回率/延迟对比")
+    parser.add_argument("--index", help="知识库索引目录，不指定时使用合成数据")
+    parser.add_argument("--size", type=int, default=200000, help="合成数据条数")
+    parser.add_argument("--dim", type=int, default=256, help="合成数据维度")
+    parser.add_argument("--queries", type=int, default=200, help="查询数")
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--nlist", type=int, default=None)
+    parser.add_argument("--nprobe", default="1,2,4,8,16,32,64", help="逗号分隔的 nprobe 列表")
+    parser.add_argument("--rescore", type=int, default=100, help="量化存储精确重打分的候选数")
+    parser.add_argument("--only", choices=["ivf", "quantize"], default=None, help="只跑其中一项对比")
+    args = parser.parse_args()
+
+    store = VectorStore.load(args.index) if args.index else synthetic_store(args.size, args.dim)
+    queries = sample_queries(store, args.queries)
+    nprobes = [int(value) for value in args.nprobe.split(",")]
+    print(f"向量数 {store.size}, 维度 {store.dim}, 查询数 {len(queries)}, top_k={args.top_k}")
+    if args.only != "quantize":
+        results = run_benchmark(store, queries, args.top_k, args.nlist, nprobes)
+        print(f"{'mode':<6}{'nprobe':>8}{'recall':>10}{'mean_ms':>10}{'p95_ms':>10}")
+        for row in results:
+            print(f"{row['mode']:<6}{row['nprobe']:>8}{row['recall']:>10.3f}{row['mean_ms']:>10.2f}{row['p95_ms']:>10.2f}")
+    if args.only != "ivf":
+        results = run_quantization_benchmark(store, queries, args.top_k, args.rescore)
+        print(f"{'dtype':<8}{'rescore':>8}{'memory_mb':>11}{'saved':>8}{'recall':>9}{'mean_ms':>10}")
+        for row in results:
+            print(f"{row['dtype']:<8}{row['rescore']:>8}{row['memory_mb']:>11.1f}{row['saved']:>8.1%}"
+                  f"{row['recall']:>9.3f}{row['mean_ms']:>10.2f}")
+
+if __name__ == "__main__":
+    main()
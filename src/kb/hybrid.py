@@ -0,0 +1,137 @@
+from typing import Dict, Hashable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .lexical import LexicalIndex
+from .vector_store import SearchHit, VectorStore
+
+# 检索模式，由 KB 节点 datasetParam 的 searchMode 指定
+SEARCH_MODE_VECTOR = "vector"
+SEARCH_MODE_LEXICAL = "lexical"
+SEARCH_MODE_HYBRID = "hybrid"
+SEARCH_MODES = (SEARCH_MODE_VECTOR, SEARCH_MODE_LEXICAL, SEARCH_MODE_HYBRID)
+
+# RRF 平滑常数，常用取值 60
+DEFAULT_RRF_K = 60
+# 融合或预过滤时每路召回的候选数
+DEFAULT_CANDIDATES = 50
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[Hashable]], k: int = DEFAULT_RRF_K) -> List[Tuple[Hashable, float]]:
+    """
+    倒数排名融合：每个结果的分数为其在各路排名中 1 / (k + 名次) 之和
+    Args:
+        rankings: 各路按相关性降序排列的行号（或其他可哈希的结果键）
+        k: 平滑常数
+    Returns:
+        List[Tuple[Hashable, float]]: 按融合分数降序排列的 (行号, 分数)
+    """
+    scores: Dict[Hashable, float] = {}
+    for ranking in rankings:
+        for rank, row in enumerate(ranking, start=1):
+            scores[row] = scores.get(row, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+def merge_hits(results: Sequence[List[SearchHit]], top_k: int, mode: str = SEARCH_MODE_VECTOR, rrf_k: int = DEFAULT_RRF_K) -> List[SearchHit]:
+    """
+    合并多个段或多个知识库各自的检索结果
+    余弦相似度在各索引间可比，按分数合并；BM25 的词频统计和 RRF 分数都只在单个索引内有意义，按名次做倒数排名融合
+    Args:
+        results: 各索引按相关性降序排列的结果
+        top_k: 返回数量
+        mode: 检索模式
+        rrf_k: RRF 平滑常数
+    Returns:
+        List[SearchHit]: 合并后的结果；只有一路结果时原样返回，多路的 lexical / hybrid 结果分数为跨索引的 RRF 分数
+    """
+    results = [hits for hits in results if hits]
+    if len(results) <= 1:
+        return results[0][:top_k] if results else []
+    if mode == SEARCH_MODE_VECTOR:
+        hits = [hit for hits in results for hit in hits]
+        hits.sort(key=lambda hit: hit.score, reverse=True)
+        return hits[:top_k]
+    by_key = {(i, hit.row): hit for i, hits in enumerate(results) for hit in hits}
+    fused = reciprocal_rank_fusion([[(i, hit.row) for hit in hits] for i, hits in enumerate(results)], rrf_k)
+    return [by_key[key]._replace(score=score) for key, score in fused[:top_k]]
+
+def lexical_search(
+    lexical: LexicalIndex,
+    query: str,
+    depth: int,
+    size: int,
+    mask: Optional[np.ndarray] = None,
+) -> List[Tuple[int, float]]:
+    """
+    BM25 检索并去掉掩码之外的行；过滤后不足 depth 条时扩大召回数重查，直到倒排索引中没有更多结果
+    Args:
+        lexical: 倒排索引
+        query: 查询文本
+        depth: 返回数量
+        size: 向量库条目数，倒排索引可能比打开向量库时多出新追加的行
+        mask: 长度为 size 的布尔掩码
+    Returns:
+        List[Tuple[int, float]]: (行号, BM25 分数) 列表
+    """
+    limit = depth
+    while True:
+        found = lexical.search(query, limit)
+        hits = [(row, score) for row, score in found if row < size and (mask is None or mask[row])]
+        if len(hits) >= depth or len(found) < limit:
+            return hits[:depth]
+        limit *= 4
+
+def retrieve(
+    store: VectorStore,
+    lexical: Optional[LexicalIndex],
+    query: str,
+    vector: Optional[np.ndarray],
+    top_k: int = 3,
+    mode: str = SEARCH_MODE_VECTOR,
+    min_score: Optional[float] = None,
+    nprobe: Optional[int] = None,
+    rescore: int = 0,
+    prefilter: bool = False,
+    candidates: int = DEFAULT_CANDIDATES,
+    rrf_k: int = DEFAULT_RRF_K,
+    mask: Optional[np.ndarray] = None,
+) -> List[SearchHit]:
+    """
+    在一个知识库中检索
+    Args:
+        store: 向量库
+        lexical: 倒排索引，vector 模式且不预过滤时可为None
+        query: 查询文本
+        vector: 查询向量，lexical 模式下可为None
+        top_k: 返回数量
+        mode: 检索模式，vector / lexical / hybrid
+        min_score: 最低向量相似度，只作用于向量召回
+        nprobe: 近似索引探测的列表数
+        rescore: 量化存储时用 float32 向量重打分的候选数
+        prefilter: 是否先用 BM25 召回候选，只对候选做向量精确打分；候选不足 top_k 时回退到全量向量检索
+        candidates: 融合或预过滤时每路召回的候选数
+        rrf_k: RRF 平滑常数
+        mask: 长度为 store.size 的布尔掩码，只返回为 True 的行
+    Returns:
+        List[SearchHit]: 结果；vector 模式分数为余弦相似度，lexical 模式为 BM25 分数，hybrid 模式为 RRF 分数
+    """
+    if mode not in SEARCH_MODES:
+        raise ValueError(f"不支持的检索模式: {mode}")
+    if lexical is None and (mode != SEARCH_MODE_VECTOR or prefilter):
+        raise ValueError(f"{mode} 检索和 BM25 预过滤需要倒排索引，该知识库没有构建（导入时不要使用 --no-lexical）")
+    depth = max(top_k, candidates)
+    lexical_hits = []
+    if mode != SEARCH_MODE_VECTOR or prefilter:
+        lexical_hits = lexical_search(lexical, query, depth, store.size, mask)
+    if mode == SEARCH_MODE_LEXICAL:
+        return [SearchHit(row, score, store.texts[row]) for row, score in lexical_hits[:top_k]]
+
+    vector_depth = depth if mode == SEARCH_MODE_HYBRID else top_k
+    if prefilter and len(lexical_hits) >= top_k:
+        vector_hits = store.search_rows(vector, [row for row, _ in lexical_hits], vector_depth, min_score, rescore)
+    else:
+        vector_hits = store.search(vector, vector_depth, min_score, nprobe, rescore, mask)
+    if mode == SEARCH_MODE_VECTOR:
+        return vector_hits
+
+    fused = reciprocal_rank_fusion([[hit.row for hit in vector_hits], [row for row, _ in lexical_hits]], rrf_k)
+    return [SearchHit(row, score, store.texts[row]) for row, score in fused[:top_k]]
@@ -0,0 +1,292 @@
+import json
+import os
+import struct
+from typing import BinaryIO, Dict, Iterable, Optional, Sequence
+
+import numpy as np
+
+# 索引格式
+#   header.json     版本、维度、条目数、向量存储类型
+#   embeddings.npy  (count, dim) 的归一化向量矩阵，float32、float16 或按行缩放的 int8
+#   scales.npy      (count,) 的 float32 缩放系数，仅 int8 存储时存在，原向量约等于 embeddings[i] * scales[i]
+#   exact.npy       (count, dim) 的 float32 原始归一化向量，可选，量化存储时用于对候选做精确重打分
+#   offsets.npy     (count + 1,) 的 int64 数组，第 i 个文本块位于 texts.bin[offsets[i]:offsets[i+1]]
+#   texts.bin       按顺序紧密排列的 UTF-8 文本
+# 所有数组文件都通过 mmap 打开，加载开销与索引大小无关，同一台机器上的多个进程共享页缓存
+FORMAT_NAME = "mx_kb"
+# 版本 2 起支持 float16 / int8 存储（scales.npy、exact.npy），旧版本读者不认识这些文件，必须拒绝打开；
+# 版本 1 的索引只有 float32 向量，是版本 2 的子集，仍可读取
+FORMAT_VERSION = 2
+READABLE_VERSIONS = (1, 2)
+
+HEADER_FILE = "header.json"
+EMBEDDINGS_FILE = "embeddings.npy"
+SCALES_FILE = "scales.npy"
+EXACT_FILE = "exact.npy"
+OFFSETS_FILE = "offsets.npy"
+TEXTS_FILE = "texts.bin"
+# 可增量更新的知识库目录中的段目录清单（见 segments.py）
+CATALOG_FILE = "catalog.sqlite"
+
+SUPPORTED_DTYPES = ("float32", "float16", "int8")
+
+# .npy 文件头固定占用的字节数；预留足够空间，追加数据后只需原地改写 shape
+NPY_HEADER_SIZE = 128
+_NPY_MAGIC = b"\x93NUMPY\x01\x00"
+
+def _write_npy_header(f, dtype: np.dtype, shape: tuple) -> None:
+    """在文件开头写入固定长度的 .npy 1.0 文件头"""
+    header = {"descr": np.lib.format.dtype_to_descr(np.dtype(dtype)), "fortran_order": False, "shape": shape}
+    body = repr(header).encode("latin1")
+    body_len = NPY_HEADER_SIZE - len(_NPY_MAGIC) - 2
+    if len(body) + 1 > body_len:
+        raise ValueError(f"npy 文件头超出预留长度: {header}")
+    f.seek(0)
+    f.write(_NPY_MAGIC + struct.pack("<H", body_len) + body + b" " * (body_len - len(body) - 1) + b"\n")
+
+def _open_npy(path: str, dtype: str, shape: tuple) -> np.ndarray:
+    """
+    以只读 mmap 方式打开 .npy 的数据区
+    形状取自 header.json 记录的已提交条目数，而不是 .npy 文件头，写入者追加到一半时读者也能正常打开
+    """
+    if 0 in shape:
+        return np.empty(shape, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode="r", offset=NPY_HEADER_SIZE, shape=shape)
+
+class PackedTexts(Sequence):
+    """按偏移量从 mmap 的 texts.bin 中按需解码文本块"""
+
+    def __init__(self, offsets: np.ndarray, data: np.ndarray):
+        self.offsets = offsets
+        self.data = data
+
+    def __len__(self) -> int:
+        return max(self.offsets.shape[0] - 1, 0)
+
+    def __getitem__(self, row):
+        if isinstance(row, slice):
+            return [self[i] for i in range(*row.indices(len(self)))]
+        start, end = int(self.offsets[row]), int(self.offsets[row + 1])
+        return bytes(self.data[start:end]).decode("utf-8")
+
+class IndexHeader(dict):
+    """索引头信息"""
+
+    @property
+    def dim(self) -> int:
+        return self["dim"]
+
+    @property
+    def count(self) -> int:
+        return self["count"]
+
+    @property
+    def dtype(self) -> str:
+        return self["dtype"]
+
+    @property
+    def exact(self) -> bool:
+        return bool(self.get("exact", False))
+
+def read_header(path: str) -> IndexHeader:
+    """
+    读取并校验索引头
+    Args:
+        path: 索引目录
+    Returns:
+        IndexHeader: 索引头
+    """
+    with open(os.path.join(path, HEADER_FILE), "r", encoding="utf-8") as f:
+        header = IndexHeader(json.load(f))
+    if header.get("format") != FORMAT_NAME:
+        raise ValueError(f"不是知识库索引目录: {path}")
+    if header.get("version") not in READABLE_VERSIONS:
+        raise ValueError(f"不支持的索引版本 {header.get('version')}，当前版本为 {FORMAT_VERSION}")
+    if header.get("version") == 1 and header.get("dtype", "float32") != "float32":
+        raise ValueError(f"版本 1 的索引不支持 {header.get('dtype')} 存储: {path}")
+    return header
+
+class MappedIndex:
+    """以 mmap 方式打开的只读索引"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.header = read_header(path)
+        count = self.header.count
+        dim = self.header.dim
+        self.embeddings = _open_npy(os.path.join(path, EMBEDDINGS_FILE), self.header.dtype, (count, dim))
+        self.scales = None
+        if self.header.dtype == "int8":
+            self.scales = _open_npy(os.path.join(path, SCALES_FILE), "float32", (count,))
+        self.exact = None
+        if self.header.exact:
+            self.exact = _open_npy(os.path.join(path, EXACT_FILE), "float32", (count, dim))
+        offsets = _open_npy(os.path.join(path, OFFSETS_FILE), "int64", (count + 1,))
+        texts_path = os.path.join(path, TEXTS_FILE)
+        # 空文件无法 mmap
+        if os.path.getsize(texts_path) > 0:
+            data = np.memmap(texts_path, dtype=np.uint8, mode="r")
+        else:
+            data = np.empty(0, dtype=np.uint8)
+        self.texts = PackedTexts(offsets, data)
+
+class IndexWriter:
+    """
+    索引写入器，支持在已有索引后增量追加
+    追加过程中 header.json 保持旧的条目数，flush/close 时才更新，读者始终看到完整的数据
+    """
+
+    def __init__(
+        self,
+        path: str,
+        dim: Optional[int] = None,
+        dtype: str = "float32",
+        keep_exact: bool = False,
+        count: Optional[int] = None,
+    ):
+        """
+        Args:
+            path: 索引目录，已存在索引时在其后追加（沿用已有索引的维度和存储类型）
+            dim: 向量维度（新建索引时必填，也可在第一次追加时确定）
+            dtype: 向量存储类型，float32、float16 或 int8
+            keep_exact: 量化存储时是否另存一份 float32 向量用于精确重打分
+            count: 只保留已有索引的前 count 条，之后的条目在第一次追加时被丢弃
+        """
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        if os.path.exists(os.path.join(path, HEADER_FILE)):
+            header = read_header(path)
+            self.dim, self.dtype, self.count, self.exact = header.dim, header.dtype, header.count, header.exact
+            if count is not None:
+                self.count = min(count, self.count)
+            self._text_size = int(_open_npy(os.path.join(path, OFFSETS_FILE), "int64", (self.count + 1,))[-1])
+        else:
+            if dtype not in SUPPORTED_DTYPES:
+                raise ValueError(f"不支持的向量存储类型: {dtype}")
+            self.dim, self.dtype, self.count = dim, dtype, 0
+            self.exact = keep_exact and dtype != "float32"
+            self._text_size = 0
+            with open(os.path.join(path, OFFSETS_FILE), "wb") as f:
+                _write_npy_header(f, np.int64, (1,))
+                f.write(np.zeros(1, dtype=np.int64).tobytes())
+            open(os.path.join(path, TEXTS_FILE), "wb").close()
+            if dim is not None:
+                self._create_arrays()
+        self._files = None
+
+    def _array_layouts(self):
+        """(文件名, 元素类型, 每行形状, 比条目数多出的行数)"""
+        layouts = [(EMBEDDINGS_FILE, np.dtype(self.dtype), (self.dim,), 0), (OFFSETS_FILE, np.dtype(np.int64), (), 1)]
+        if self.dtype == "int8":
+            layouts.append((SCALES_FILE, np.dtype(np.float32), (), 0))
+        if self.exact:
+            layouts.append((EXACT_FILE, np.dtype(np.float32), (self.dim,), 0))
+        return layouts
+
+    def _create_arrays(self) -> None:
+        for name, dtype, row_shape, extra in self._array_layouts():
+            if name != OFFSETS_FILE:
+                with open(os.path.join(self.path, name), "wb") as f:
+                    _write_npy_header(f, dtype, (0,) + row_shape)
+        self._write_header()
+
+    def _open_files(self) -> Dict[str, BinaryIO]:
+        if self._files is None:
+            # 按已提交的条目数定位写入位置，丢弃上次异常退出时残留的未提交数据
+            self._files = {}
+            for name, dtype, row_shape, extra in self._array_layouts():
+                f = self._files[name] = open(os.path.join(self.path, name), "r+b")
+                f.truncate(NPY_HEADER_SIZE + (self.count + extra) * int(np.prod(row_shape)) * dtype.itemsize)
+            texts = self._files[TEXTS_FILE] = open(os.path.join(self.path, TEXTS_FILE), "r+b")
+            texts.truncate(self._text_size)
+            texts.seek(0, os.SEEK_END)
+            self._write_npy_headers()
+        return self._files
+
+    def append(self, embeddings: np.ndarray, texts: Iterable[str]) -> range:
+        """
+        追加一批向量和文本块（向量会被归一化并转换为存储类型）
+        Args:
+            embeddings: 形状为 (n, dim) 的向量矩阵
+            texts: 与向量一一对应的文本块
+        Returns:
+            range: 新条目的行号范围
+        """
+        from .vector_store import normalize_rows, quantize_rows
+
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        if embeddings.ndim != 2:
+            raise ValueError("embeddings 必须是二维矩阵")
+        if self.dim is None:
+            self.dim = embeddings.shape[1]
+            self._create_arrays()
+        if embeddings.shape[1] != self.dim:
+            raise ValueError(f"向量维度 {embeddings.shape[1]} 与索引维度 {self.dim} 不一致")
+        encoded = [text.encode("utf-8") for text in texts]
+        if len(encoded) != embeddings.shape[0]:
+            raise ValueError(f"向量数 {embeddings.shape[0]} 与文本数 {len(encoded)} 不一致")
+
+        files = self._open_files()
+        normalized = normalize_rows(embeddings)
+        stored, scales = quantize_rows(normalized, self.dtype)
+        files[EMBEDDINGS_FILE].write(stored.tobytes())
+        if scales is not None:
+            files[SCALES_FILE].write(scales.tobytes())
+        if self.exact:
+            files[EXACT_FILE].write(normalized.tobytes())
+        lengths = np.fromiter((len(data) for data in encoded), dtype=np.int64, count=len(encoded))
+        files[OFFSETS_FILE].write((self._text_size + np.cumsum(lengths)).tobytes())
+        files[TEXTS_FILE].write(b"".join(encoded))
+
+        start = self.count
+        self.count += len(encoded)
+        self._text_size += int(lengths.sum())
+        return range(start, self.count)
+
+    def flush(self) -> None:
+        """把已追加的数据落盘并提交条目数"""
+        if self._files is None:
+            return
+        # 数据先落盘，再改写文件头，最后提交 header.json
+        for f in self._files.values():
+            f.flush()
+            os.fsync(f.fileno())
+        self._write_npy_headers()
+        for f in self._files.values():
+            f.flush()
+        self._write_header()
+
+    def close(self) -> None:
+        """提交并关闭"""
+        self.flush()
+        if self._files is not None:
+            for f in self._files.values():
+                f.close()
+            self._files = None
+
+    def _write_npy_headers(self) -> None:
+        for name, dtype, row_shape, extra in self._array_layouts():
+            f = self._files[name]
+            _write_npy_header(f, dtype, (self.count + extra,) + row_shape)
+            f.seek(0, os.SEEK_END)
+
+    def _write_header(self) -> None:
+        header = {
+            "format": FORMAT_NAME,
+            "version": FORMAT_VERSION,
+            "dim": self.dim,
+            "count": self.count,
+            "dtype": self.dtype,
+            "exact": self.exact,
+        }
+        # 先写临时文件再原子替换，读者不会读到写了一半的头
+        tmp_path = os.path.join(self.path, HEADER_FILE + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(header, f)
+        os.replace(tmp_path, os.path.join(self.path, HEADER_FILE))
+
+    def __enter__(self) -> "IndexWriter":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
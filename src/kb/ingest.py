@@ -0,0 +1,368 @@
+"""
+知识库导入：目录流式读取 -> 分块 -> 去重 -> 分批 embedding -> 增量追加到索引
+每个文本块所属的文档 id（相对文档目录的路径）记录在 ingest.sqlite 中，启用增量更新（segments.py）时导入
+文档元数据来自 --meta 指定的公共字段和与文档同名的 <文件名>.meta.json，导入结束后建立元数据倒排索引（metadata.py）
+
+    python -m src.kb.ingest docs/ --kb default --meta tenant=acme --meta language=zh
+
+    python -m src.kb.ingest docs/ --kb default --chunk-size 500 --overlap 50
+"""
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, List, Optional, Set, TextIO, Tuple
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from src.models.async_support import aembed_documents
+
+from .index_format import CATALOG_FILE, IndexWriter
+from .lexical import LEXICAL_FILE, LexicalIndex
+from .metadata import write_metadata
+
+DEFAULT_EXTENSIONS = (".txt", ".md")
+DEFAULT_CHUNK_SIZE = 500
+DEFAULT_CHUNK_OVERLAP = 50
+DEFAULT_BATCH_SIZE = 64
+DEFAULT_MAX_CONCURRENCY = 4
+# 每追加这么多批提交一次索引和去重记录
+DEFAULT_FLUSH_EVERY = 16
+
+# 文件按块读取，单个大文件也不会整体读入内存
+READ_BLOCK_SIZE = 1 << 16
+# 分块时优先在这些分隔符处截断（不早于块长度的一半）
+SEPARATORS = ("\n\n", "\n", "。", "！", "？", "；", ". ")
+
+# 已导入文本块哈希和各行文档 id 的记录文件，放在索引目录中，重复导入时跳过已有文本块
+LEDGER_FILE = "ingest.sqlite"
+# 文档元数据文件的后缀：docs/a.md 的元数据在 docs/a.md.meta.json
+METADATA_SUFFIX = ".meta.json"
+
+@dataclass
+class IngestStats:
+    """导入统计"""
+    files: int = 0       # 读取的文件数
+    chunks: int = 0      # 切出的文本块数
+    duplicates: int = 0  # 因重复被跳过的文本块数
+    embedded: int = 0    # 写入索引的文本块数
+    batches: int = 0     # embedding 请求批数
+
+def iter_files(root: str, extensions: Tuple[str, ...] = DEFAULT_EXTENSIONS) -> Iterator[str]:
+    """
+    按固定顺序遍历目录下指定扩展名的文件
+    Args:
+        root: 根目录
+        extensions: 扩展名
+    Returns:
+        Iterator[str]: 文件路径
+    """
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        for name in sorted(filenames):
+            if name.lower().endswith(extensions):
+                yield os.path.join(dirpath, name)
+
+def _split_point(buffer: str, chunk_size: int) -> int:
+    window = buffer[:chunk_size]
+    for separator in SEPARATORS:
+        pos = window.rfind(separator)
+        if pos >= chunk_size // 2:
+            return pos + len(separator)
+    return chunk_size
+
+def iter_chunks(f: TextIO, chunk_size: int = DEFAULT_CHUNK_SIZE, overlap: int = DEFAULT_CHUNK_OVERLAP) -> Iterator[str]:
+    """
+    从文本流中按固定长度和重叠切块，只在内存中保留不超过一个块加一个读取块的文本
+    Args:
+        f: 文本流
+        chunk_size: 块长度（字符数）
+        overlap: 相邻块的重叠字符数，必须小于块长度的一半
+    Returns:
+        Iterator[str]: 文本块
+    """
+    if overlap * 2 >= chunk_size:
+        raise ValueError(f"overlap({overlap}) 必须小于 chunk_size({chunk_size}) 的一半")
+    buffer = ""
+    eof = False
+    while True:
+        while not eof and len(buffer) < chunk_size:
+            block = f.read(READ_BLOCK_SIZE)
+            eof = not block
+            buffer += block
+        if eof and len(buffer) <= chunk_size:
+            chunk = buffer.strip()
+            if chunk:
+                yield chunk
+            return
+        end = _split_point(buffer, chunk_size)
+        chunk = buffer[:end].strip()
+        if chunk:
+            yield chunk
+        buffer = buffer[end - overlap:]
+
+class ChunkLedger:
+    """已导入文本块的哈希记录（SQLite），用于跨批次、跨次导入去重（按文档划分，见 chunk_digest）；同时记录每行所属的文档 id 和文档元数据"""
+
+    def __init__(self, path: str):
+        self._db = sqlite3.connect(path)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS chunks (hash BLOB PRIMARY KEY)")
+        self._db.execute("CREATE TABLE IF NOT EXISTS rows (row INTEGER PRIMARY KEY, doc_id TEXT NOT NULL)")
+        self._db.execute("CREATE TABLE IF NOT EXISTS docs (doc_id TEXT PRIMARY KEY, metadata TEXT NOT NULL)")
+
+    def contains(self, digest: bytes) -> bool:
+        return self._db.execute("SELECT 1 FROM chunks WHERE hash = ?", (digest,)).fetchone() is not None
+
+    def add(self, digests: List[bytes], rows: List[Tuple[int, str]], docs: Dict[str, Dict[str, Any]]) -> None:
+        with self._db:
+            self._db.executemany("INSERT OR IGNORE INTO chunks (hash) VALUES (?)", [(d,) for d in digests])
+            self._db.executemany("INSERT OR REPLACE INTO rows (row, doc_id) VALUES (?, ?)", rows)
+            self._db.executemany(
+                "INSERT OR REPLACE INTO docs (doc_id, metadata) VALUES (?, ?)",
+                [(doc_id, json.dumps(metadata, ensure_ascii=False, default=str)) for doc_id, metadata in docs.items()],
+            )
+
+    def iter_documents(self) -> Iterator[Tuple[np.ndarray, Dict[str, Any]]]:
+        """按文档产出 (行号, 元数据)"""
+        cursor = self._db.execute(
+            "SELECT rows.doc_id, rows.row, docs.metadata FROM rows JOIN docs ON docs.doc_id = rows.doc_id "
+            "ORDER BY rows.doc_id, rows.row"
+        )
+        current, rows, metadata = None, [], None
+        for doc_id, row, text in cursor:
+            if doc_id != current:
+                if rows:
+                    yield np.asarray(rows, dtype=np.int64), metadata
+                current, rows, metadata = doc_id, [], json.loads(text)
+            rows.append(row)
+        if rows:
+            yield np.asarray(rows, dtype=np.int64), metadata
+
+    def has_metadata(self) -> bool:
+        return self._db.execute("SELECT 1 FROM docs WHERE metadata != '{}' LIMIT 1").fetchone() is not None
+
+    def close(self) -> None:
+        self._db.close()
+
+def chunk_digest(text: str, doc_id: str) -> bytes:
+    """
+    文本块去重用的哈希，包含文档 id：只跳过同一文档中重复的文本块，
+    多个文档共有的文本块在每个文档下各占一行，删除、更新文档和元数据过滤都不受其他文档影响
+    Args:
+        text: 文本块
+        doc_id: 文档 id
+    Returns:
+        bytes: 哈希
+    """
+    return hashlib.blake2b(doc_id.encode("utf-8") + b"\0" + text.encode("utf-8"), digest_size=16).digest()
+
+def read_metadata(path: str, base: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    文档元数据：公共字段，被文档旁的 <文件名>.meta.json 覆盖
+    Args:
+        path: 文档路径
+        base: 公共字段
+    Returns:
+        Dict[str, Any]: 元数据
+    """
+    metadata = dict(base or {})
+    sidecar = path + METADATA_SUFFIX
+    if os.path.exists(sidecar):
+        with open(sidecar, "r", encoding="utf-8") as f:
+            metadata.update(json.load(f))
+    return metadata
+
+def iter_batches(
+    root: str,
+    ledger: ChunkLedger,
+    pending: Set[bytes],
+    stats: IngestStats,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    overlap: int = DEFAULT_CHUNK_OVERLAP,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    extensions: Tuple[str, ...] = DEFAULT_EXTENSIONS,
+    metadata: Optional[Dict[str, Any]] = None,
+    documents: Optional[Dict[str, Dict[str, Any]]] = None,
+) -> Iterator[List[Tuple[bytes, str, str]]]:
+    """
+    产出去重后的文本块批次，同一文档内重复的文本块只产出一次
+    Args:
+        pending: 已产出但尚未记录到 ledger 的哈希，产出的新哈希会加入其中
+        metadata: 所有文档共有的元数据
+        documents: 读取到的文档的 文档 id -> 元数据 会写入其中
+    Returns:
+        Iterator[List[Tuple[bytes, str, str]]]: (哈希, 文本块, 文档 id) 列表
+    """
+    batch = []
+    for path in iter_files(root, extensions):
+        stats.files += 1
+        doc_id = os.path.relpath(path, root)
+        if documents is not None:
+            documents[doc_id] = read_metadata(path, metadata)
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            for chunk in iter_chunks(f, chunk_size, overlap):
+                stats.chunks += 1
+                digest = chunk_digest(chunk, doc_id)
+                if digest in pending or ledger.contains(digest):
+                    stats.duplicates += 1
+                    continue
+                pending.add(digest)
+                batch.append((digest, chunk, doc_id))
+                if len(batch) == batch_size:
+                    yield batch
+                    batch = []
+    if batch:
+        yield batch
+
+async def _embed_batch(model: Embeddings, batch: List[Tuple[bytes, str, str]]):
+    vectors = await aembed_documents(model, [text for _, text, _ in batch])
+    return batch, np.asarray(vectors, dtype=np.float32)
+
+async def ingest_directory(
+    root: str,
+    index_path: str,
+    embedding_model: Embeddings,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    overlap: int = DEFAULT_CHUNK_OVERLAP,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+    extensions: Tuple[str, ...] = DEFAULT_EXTENSIONS,
+    dtype: str = "float32",
+    keep_exact: bool = False,
+    flush_every: int = DEFAULT_FLUSH_EVERY,
+    lexical: bool = True,
+    metadata: Optional[Dict[str, Any]] = None,
+) -> IngestStats:
+    """
+    把目录中的文档导入知识库索引（已有索引时增量追加）
+    同时在途的 embedding 请求不超过 max_concurrency 批，内存占用与语料规模无关；
+    每 flush_every 批提交一次，中途失败后重新运行会跳过已提交的文本块。
+    Args:
+        root: 文档目录
+        index_path: 知识库索引目录
+        embedding_model: embedding模型
+        chunk_size: 块长度（字符数）
+        overlap: 相邻块的重叠字符数
+        batch_size: 每批 embedding 的文本块数
+        max_concurrency: 同时在途的 embedding 请求数
+        extensions: 读取的文件扩展名
+        dtype: 新建索引时的向量存储类型，float32、float16 或 int8
+        keep_exact: 新建量化索引时是否另存 float32 向量用于精确重打分
+        flush_every: 每追加多少批提交一次
+        lexical: 是否同时写入 BM25 倒排索引
+        metadata: 所有文档共有的元数据（如租户、语言），可被文档的 .meta.json 覆盖
+    Returns:
+        IngestStats: 导入统计
+    """
+    if os.path.exists(os.path.join(index_path, CATALOG_FILE)):
+        raise ValueError(f"知识库已启用增量更新，请改用 segments.upsert_documents 写入: {index_path}")
+    stats = IngestStats()
+    writer = IndexWriter(index_path, dtype=dtype, keep_exact=keep_exact)
+    ledger = ChunkLedger(os.path.join(index_path, LEDGER_FILE))
+    lexical_index = LexicalIndex(os.path.join(index_path, LEXICAL_FILE)) if lexical else None
+    pending: Set[bytes] = set()
+    unflushed: List[bytes] = []
+    unflushed_docs: List[Tuple[int, str]] = []
+    documents: Dict[str, Dict[str, Any]] = {}
+    unflushed_rows: List[Tuple[int, str]] = []
+    in_flight: Set[asyncio.Task] = set()
+
+    def commit() -> None:
+        # 先提交索引再记录哈希：两步之间中断最多导致重复导入，不会丢数据
+        writer.flush()
+        if lexical_index is not None and unflushed_rows:
+            lexical_index.add(*zip(*unflushed_rows))
+        ledger.add(unflushed, unflushed_docs, documents)
+        pending.difference_update(unflushed)
+        unflushed.clear()
+        unflushed_docs.clear()
+        documents.clear()
+        unflushed_rows.clear()
+
+    def append(task: asyncio.Task) -> None:
+        batch, vectors = task.result()
+        texts = [text for _, text, _ in batch]
+        rows = writer.append(vectors, texts)
+        unflushed.extend(digest for digest, _, _ in batch)
+        unflushed_docs.extend(zip(rows, (doc_id for _, _, doc_id in batch)))
+        if lexical_index is not None:
+            unflushed_rows.extend(zip(rows, texts))
+        stats.embedded += len(batch)
+        stats.batches += 1
+        if stats.batches % flush_every == 0:
+            commit()
+
+    async def wait_one() -> None:
+        nonlocal in_flight
+        done, in_flight = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            append(task)
+
+    try:
+        batches = iter_batches(
+            root, ledger, pending, stats, chunk_size, overlap, batch_size, extensions, metadata, documents
+        )
+        for batch in batches:
+            while len(in_flight) >= max_concurrency:
+                await wait_one()
+            in_flight.add(asyncio.create_task(_embed_batch(embedding_model, batch)))
+        while in_flight:
+            await wait_one()
+    finally:
+        for task in in_flight:
+            task.cancel()
+        if in_flight:
+            await asyncio.gather(*in_flight, return_exceptions=True)
+        commit()
+        writer.close()
+        if ledger.has_metadata():
+            write_metadata(index_path, writer.count, ledger.iter_documents())
+        ledger.close()
+        if lexical_index is not None:
+            lexical_index.close()
+    return stats
+
+def main() -> None:
+    import argparse
+
+    from src.models.model_factory import get_model_factory
+
+    parser = argparse.ArgumentParser(description="把目录中的文档导入知识库")
+    parser.add_argument("root", help="文档目录")
+    parser.add_argument("--kb", default="default", help="知识库名称")
+    parser.add_argument("--index-dir", default=None, help="索引根目录，默认使用 KB_INDEX_DIR")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--overlap", type=int, default=DEFAULT_CHUNK_OVERLAP)
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--max-concurrency", type=int, default=DEFAULT_MAX_CONCURRENCY)
+    parser.add_argument("--ext", default=",".join(DEFAULT_EXTENSIONS), help="逗号分隔的文件扩展名")
+    parser.add_argument("--dtype", default="float32", choices=["float32", "float16", "int8"])
+    parser.add_argument("--keep-exact", action="store_true", help="量化存储时另存 float32 向量用于精确重打分")
+    parser.add_argument("--no-lexical", action="store_true", help="不构建 BM25 倒排索引")
+    parser.add_argument("--meta", action="append", default=[], help="所有文档共有的元数据，形如 tenant=acme，可重复")
+    args = parser.parse_args()
+
+    factory = get_model_factory()
+    index_path = os.path.join(args.index_dir or factory.settings.KB_INDEX_DIR, args.kb)
+    stats = asyncio.run(ingest_directory(
+        args.root,
+        index_path,
+        factory.embedding_model,
+        chunk_size=args.chunk_size,
+        overlap=args.overlap,
+        batch_size=args.batch_size,
+        max_concurrency=args.max_concurrency,
+        extensions=tuple(ext.strip() for ext in args.ext.split(",") if ext.strip()),
+        dtype=args.dtype,
+        keep_exact=args.keep_exact,
+        lexical=not args.no_lexical,
+        metadata=dict(item.split("=", 1) for item in args.meta),
+    ))
+    print(f"导入完成: {stats}")
+
+if __name__ == "__main__":
+    main()
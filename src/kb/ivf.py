@@ -0,0 +1,307 @@
+import json
+import os
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+from .vector_store import SearchHit, VectorStore, normalize_rows, top_k_indices
+
+# IVF 索引文件，与向量/文本文件放在同一个知识库目录下
+IVF_META_FILE = "ivf.json"
+IVF_CENTROIDS_FILE = "ivf_centroids.npy"
+IVF_LISTS_FILE = "ivf_lists.npy"
+IVF_OFFSETS_FILE = "ivf_offsets.npy"
+
+# 默认每次检索探测的倒排列表数
+DEFAULT_NPROBE = 8
+# k-means 训练时每个聚类中心最多采样的向量数
+TRAIN_SAMPLES_PER_LIST = 64
+DEFAULT_KMEANS_ITERATIONS = 10
+# 分配聚类时每块相似度矩阵的元素上限（float32 约 64MB）
+ASSIGN_BLOCK_ELEMENTS = 1 << 24
+
+def default_nlist(size: int) -> int:
+    """按数据量估算倒排列表数（约 4 * sqrt(n)）"""
+    return max(1, min(size, int(4 * np.sqrt(size))))
+
+def assign_lists(embeddings: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """
+    把每个向量分配到内积最大的聚类中心，按块计算以限制内存
+    Args:
+        embeddings: 形状为 (n, dim) 的归一化向量矩阵
+        centroids: 形状为 (nlist, dim) 的聚类中心
+    Returns:
+        np.ndarray: 长度为 n 的聚类编号
+    """
+    assignments = np.empty(embeddings.shape[0], dtype=np.int32)
+    block_rows = max(1, ASSIGN_BLOCK_ELEMENTS // centroids.shape[0])
+    for start in range(0, embeddings.shape[0], block_rows):
+        block = np.asarray(embeddings[start:start + block_rows], dtype=np.float32)
+        assignments[start:start + block.shape[0]] = np.argmax(block @ centroids.T, axis=1)
+    return assignments
+
+def train_centroids(
+    embeddings: np.ndarray,
+    nlist: int,
+    iterations: int = DEFAULT_KMEANS_ITERATIONS,
+    seed: int = 0,
+) -> np.ndarray:
+    """
+    在采样数据上训练球面 k-means 聚类中心
+    Args:
+        embeddings: 形状为 (n, dim) 的向量矩阵（可以是量化存储）
+        nlist: 聚类中心数
+        iterations: 迭代次数
+        seed: 随机种子
+    Returns:
+        np.ndarray: 形状为 (nlist, dim) 的归一化聚类中心
+    """
+    rng = np.random.default_rng(seed)
+    size = embeddings.shape[0]
+    sample_size = min(size, nlist * TRAIN_SAMPLES_PER_LIST)
+    sample_rows = np.sort(rng.choice(size, sample_size, replace=False))
+    # 量化存储的行缩放不同，先归一化再训练
+    sample = normalize_rows(embeddings[sample_rows])
+
+    centroids = sample[rng.choice(sample_size, nlist, replace=False)].copy()
+    for _ in range(iterations):
+        assignments = assign_lists(sample, centroids)
+        counts = np.bincount(assignments, minlength=nlist)
+        # 按聚类排序后分段求和
+        grouped = sample[np.argsort(assignments, kind="stable")]
+        starts = np.cumsum(counts) - counts
+        sums = np.zeros_like(centroids)
+        nonempty = counts > 0
+        sums[nonempty] = np.add.reduceat(grouped, starts[nonempty], axis=0)
+        # 空聚类用随机样本重新初始化
+        empty = np.flatnonzero(counts == 0)
+        if empty.size:
+            sums[empty] = sample[rng.choice(sample_size, empty.size, replace=False)]
+        centroids = normalize_rows(sums)
+    return centroids
+
+class IVFVectorStore(VectorStore):
+    """
+    IVF 近似检索向量库：查询只对最相近的 nprobe 个聚类中心下的向量打分
+    建索引之后追加的向量（行号 >= covered）不在倒排列表中，检索时全部精确打分
+    """
+
+    def __init__(
+        self,
+        embeddings: np.ndarray,
+        texts: Sequence[str],
+        centroids: np.ndarray,
+        lists: np.ndarray,
+        list_offsets: np.ndarray,
+        normalized: bool = False,
+        nprobe: int = DEFAULT_NPROBE,
+        scales: Optional[np.ndarray] = None,
+        exact: Optional[np.ndarray] = None,
+    ):
+        """
+        Args:
+            embeddings: 形状为 (n, dim) 的向量矩阵
+            texts: 与向量一一对应的文本块
+            centroids: 形状为 (nlist, dim) 的聚类中心
+            lists: 按聚类编号排列的行号
+            list_offsets: 长度为 nlist + 1 的偏移量，第 i 个列表为 lists[list_offsets[i]:list_offsets[i+1]]
+            normalized: 向量是否已归一化
+            nprobe: 默认探测的列表数
+            scales: int8 存储时每行的缩放系数
+            exact: 量化存储时的 float32 原始向量
+        """
+        super().__init__(embeddings, texts, normalized, scales, exact)
+        self.centroids = centroids
+        self.lists = lists
+        self.list_offsets = list_offsets
+        self.nprobe = nprobe
+
+    @property
+    def nlist(self) -> int:
+        """倒排列表数"""
+        return self.centroids.shape[0]
+
+    @property
+    def covered(self) -> int:
+        """倒排列表覆盖的行数"""
+        return int(self.list_offsets[-1])
+
+    def head(self, count: int) -> "IVFVectorStore":
+        """
+        只包含前 count 条的视图，不复制数据；聚类中心和倒排列表沿用原索引，
+        列表中行号 >= count 的条目在检索时过滤掉
+        Args:
+            count: 条目数
+        Returns:
+            IVFVectorStore: 近似检索向量库
+        """
+        store = super().head(count)
+        return IVFVectorStore(
+            store.embeddings,
+            store.texts,
+            self.centroids,
+            self.lists,
+            self.list_offsets,
+            normalized=True,
+            nprobe=self.nprobe,
+            scales=store.scales,
+            exact=store.exact,
+        )
+
+    @classmethod
+    def build(
+        cls,
+        store: VectorStore,
+        nlist: Optional[int] = None,
+        iterations: int = DEFAULT_KMEANS_ITERATIONS,
+        seed: int = 0,
+        nprobe: int = DEFAULT_NPROBE,
+    ) -> "IVFVectorStore":
+        """
+        为向量库构建 IVF 索引
+        Args:
+            store: 精确检索向量库
+            nlist: 倒排列表数，默认约为 4 * sqrt(n)
+            iterations: k-means 迭代次数
+            seed: 随机种子
+            nprobe: 默认探测的列表数
+        Returns:
+            IVFVectorStore: 近似检索向量库
+        """
+        if store.size == 0:
+            raise ValueError("空知识库无法构建 IVF 索引")
+        nlist = nlist or default_nlist(store.size)
+        centroids = train_centroids(store.embeddings, nlist, iterations, seed)
+        assignments = assign_lists(store.embeddings, centroids)
+        lists = np.argsort(assignments, kind="stable").astype(np.int64)
+        list_offsets = np.zeros(nlist + 1, dtype=np.int64)
+        np.cumsum(np.bincount(assignments, minlength=nlist), out=list_offsets[1:])
+        return cls(
+            store.embeddings,
+            store.texts,
+            centroids,
+            lists,
+            list_offsets,
+            normalized=True,
+            nprobe=nprobe,
+            scales=store.scales,
+            exact=store.exact,
+        )
+
+    def search(
+        self,
+        query: np.ndarray,
+        top_k: int = 3,
+        min_score: Optional[float] = None,
+        nprobe: Optional[int] = None,
+        rescore: int = 0,
+        mask: Optional[np.ndarray] = None,
+    ) -> List[SearchHit]:
+        """
+        近似余弦相似度 top-k 检索
+        Args:
+            query: 查询向量
+            top_k: 返回数量
+            min_score: 最低相似度，低于该值的结果被丢弃
+            nprobe: 探测的列表数，越大召回越高、延迟越大，默认使用构造时的值
+            rescore: 量化存储时用 float32 向量重打分的候选数，0 表示不重打分
+            mask: 长度为 size 的布尔掩码，只返回为 True 的行
+        Returns:
+            List[SearchHit]: 按相似度降序排列的结果
+        """
+        if self.size == 0:
+            return []
+        query = normalize_rows(query)
+        probes = top_k_indices(self.centroids @ query, nprobe or self.nprobe)
+        parts = [self.lists[self.list_offsets[c]:self.list_offsets[c + 1]] for c in probes]
+        if self.covered < self.size:
+            parts.append(np.arange(self.covered, self.size, dtype=np.int64))
+        rows = np.concatenate(parts)
+        if self.covered > self.size:
+            # head 截取的视图：倒排列表中还有截取范围之外的行
+            rows = rows[rows < self.size]
+        if mask is not None:
+            rows = rows[mask[rows]]
+            # 探测到的列表中满足掩码的行不足 top_k 时对掩码内的全部行精确检索，过滤不会让结果少于 top_k
+            if rows.size < top_k:
+                return VectorStore.search(self, query, top_k, min_score, rescore=rescore, mask=mask)
+        return self.search_rows(query, rows, top_k, min_score, rescore)
+
+    def save_ivf(self, path: str) -> None:
+        """
+        把 IVF 索引写入知识库目录（向量和文本文件不变）
+        Args:
+            path: 索引目录
+        """
+        np.save(os.path.join(path, IVF_CENTROIDS_FILE), self.centroids)
+        np.save(os.path.join(path, IVF_LISTS_FILE), self.lists)
+        np.save(os.path.join(path, IVF_OFFSETS_FILE), self.list_offsets)
+        # 元信息最后写入，存在即表示 IVF 文件完整
+        tmp_path = os.path.join(path, IVF_META_FILE + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"nlist": self.nlist, "covered": self.covered, "nprobe": self.nprobe}, f)
+        os.replace(tmp_path, os.path.join(path, IVF_META_FILE))
+
+    @classmethod
+    def load(cls, path: str) -> "IVFVectorStore":
+        """
+        以 mmap 方式打开带 IVF 索引的知识库目录
+        Args:
+            path: 索引目录
+        Returns:
+            IVFVectorStore: 近似检索向量库
+        """
+        store = VectorStore.load(path)
+        with open(os.path.join(path, IVF_META_FILE), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        return cls(
+            store.embeddings,
+            store.texts,
+            np.load(os.path.join(path, IVF_CENTROIDS_FILE)),
+            np.load(os.path.join(path, IVF_LISTS_FILE), mmap_mode="r"),
+            np.load(os.path.join(path, IVF_OFFSETS_FILE)),
+            normalized=True,
+            nprobe=meta.get("nprobe", DEFAULT_NPROBE),
+            scales=store.scales,
+            exact=store.exact,
+        )
+
+def has_ivf(path: str) -> bool:
+    """知识库目录中是否有 IVF 索引"""
+    return os.path.exists(os.path.join(path, IVF_META_FILE))
+
+def load_store(path: str) -> VectorStore:
+    """
+    打开知识库目录，有 IVF 索引时返回近似检索向量库，否则返回精确检索向量库
+    Args:
+        path: 索引目录
+    Returns:
+        VectorStore: 向量库
+    """
+    return IVFVectorStore.load(path) if has_ivf(path) else VectorStore.load(path)
+
+def build_ivf(path: str, nlist: Optional[int] = None, nprobe: int = DEFAULT_NPROBE, seed: int = 0) -> IVFVectorStore:
+    """
+    为已有知识库目录构建并保存 IVF 索引
+    Args:
+        path: 索引目录
+        nlist: 倒排列表数
+        nprobe: 默认探测的列表数
+        seed: 随机种子
+    Returns:
+        IVFVectorStore: 近似检索向量库
+    """
+    store = IVFVectorStore.build(VectorStore.load(path), nlist=nlist, seed=seed, nprobe=nprobe)
+    store.save_ivf(path)
+    return store
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="为知识库目录构建 IVF 索引")
+    parser.add_argument("path", help="知识库索引目录")
+    parser.add_argument("--nlist", type=int, default=None, help="倒排列表数，默认约为 4 * sqrt(n)")
+    parser.add_argument("--nprobe", type=int, default=DEFAULT_NPROBE, help="默认探测的列表数")
+    args = parser.parse_args()
+    ivf = build_ivf(args.path, nlist=args.nlist, nprobe=args.nprobe)
+    print(f"IVF 索引已写入 {args.path}: {ivf.size} 条, nlist={ivf.nlist}")
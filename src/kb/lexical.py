@@ -0,0 +1,128 @@
+import os
+import re
+import sqlite3
+import threading
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+# 倒排索引文件，与向量/文本文件放在同一个知识库目录下，FTS5 的 rowid 即向量索引的行号
+LEXICAL_FILE = "lexical.sqlite"
+
+# 英文单词、数字和带分隔符的编号（如 AB-1234、v2.0.1）
+_CODE_PATTERN = re.compile(r"[A-Za-z0-9]+(?:[-_./][A-Za-z0-9]+)*")
+_CJK_PATTERN = re.compile(r"[㐀-䶿一-鿿豈-﫿]+")
+_CODE_SEPARATORS = re.compile(r"[-_./]")
+
+def tokenize(text: str) -> List[str]:
+    """
+    切分检索词：中文按相邻两字切分，英文和编号转小写；
+    带分隔符的编号同时保留去掉分隔符的整体和各段，AB-1234 与 ab1234 能互相匹配
+    Args:
+        text: 文本
+    Returns:
+        List[str]: 检索词
+    """
+    tokens = []
+    for match in _CODE_PATTERN.finditer(text):
+        code = match.group().lower()
+        parts = _CODE_SEPARATORS.split(code)
+        if len(parts) > 1:
+            tokens.append("".join(parts))
+        tokens.extend(parts)
+    for match in _CJK_PATTERN.finditer(text):
+        run = match.group()
+        if len(run) == 1:
+            tokens.append(run)
+        else:
+            tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+    return tokens
+
+class LexicalIndex:
+    """基于 SQLite FTS5 的 BM25 倒排索引"""
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path: SQLite 文件路径
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("CREATE VIRTUAL TABLE IF NOT EXISTS fts USING fts5(tokens, tokenize='unicode61')")
+
+    def add(self, rows: Iterable[int], texts: Iterable[str]) -> None:
+        """
+        写入一批文本块
+        Args:
+            rows: 向量索引中的行号
+            texts: 文本块
+        """
+        records = [(int(row), " ".join(tokenize(text))) for row, text in zip(rows, texts)]
+        with self._lock:
+            self._db.execute("BEGIN")
+            self._db.executemany("INSERT OR REPLACE INTO fts (rowid, tokens) VALUES (?, ?)", records)
+            self._db.execute("COMMIT")
+
+    def search(self, query: str, limit: int) -> List[Tuple[int, float]]:
+        """
+        BM25 检索
+        Args:
+            query: 查询文本
+            limit: 返回数量
+        Returns:
+            List[Tuple[int, float]]: (行号, BM25 分数) 列表，分数越大越相关
+        """
+        tokens = sorted(set(tokenize(query)))
+        if not tokens:
+            return []
+        expression = " OR ".join(f'"{token}"' for token in tokens)
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT rowid, bm25(fts) FROM fts WHERE fts MATCH ? ORDER BY bm25(fts) LIMIT ?",
+                (expression, limit),
+            ).fetchall()
+        # FTS5 的 bm25() 越小越相关，取反后与向量相似度方向一致
+        return [(row, -score) for row, score in rows]
+
+    @property
+    def size(self) -> int:
+        """已索引的文本块数"""
+        with self._lock:
+            return self._db.execute("SELECT count(*) FROM fts").fetchone()[0]
+
+    def close(self) -> None:
+        """关闭连接（等待进行中的查询结束）"""
+        with self._lock:
+            self._db.close()
+
+def open_lexical(path: str) -> Optional[LexicalIndex]:
+    """打开知识库目录中的倒排索引，不存在时返回None"""
+    file_path = os.path.join(path, LEXICAL_FILE)
+    return LexicalIndex(file_path) if os.path.exists(file_path) else None
+
+def build_lexical(path: str, texts: Sequence[str], batch_size: int = 10000) -> LexicalIndex:
+    """
+    为已有知识库目录补建倒排索引（从已索引的条目之后继续）
+    Args:
+        path: 索引目录
+        texts: 向量索引中的文本块
+        batch_size: 每批写入的条数
+    Returns:
+        LexicalIndex: 倒排索引
+    """
+    index = LexicalIndex(os.path.join(path, LEXICAL_FILE))
+    for start in range(index.size, len(texts), batch_size):
+        end = min(start + batch_size, len(texts))
+        index.add(range(start, end), texts[start:end])
+    return index
+
+if __name__ == "__main__":
+    import argparse
+
+    from .vector_store import VectorStore
+
+    parser = argparse.ArgumentParser(description="为知识库目录构建 BM25 倒排索引")
+    parser.add_argument("path", help="知识库索引目录")
+    args = parser.parse_args()
+    lexical = build_lexical(args.path, VectorStore.load(args.path).texts)
+    print(f"倒排索引已写入 {args.path}: {lexical.size} 条")
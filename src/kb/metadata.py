@@ -0,0 +1,352 @@
+"""
+元数据过滤：按字段（租户、语言、文档类型、日期等）建立倒排列表，检索前把过滤表达式编译为行掩码
+
+    metadata.json         条目数、各字段排好序的取值和每个取值在倒排数组中的区间
+    metadata-<n>.npy      所有字段的倒排行号，按 字段 -> 取值 -> 行号 排列
+
+取值统一转为字符串比较，日期使用 ISO 格式（2024-01-31）时范围过滤即按日期先后。
+过滤表达式可以是字符串或字典：
+
+    tenant == "acme" and language in ["zh", "en"] and date >= "2024-01-01"
+    {"tenant": "acme", "language": ["zh", "en"], "date": {"gte": "2024-01-01"}}
+"""
+import ast
+import bisect
+import datetime
+import functools
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+METADATA_FILE = "metadata.json"
+METADATA_VERSION = 1
+# 每个段缓存的过滤掩码数，同一租户/语言的过滤条件会被反复使用
+MASK_CACHE_SIZE = 64
+# 写入时从临时 SQLite 表中每次读出的倒排行号数
+SPILL_BLOCK_ROWS = 65536
+
+def normalize_value(value: Any) -> str:
+    """把元数据取值或过滤常量转为可比较的字符串"""
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    return str(value)
+
+class MetadataIndex:
+    """一个索引目录的元数据倒排索引（倒排数组通过 mmap 打开）"""
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path: 索引目录
+        """
+        with open(os.path.join(path, METADATA_FILE), "r", encoding="utf-8") as f:
+            header = json.load(f)
+        if header.get("version") != METADATA_VERSION:
+            raise ValueError(f"不支持的元数据索引版本: {header.get('version')}")
+        self.path = path
+        self.count: int = header["count"]
+        self.fields: Dict[str, Tuple[List[str], List[int]]] = {
+            name: (field["values"], field["offsets"]) for name, field in header["fields"].items()
+        }
+        self.rows = np.load(os.path.join(path, header["file"]), mmap_mode="r")
+        self._masks: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def value_rows(self, field: str, value: Any) -> np.ndarray:
+        """字段取值等于 value 的行号"""
+        values, offsets = self.fields.get(field, ((), ()))
+        value = normalize_value(value)
+        i = bisect.bisect_left(values, value)
+        if i == len(values) or values[i] != value:
+            return self.rows[:0]
+        return self.rows[offsets[i]:offsets[i + 1]]
+
+    def range_rows(
+        self,
+        field: str,
+        low: Any = None,
+        high: Any = None,
+        low_inclusive: bool = True,
+        high_inclusive: bool = True,
+    ) -> np.ndarray:
+        """字段取值在 [low, high] 区间内的行号（None 表示不限），取值有序，结果是倒排数组中的一段"""
+        values, offsets = self.fields.get(field, ((), ()))
+        start, end = 0, len(values)
+        if low is not None:
+            low = normalize_value(low)
+            start = bisect.bisect_left(values, low) if low_inclusive else bisect.bisect_right(values, low)
+        if high is not None:
+            high = normalize_value(high)
+            end = bisect.bisect_right(values, high) if high_inclusive else bisect.bisect_left(values, high)
+        if start >= end:
+            return self.rows[:0]
+        return self.rows[offsets[start]:offsets[end]]
+
+    def mask(self, metadata_filter: "MetadataFilter") -> np.ndarray:
+        """
+        过滤条件对应的行掩码（长度为 count），结果按表达式缓存
+        Args:
+            metadata_filter: 编译后的过滤条件
+        Returns:
+            np.ndarray: 布尔掩码，调用方不应修改
+        """
+        with self._lock:
+            mask = self._masks.get(metadata_filter.key)
+            if mask is not None:
+                self._masks.move_to_end(metadata_filter.key)
+                return mask
+        mask = metadata_filter.evaluate(self)
+        with self._lock:
+            self._masks[metadata_filter.key] = mask
+            while len(self._masks) > MASK_CACHE_SIZE:
+                self._masks.popitem(last=False)
+        return mask
+
+    def postings(self) -> Iterable[Tuple[np.ndarray, Dict[str, str]]]:
+        """按 (行号, {字段: 取值}) 遍历全部倒排列表，用于合并或追加后重写索引"""
+        for name, (values, offsets) in self.fields.items():
+            for i, value in enumerate(values):
+                yield self.rows[offsets[i]:offsets[i + 1]], {name: value}
+
+    def rows_mask(self, rows: np.ndarray) -> np.ndarray:
+        """行号集合对应的掩码"""
+        mask = np.zeros(self.count, dtype=bool)
+        mask[rows] = True
+        return mask
+
+    def close(self) -> None:
+        """释放 mmap 的倒排数组和掩码缓存"""
+        with self._lock:
+            self._masks.clear()
+        self.rows = self.rows[:0].copy()
+
+def open_metadata(path: str) -> Optional[MetadataIndex]:
+    """打开索引目录中的元数据索引，不存在时返回None"""
+    return MetadataIndex(path) if os.path.exists(os.path.join(path, METADATA_FILE)) else None
+
+def _iter_postings(groups: Iterable[Tuple[Sequence[int], Optional[Dict[str, Any]]]]) -> Iterator[Tuple[str, str, int]]:
+    """把 (行号, 元数据) 序列展开为 (字段, 取值, 行号)"""
+    for rows, metadata in groups:
+        rows = np.asarray(rows, dtype=np.int64).tolist()
+        for name, value in (metadata or {}).items():
+            if value is None:
+                continue
+            for item in value if isinstance(value, (list, tuple, set)) else (value,):
+                item = normalize_value(item)
+                for row in rows:
+                    yield name, item, row
+
+def write_metadata(path: str, count: int, groups: Iterable[Tuple[Sequence[int], Optional[Dict[str, Any]]]]) -> None:
+    """
+    写入元数据索引（整体替换已有索引，已打开的旧索引仍然可用）
+    倒排行号先写入索引目录下的临时 SQLite 表排序去重，再按块流式写出，内存占用与语料规模无关
+    Args:
+        path: 索引目录
+        count: 索引条目数
+        groups: (行号, 元数据) 序列，通常一个文档一组；列表取值表示多值字段（如标签）；可以是生成器
+    """
+    fd, spill_path = tempfile.mkstemp(prefix="metadata-", suffix=".sqlite", dir=path)
+    os.close(fd)
+    db = sqlite3.connect(spill_path, isolation_level=None)
+    try:
+        db.execute("PRAGMA journal_mode=OFF")
+        db.execute("PRAGMA synchronous=OFF")
+        db.execute(
+            "CREATE TABLE postings (field TEXT NOT NULL, value TEXT NOT NULL, row INTEGER NOT NULL, "
+            "PRIMARY KEY (field, value, row)) WITHOUT ROWID"
+        )
+        db.execute("BEGIN")
+        db.executemany("INSERT OR IGNORE INTO postings VALUES (?, ?, ?)", _iter_postings(groups))
+        db.execute("COMMIT")
+
+        # 文本按 UTF-8 字节比较，与 Python 字符串排序一致，读取时可以二分查找
+        fields, position = {}, 0
+        for name, value, size in db.execute(
+            "SELECT field, value, COUNT(*) FROM postings GROUP BY field, value ORDER BY field, value"
+        ):
+            field = fields.setdefault(name, {"values": [], "offsets": [position]})
+            position += size
+            field["values"].append(value)
+            field["offsets"].append(position)
+
+        # 新的倒排数组换一个文件名写入，元数据头原子替换后才删除旧文件
+        header_path = os.path.join(path, METADATA_FILE)
+        previous = None
+        if os.path.exists(header_path):
+            with open(header_path, "r", encoding="utf-8") as f:
+                previous = json.load(f)["file"]
+        generation = int(previous[len("metadata-"):-len(".npy")]) + 1 if previous else 1
+        file_name = f"metadata-{generation:06d}.npy"
+        with open(os.path.join(path, file_name), "wb") as f:
+            np.lib.format.write_array_header_1_0(
+                f, {"descr": np.lib.format.dtype_to_descr(np.dtype(np.int64)), "fortran_order": False, "shape": (position,)}
+            )
+            cursor = db.execute("SELECT row FROM postings ORDER BY field, value, row")
+            while True:
+                block = cursor.fetchmany(SPILL_BLOCK_ROWS)
+                if not block:
+                    break
+                f.write(np.fromiter((row for row, in block), dtype=np.int64, count=len(block)).tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+    finally:
+        db.close()
+        os.remove(spill_path)
+    tmp_path = header_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"version": METADATA_VERSION, "count": count, "file": file_name, "fields": fields}, f, ensure_ascii=False)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, header_path)
+    if previous and previous != file_name:
+        try:
+            os.remove(os.path.join(path, previous))
+        except FileNotFoundError:
+            pass
+
+Evaluator = Callable[[MetadataIndex], np.ndarray]
+
+class MetadataFilter(NamedTuple):
+    """编译后的过滤条件"""
+    key: str              # 规范化的表达式，用作掩码缓存键
+    evaluate: Evaluator   # 计算长度为 index.count 的行掩码
+
+_COMPARE_OPERATORS = {
+    ast.Eq: "eq", ast.NotEq: "ne", ast.In: "in", ast.NotIn: "not_in",
+    ast.Lt: "lt", ast.LtE: "lte", ast.Gt: "gt", ast.GtE: "gte",
+}
+# 常量写在左边时（"2024-01-01" <= date）比较方向取反
+_MIRRORED = {"lt": "gt", "lte": "gte", "gt": "lt", "gte": "lte", "eq": "eq", "ne": "ne"}
+
+def _compare(field: str, operator: str, value: Any) -> Evaluator:
+    if operator in ("in", "not_in", "eq", "ne"):
+        values = value if isinstance(value, (list, tuple, set)) else (value,)
+        if operator in ("in", "not_in") and not isinstance(value, (list, tuple, set)):
+            raise ValueError(f"字段 {field} 的 in 条件需要列表")
+
+        def evaluate(index: MetadataIndex) -> np.ndarray:
+            # 空列表时没有行命中：in 为全 False，not_in 为全 True
+            mask = index.rows_mask(np.concatenate([index.rows[:0]] + [index.value_rows(field, v) for v in values]))
+            return ~mask if operator in ("not_in", "ne") else mask
+        return evaluate
+    if operator not in ("lt", "lte", "gt", "gte"):
+        raise ValueError(f"不支持的比较操作: {operator}")
+    if operator in ("gt", "gte"):
+        return lambda index: index.rows_mask(index.range_rows(field, low=value, low_inclusive=operator == "gte"))
+    return lambda index: index.rows_mask(index.range_rows(field, high=value, high_inclusive=operator == "lte"))
+
+def _all(evaluators: List[Evaluator]) -> Evaluator:
+    if len(evaluators) == 1:
+        return evaluators[0]
+
+    def evaluate(index: MetadataIndex) -> np.ndarray:
+        mask = evaluators[0](index).copy()
+        for evaluator in evaluators[1:]:
+            mask &= evaluator(index)
+        return mask
+    return evaluate
+
+def _any(evaluators: List[Evaluator]) -> Evaluator:
+    def evaluate(index: MetadataIndex) -> np.ndarray:
+        mask = evaluators[0](index).copy()
+        for evaluator in evaluators[1:]:
+            mask |= evaluator(index)
+        return mask
+    return evaluate
+
+def _literal(node: ast.AST, expression: str) -> Any:
+    try:
+        return ast.literal_eval(node)
+    except ValueError:
+        raise ValueError(f"过滤表达式中只能与常量比较: {expression}") from None
+
+def _compile_ast(node: ast.AST, expression: str) -> Evaluator:
+    if isinstance(node, ast.BoolOp):
+        evaluators = [_compile_ast(value, expression) for value in node.values]
+        return _all(evaluators) if isinstance(node.op, ast.And) else _any(evaluators)
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.Not):
+        operand = _compile_ast(node.operand, expression)
+        return lambda index: ~operand(index)
+    if isinstance(node, ast.Compare):
+        # 支持链式比较：'2024-01-01' <= date < '2024-02-01'
+        evaluators = []
+        operands = [node.left] + node.comparators
+        for left, op, right in zip(operands, node.ops, operands[1:]):
+            operator = _COMPARE_OPERATORS.get(type(op))
+            if operator is None:
+                raise ValueError(f"不支持的比较操作: {expression}")
+            if isinstance(left, ast.Name):
+                evaluators.append(_compare(left.id, operator, _literal(right, expression)))
+            elif isinstance(right, ast.Name) and operator in _MIRRORED:
+                evaluators.append(_compare(right.id, _MIRRORED[operator], _literal(left, expression)))
+            else:
+                raise ValueError(f"比较的一侧必须是字段名: {expression}")
+        return _all(evaluators)
+    raise ValueError(f"不支持的过滤表达式: {expression}")
+
+def _compile_dict(conditions: Dict[str, Any]) -> Evaluator:
+    evaluators = []
+    for field, condition in conditions.items():
+        if isinstance(condition, dict):
+            for operator, value in condition.items():
+                evaluators.append(_compare(field, operator, value))
+        elif isinstance(condition, (list, tuple)):
+            evaluators.append(_compare(field, "in", condition))
+        else:
+            evaluators.append(_compare(field, "eq", condition))
+    if not evaluators:
+        raise ValueError("过滤条件为空")
+    return _all(evaluators)
+
+@functools.lru_cache(maxsize=1024)
+def _compile_key(key: str) -> MetadataFilter:
+    if key.startswith("{"):
+        return MetadataFilter(key, _compile_dict(json.loads(key)))
+    try:
+        tree = ast.parse(key, mode="eval")
+    except SyntaxError:
+        raise ValueError(f"过滤表达式语法错误: {key}") from None
+    return MetadataFilter(key, _compile_ast(tree.body, key))
+
+def compile_filter(expression: Union[str, Dict[str, Any], None]) -> Optional[MetadataFilter]:
+    """
+    编译过滤表达式，相同的表达式只编译一次
+    Args:
+        expression: 字符串表达式或字典条件，空值表示不过滤
+    Returns:
+        Optional[MetadataFilter]: 编译后的过滤条件
+    """
+    if not expression:
+        return None
+    if isinstance(expression, dict):
+        return _compile_key(json.dumps(expression, sort_keys=True, ensure_ascii=False, default=normalize_value))
+    expression = expression.strip()
+    if expression.startswith("{"):
+        # JSON 字符串形式的字典条件
+        return _compile_key(json.dumps(json.loads(expression), sort_keys=True, ensure_ascii=False))
+    return _compile_key(expression)
+
+def filter_mask(index: Optional[MetadataIndex], metadata_filter: MetadataFilter, size: int) -> np.ndarray:
+    """
+    过滤条件在一个向量库上的行掩码；元数据索引之后追加、尚未建索引的行视为不满足条件
+    Args:
+        index: 元数据索引，None 表示没有元数据
+        metadata_filter: 编译后的过滤条件
+        size: 向量库条目数
+    Returns:
+        np.ndarray: 长度为 size 的布尔掩码
+    """
+    mask = np.zeros(size, dtype=bool)
+    if index is not None:
+        matched = index.mask(metadata_filter)
+        n = min(size, matched.shape[0])
+        mask[:n] = matched[:n]
+    return mask
@@ -0,0 +1,75 @@
+import functools
+import os
+import threading
+from typing import Dict
+
+from .segments import KnowledgeBase
+
+class KnowledgeBaseRegistry:
+    """
+    知识库注册表：按名称从本地索引根目录打开知识库，打开后在进程内复用
+    """
+
+    def __init__(self, root_dir: str):
+        """
+        Args:
+            root_dir: 索引根目录，每个知识库是其下的一个子目录
+        """
+        self.root_dir = root_dir
+        self._stores: Dict[str, KnowledgeBase] = {}
+        self._lock = threading.Lock()
+
+    def path_of(self, name: str) -> str:
+        """
+        知识库索引目录，名称只能是索引根目录下的一级子目录名
+        Args:
+            name: 知识库名称
+        Returns:
+            str: 索引目录
+        """
+        if not name or ".." in name or os.sep in name or (os.altsep and os.altsep in name):
+            raise ValueError(f"非法的知识库名称: {name!r}")
+        return os.path.join(self.root_dir, name)
+
+    def get(self, name: str) -> KnowledgeBase:
+        """
+        获取知识库，首次访问时从磁盘打开；之后每次访问检查 catalog，有新提交时刷新快照
+        Args:
+            name: 知识库名称
+        Returns:
+            KnowledgeBase: 知识库
+        """
+        kb = self._stores.get(name)
+        if kb is None:
+            with self._lock:
+                kb = self._stores.get(name)
+                if kb is None:
+                    path = self.path_of(name)
+                    if not os.path.isdir(path):
+                        raise FileNotFoundError(f"知识库索引不存在: {path}")
+                    kb = self._stores[name] = KnowledgeBase(path)
+        kb.refresh_if_changed()
+        return kb
+
+    def register(self, name: str, kb: KnowledgeBase) -> None:
+        """注册一个已打开的知识库"""
+        with self._lock:
+            self._stores[name] = kb
+
+    def invalidate(self, name: str) -> None:
+        """丢弃已打开的知识库，下次访问时重新打开"""
+        with self._lock:
+            kb = self._stores.pop(name, None)
+        if kb is not None:
+            kb.close()
+
+@functools.lru_cache(maxsize=None)
+def get_registry(root_dir: str) -> KnowledgeBaseRegistry:
+    """
+    获取进程级共享的知识库注册表，同一索引根目录只加载一次
+    Args:
+        root_dir: 索引根目录
+    Returns:
+        KnowledgeBaseRegistry: 注册表
+    """
+    return KnowledgeBaseRegistry(root_dir)
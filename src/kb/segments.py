@@ -0,0 +1,718 @@
+"""
+可增量更新的知识库：按文档 id 写入、替换和删除，不必整库重建
+
+    <kb>/catalog.sqlite     段列表（各段已提交的条目数）、文本块所属文档、删除标记（墓碑）
+    <kb>/segments/<name>/   每个段是一个普通的索引目录，可带 IVF 和倒排索引
+    <kb>/header.json ...    导入流水线直接写入的索引，作为名为 "." 的段接入
+
+新数据只追加到当前的增量段，替换和删除只在 catalog 中给旧行打墓碑；每次写入是一个 SQLite 事务。
+每个段带自己的元数据倒排索引（metadata.py），增量段每次写入后重写，合并时按行号映射合并。
+读者持有不可变的快照（各段向量库 + 可见行掩码），写入提交后整体替换快照，查询不加锁。
+后台合并把所有段中未删除的行重写为一个新的主段，重写期间查询和写入照常进行，只有最后的提交持有写锁。
+
+    python -m src.kb.segments data/kb/default info
+    python -m src.kb.segments data/kb/default upsert docs/a.md docs/b.md
+    python -m src.kb.segments data/kb/default delete docs/a.md
+    python -m src.kb.segments data/kb/default compact
+"""
+import asyncio
+import io
+import os
+import shutil
+import sqlite3
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from itertools import chain, repeat
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from src.models.async_support import aembed_documents
+
+from .hybrid import DEFAULT_RRF_K, SEARCH_MODE_VECTOR, merge_hits
+from .hybrid import retrieve as retrieve_segment
+from .index_format import (
+    CATALOG_FILE,
+    EMBEDDINGS_FILE,
+    EXACT_FILE,
+    HEADER_FILE,
+    OFFSETS_FILE,
+    SCALES_FILE,
+    TEXTS_FILE,
+    IndexWriter,
+    read_header,
+)
+from .ingest import DEFAULT_BATCH_SIZE, DEFAULT_CHUNK_OVERLAP, DEFAULT_CHUNK_SIZE, LEDGER_FILE, iter_chunks
+from .ivf import IVF_CENTROIDS_FILE, IVF_LISTS_FILE, IVF_META_FILE, IVF_OFFSETS_FILE, build_ivf, has_ivf, load_store
+from .lexical import LEXICAL_FILE, LexicalIndex, build_lexical, open_lexical
+from .metadata import (
+    MASK_CACHE_SIZE,
+    METADATA_FILE,
+    MetadataFilter,
+    MetadataIndex,
+    filter_mask,
+    open_metadata,
+    write_metadata,
+)
+from .vector_store import SAVE_BLOCK_ROWS, SearchHit, VectorStore
+
+SEGMENTS_DIR = "segments"
+# 导入流水线直接写在知识库目录下的索引
+ROOT_SEGMENT = "."
+# 根目录段的索引文件，合并后只删除这些；导入记录、catalog 和用户放在目录下的其他文件保留
+ROOT_INDEX_FILES = (
+    HEADER_FILE, EMBEDDINGS_FILE, SCALES_FILE, EXACT_FILE, OFFSETS_FILE, TEXTS_FILE,
+    IVF_META_FILE, IVF_CENTROIDS_FILE, IVF_LISTS_FILE, IVF_OFFSETS_FILE,
+    LEXICAL_FILE, METADATA_FILE,
+)
+# 索引文件写入时的临时文件和 SQLite 的日志文件
+_ROOT_INDEX_SUFFIXES = ("", ".tmp", "-wal", "-shm", "-journal")
+# 增量段超过这么多行后封存，之后的写入进入新的增量段
+DEFAULT_MAX_DELTA_ROWS = 100000
+# 段数超过该值时写入后自动启动后台合并，0 表示不自动合并
+DEFAULT_AUTO_COMPACT_SEGMENTS = 8
+# 一条 SQL 最多带的参数数（低于 SQLite 默认的变量数上限）
+SQL_CHUNK = 500
+
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value)",
+    "CREATE TABLE IF NOT EXISTS segments ("
+    "name TEXT PRIMARY KEY, seq INTEGER NOT NULL, count INTEGER NOT NULL, sealed INTEGER NOT NULL)",
+    "CREATE TABLE IF NOT EXISTS chunks ("
+    "segment TEXT NOT NULL, row INTEGER NOT NULL, doc_id TEXT NOT NULL, PRIMARY KEY (segment, row)) WITHOUT ROWID",
+    "CREATE INDEX IF NOT EXISTS chunks_doc ON chunks (doc_id)",
+    "CREATE TABLE IF NOT EXISTS tombstones ("
+    "segment TEXT NOT NULL, row INTEGER NOT NULL, PRIMARY KEY (segment, row)) WITHOUT ROWID",
+)
+
+@contextmanager
+def _transaction(db: sqlite3.Connection):
+    """写事务，开始时即取得写锁"""
+    db.execute("BEGIN IMMEDIATE")
+    try:
+        yield db
+    except BaseException:
+        db.execute("ROLLBACK")
+        raise
+    db.execute("COMMIT")
+
+def _meta(db: sqlite3.Connection, key: str):
+    return db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()[0]
+
+def _bump_generation(db: sqlite3.Connection) -> None:
+    db.execute("UPDATE meta SET value = value + 1 WHERE key = 'generation'")
+
+def _remap_postings(moved: List[Tuple[MetadataIndex, np.ndarray]]) -> Iterable[Tuple[np.ndarray, Dict[str, str]]]:
+    """按 旧行号 -> 新行号 映射各段的倒排列表，丢弃映射为 -1 的已删除行"""
+    for metadata, new_rows in moved:
+        for old_rows, values in metadata.postings():
+            rows = new_rows[old_rows[old_rows < new_rows.size]]
+            yield rows[rows >= 0], values
+
+@dataclass(frozen=True)
+class Segment:
+    """快照中的一个段"""
+    name: str
+    store: VectorStore                  # 截取到已提交条目数的向量库
+    lexical: Optional[LexicalIndex]     # 倒排索引
+    live: Optional[np.ndarray]          # 可见行掩码，None 表示全部可见
+    metadata: Optional[MetadataIndex] = None
+    masks: Dict[str, np.ndarray] = field(default_factory=dict, compare=False, repr=False)
+
+    def mask(self, metadata_filter: Optional[MetadataFilter]) -> Optional[np.ndarray]:
+        """
+        可见且满足过滤条件的行掩码，按过滤表达式缓存
+        Args:
+            metadata_filter: 编译后的过滤条件，None 表示不过滤
+        Returns:
+            Optional[np.ndarray]: 长度为 store.size 的布尔掩码，None 表示全部可见
+        """
+        if metadata_filter is None:
+            return self.live
+        mask = self.masks.get(metadata_filter.key)
+        if mask is None:
+            mask = filter_mask(self.metadata, metadata_filter, self.store.size)
+            if self.live is not None:
+                mask &= self.live
+            if len(self.masks) >= MASK_CACHE_SIZE:
+                self.masks.clear()
+            self.masks[metadata_filter.key] = mask
+        return mask
+
+@dataclass(frozen=True)
+class Snapshot:
+    """某一代 catalog 对应的只读视图"""
+    generation: int
+    segments: Tuple[Segment, ...]
+
+    @property
+    def size(self) -> int:
+        """可见的文本块数"""
+        return sum(
+            segment.store.size if segment.live is None else int(np.count_nonzero(segment.live))
+            for segment in self.segments
+        )
+
+class KnowledgeBase:
+    """
+    可增量更新的知识库
+    同一知识库只允许一个进程写入；查询可以在任意进程进行，catalog 有新提交时刷新快照
+    """
+
+    def __init__(
+        self,
+        path: str,
+        max_delta_rows: int = DEFAULT_MAX_DELTA_ROWS,
+        auto_compact_segments: int = DEFAULT_AUTO_COMPACT_SEGMENTS,
+    ):
+        """
+        Args:
+            path: 知识库目录
+            max_delta_rows: 增量段的最大行数
+            auto_compact_segments: 段数超过该值时写入后自动启动后台合并，0 表示不自动合并
+        """
+        self.path = path
+        self.max_delta_rows = max_delta_rows
+        self.auto_compact_segments = auto_compact_segments
+        self._db: Optional[sqlite3.Connection] = None
+        self._data_version: Optional[int] = None
+        self._opened: Dict[str, Tuple[VectorStore, Optional[LexicalIndex], Optional[MetadataIndex]]] = {}
+        self._db_lock = threading.Lock()          # 连接在线程间共享
+        self._snapshot_lock = threading.Lock()
+        self._write_lock = threading.Lock()       # 串行化写入和合并提交
+        self._compaction_lock = threading.Lock()
+        self._compaction: Optional[threading.Thread] = None
+        self.snapshot = self._load_snapshot()
+
+    def segment_path(self, name: str) -> str:
+        """段的索引目录"""
+        return self.path if name == ROOT_SEGMENT else os.path.join(self.path, SEGMENTS_DIR, name)
+
+    def retrieve(
+        self,
+        query: str,
+        vector: Optional[np.ndarray],
+        top_k: int = 3,
+        mode: str = SEARCH_MODE_VECTOR,
+        metadata_filter: Optional[MetadataFilter] = None,
+        **options,
+    ) -> List[SearchHit]:
+        """
+        在当前快照的所有段中检索并合并，已删除和未提交的行不会返回
+        vector 模式按相似度合并；lexical / hybrid 模式的分数只在段内可比，各段结果按名次做 RRF 融合
+        过滤条件在打分前转为行掩码，满足条件的行足够时结果不会少于 top_k
+        Args:
+            query: 查询文本
+            vector: 查询向量，lexical 模式下可为None
+            top_k: 返回数量
+            mode: 检索模式，vector / lexical / hybrid
+            metadata_filter: 编译后的元数据过滤条件
+            options: 传给 hybrid.retrieve 的其他检索参数
+        Returns:
+            List[SearchHit]: 按相关性降序排列的结果，行号为段内行号；多段的 lexical / hybrid 结果分数为跨段 RRF 分数
+        """
+        results = []
+        for segment in self.snapshot.segments:
+            if segment.lexical is None and (mode != SEARCH_MODE_VECTOR or options.get("prefilter")):
+                raise ValueError(f"{mode} 检索和 BM25 预过滤需要倒排索引，该段没有构建: {self.segment_path(segment.name)}")
+            results.append(retrieve_segment(
+                segment.store, segment.lexical, query, vector, top_k, mode,
+                mask=segment.mask(metadata_filter), **options
+            ))
+        return merge_hits(results, top_k, mode, options.get("rrf_k", DEFAULT_RRF_K))
+
+    def refresh(self) -> Snapshot:
+        """重新读取 catalog 并替换快照，正在进行的查询继续使用旧快照"""
+        with self._snapshot_lock:
+            try:
+                snapshot = self._load_snapshot()
+            except FileNotFoundError:
+                # 读取 catalog 与打开段文件之间段被合并删除，重新读取一次
+                snapshot = self._load_snapshot()
+            names = {segment.name for segment in snapshot.segments}
+            for name in list(self._opened):
+                if name not in names:
+                    self._close_segment(name)
+            self.snapshot = snapshot
+        return snapshot
+
+    def refresh_if_changed(self) -> Snapshot:
+        """catalog 有其他连接（其他进程或后台合并）提交的修改时刷新快照"""
+        db = self._catalog()
+        if db is None:
+            return self.snapshot
+        with self._db_lock:
+            version = db.execute("PRAGMA data_version").fetchone()[0]
+        return self.refresh() if version != self._data_version else self.snapshot
+
+    def append(
+        self,
+        doc_ids: Sequence[str],
+        texts: Sequence[str],
+        embeddings: np.ndarray,
+        metadata: Optional[Sequence[Optional[Dict[str, Any]]]] = None,
+    ) -> range:
+        """
+        追加文本块，不影响这些文档已有的文本块
+        Args:
+            doc_ids: 每个文本块所属的文档 id
+            texts: 文本块
+            embeddings: 形状为 (n, dim) 的向量
+            metadata: 每个文本块的元数据（租户、语言、文档类型、日期等）
+        Returns:
+            range: 在增量段中的行号
+        """
+        return self._write(doc_ids, texts, embeddings, metadata, replace=False)
+
+    def upsert(
+        self,
+        doc_ids: Sequence[str],
+        texts: Sequence[str],
+        embeddings: np.ndarray,
+        metadata: Optional[Sequence[Optional[Dict[str, Any]]]] = None,
+    ) -> range:
+        """
+        写入文本块，同时删除这些文档此前的全部文本块；同一文档的文本块应在一次调用中写入
+        Args:
+            doc_ids: 每个文本块所属的文档 id
+            texts: 文本块
+            embeddings: 形状为 (n, dim) 的向量
+            metadata: 每个文本块的元数据（租户、语言、文档类型、日期等）
+        Returns:
+            range: 在增量段中的行号
+        """
+        return self._write(doc_ids, texts, embeddings, metadata, replace=True)
+
+    def delete(self, doc_ids: Iterable[str]) -> int:
+        """
+        删除文档的全部文本块
+        Args:
+            doc_ids: 文档 id
+        Returns:
+            int: 删除的文本块数
+        """
+        with self._write_lock:
+            db = self._catalog(create=True)
+            with self._db_lock, _transaction(db):
+                deleted = self._tombstone(db, set(doc_ids))
+                if deleted:
+                    _bump_generation(db)
+        if deleted:
+            self.refresh()
+        return deleted
+
+    def compact(self) -> Optional[str]:
+        """
+        把所有段中未删除的行重写为一个新的主段（原主段有 IVF 或倒排索引时一并重建）
+        重写期间查询继续使用旧快照，写入进入新的增量段，重写期间的删除在提交时转移到新主段
+        Returns:
+            Optional[str]: 新主段名称，无需合并时返回None
+        """
+        with self._compaction_lock:
+            plan = self._start_compaction()
+            if plan is None:
+                return None
+            target, sources, dead, dtype, exact, lexical = plan
+            target_path = self.segment_path(target)
+            shutil.rmtree(target_path, ignore_errors=True)
+            mapping = []
+            moved = []
+            rebuild_ivf = False
+            with IndexWriter(target_path, dtype=dtype, keep_exact=exact) as writer:
+                for name, count in sources:
+                    path = self.segment_path(name)
+                    rebuild_ivf = rebuild_ivf or has_ivf(path)
+                    store = load_store(path)
+                    live = np.ones(count, dtype=bool)
+                    live[dead.get(name, [])] = False
+                    rows = np.flatnonzero(live)
+                    mapping.append((name, rows, writer.count))
+                    # 元数据倒排列表按 旧行号 -> 新行号 映射，已删除的行映射为 -1，写入时丢弃
+                    metadata = open_metadata(path)
+                    if metadata is not None:
+                        new_rows = np.full(count, -1, dtype=np.int64)
+                        new_rows[rows] = np.arange(writer.count, writer.count + rows.size)
+                        moved.append((metadata, new_rows))
+                    for start in range(0, rows.size, SAVE_BLOCK_ROWS):
+                        block = rows[start:start + SAVE_BLOCK_ROWS]
+                        writer.append(store.vectors(block), [store.texts[int(row)] for row in block])
+                count = writer.count
+            if moved:
+                write_metadata(target_path, count, _remap_postings(moved))
+            if count and lexical:
+                build_lexical(target_path, VectorStore.load(target_path).texts).close()
+            if count and rebuild_ivf:
+                build_ivf(target_path)
+            self._commit_compaction(target, count, mapping, [name for name, _ in sources])
+            self.refresh()
+            for name, _ in sources:
+                self._remove_segment(name)
+            return target
+
+    def compact_in_background(self) -> threading.Thread:
+        """
+        在后台线程中合并，已有合并在进行时直接返回该线程
+        Returns:
+            threading.Thread: 合并线程
+        """
+        with self._snapshot_lock:
+            if self._compaction is None or not self._compaction.is_alive():
+                self._compaction = threading.Thread(
+                    target=self.compact, name=f"kb-compact-{os.path.basename(self.path)}", daemon=True
+                )
+                self._compaction.start()
+            return self._compaction
+
+    def close(self) -> None:
+        """关闭 catalog 连接和所有已打开段的倒排索引、元数据索引（等待进行中的合并结束）"""
+        if self._compaction is not None:
+            self._compaction.join()
+        with self._db_lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+        with self._snapshot_lock:
+            for name in list(self._opened):
+                self._close_segment(name)
+
+    def _close_segment(self, name: str) -> None:
+        """从已打开的段中移除并关闭其倒排索引和元数据索引"""
+        _, lexical, metadata = self._opened.pop(name)
+        if lexical is not None:
+            lexical.close()
+        if metadata is not None:
+            metadata.close()
+
+    def _write(
+        self,
+        doc_ids: Sequence[str],
+        texts: Sequence[str],
+        embeddings: np.ndarray,
+        metadata: Optional[Sequence[Optional[Dict[str, Any]]]],
+        replace: bool,
+    ) -> range:
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        if not len(doc_ids) == len(texts) == embeddings.shape[0]:
+            raise ValueError(f"文档 id 数 {len(doc_ids)}、文本数 {len(texts)} 与向量数 {embeddings.shape[0]} 不一致")
+        with self._write_lock:
+            db = self._catalog(create=True)
+            with self._db_lock:
+                name, committed = self._active_delta(db)
+                dtype, exact, lexical = _meta(db, "dtype"), bool(_meta(db, "exact")), bool(_meta(db, "lexical"))
+            # 先写段文件再提交 catalog：提交前中断时多出的行不可见，下次写入时被截掉
+            path = self.segment_path(name)
+            with IndexWriter(path, embeddings.shape[1], dtype, exact, count=committed) as writer:
+                rows = writer.append(embeddings, texts)
+            if lexical:
+                index = LexicalIndex(os.path.join(path, LEXICAL_FILE))
+                index.add(rows, texts)
+                index.close()
+            self._write_delta_metadata(path, committed, rows, metadata)
+            with self._db_lock, _transaction(db):
+                if replace:
+                    self._tombstone(db, set(doc_ids))
+                db.executemany(
+                    "INSERT INTO chunks (segment, row, doc_id) VALUES (?, ?, ?)", zip(repeat(name), rows, doc_ids)
+                )
+                db.execute("UPDATE segments SET count = ? WHERE name = ?", (rows.stop, name))
+                _bump_generation(db)
+        snapshot = self.refresh()
+        if self.auto_compact_segments and len(snapshot.segments) > self.auto_compact_segments:
+            self.compact_in_background()
+        return rows
+
+    def _write_delta_metadata(
+        self,
+        path: str,
+        committed: int,
+        rows: range,
+        metadata: Optional[Sequence[Optional[Dict[str, Any]]]],
+    ) -> None:
+        """重写增量段的元数据索引：保留已提交行的倒排列表，加上新写入的行"""
+        previous = open_metadata(path)
+        if previous is None and not any(metadata or ()):
+            return
+        kept = ()
+        if previous is not None:
+            kept = ((old_rows[old_rows < committed], values) for old_rows, values in previous.postings())
+        write_metadata(path, rows.stop, chain(kept, (([row], item) for row, item in zip(rows, metadata or ()))))
+
+    def _active_delta(self, db: sqlite3.Connection) -> Tuple[str, int]:
+        """当前增量段的名称和已提交的条目数，已满时封存并新建（调用方持有 self._db_lock）"""
+        with _transaction(db):
+            row = db.execute("SELECT name, count FROM segments WHERE sealed = 0").fetchone()
+            if row is not None and row[1] < self.max_delta_rows:
+                return row
+            if row is not None:
+                db.execute("UPDATE segments SET sealed = 1 WHERE name = ?", (row[0],))
+            return self._new_segment(db, sealed=False), 0
+
+    def _new_segment(self, db: sqlite3.Connection, sealed: bool) -> str:
+        seq = _meta(db, "next_seq")
+        db.execute("UPDATE meta SET value = value + 1 WHERE key = 'next_seq'")
+        name = f"seg-{seq:06d}"
+        db.execute("INSERT INTO segments (name, seq, count, sealed) VALUES (?, ?, 0, ?)", (name, seq, int(sealed)))
+        return name
+
+    def _tombstone(self, db: sqlite3.Connection, doc_ids: Iterable[str]) -> int:
+        """给文档的现有文本块打墓碑，返回文本块数"""
+        doc_ids = list(doc_ids)
+        deleted = 0
+        for start in range(0, len(doc_ids), SQL_CHUNK):
+            chunk = doc_ids[start:start + SQL_CHUNK]
+            marks = ",".join("?" * len(chunk))
+            db.execute(
+                f"INSERT OR IGNORE INTO tombstones (segment, row) "
+                f"SELECT segment, row FROM chunks WHERE doc_id IN ({marks})", chunk
+            )
+            deleted += db.execute(f"DELETE FROM chunks WHERE doc_id IN ({marks})", chunk).rowcount
+        return deleted
+
+    def _start_compaction(self):
+        """封存所有段并登记合并目标段，返回 (目标段, [(源段, 条目数)], 源段墓碑, dtype, exact, lexical)"""
+        with self._write_lock:
+            db = self._catalog(create=True)
+            with self._db_lock, _transaction(db):
+                # 上次中断的合并留下的空目标段
+                unfinished = [row[0] for row in db.execute("SELECT name FROM segments WHERE count = 0 AND sealed = 1")]
+                db.executemany("DELETE FROM segments WHERE name = ?", [(name,) for name in unfinished])
+                sources = db.execute("SELECT name, count FROM segments WHERE count > 0 ORDER BY seq").fetchall()
+                dead: Dict[str, List[int]] = {}
+                for segment, row in db.execute("SELECT segment, row FROM tombstones"):
+                    dead.setdefault(segment, []).append(row)
+                if not sources or (len(sources) == 1 and not dead):
+                    plan = None
+                else:
+                    db.execute("UPDATE segments SET sealed = 1")
+                    target = self._new_segment(db, sealed=True)
+                    plan = (target, sources, dead, _meta(db, "dtype"), bool(_meta(db, "exact")), bool(_meta(db, "lexical")))
+        for name in unfinished:
+            self._remove_segment(name)
+        return plan
+
+    def _commit_compaction(self, target: str, count: int, mapping, sources: List[str]) -> None:
+        """把源段的文档归属和重写期间新增的墓碑转移到目标段，并删除源段（使用独立连接）"""
+        db = self._connect()
+        try:
+            # 行号映射写入连接私有的临时表，不占用 catalog 的写锁
+            db.execute("CREATE TEMP TABLE compaction_map (segment TEXT NOT NULL, row INTEGER NOT NULL, new_row INTEGER NOT NULL)")
+            db.execute("BEGIN")
+            for name, rows, start in mapping:
+                db.executemany(
+                    "INSERT INTO compaction_map (segment, row, new_row) VALUES (?, ?, ?)",
+                    zip(repeat(name), rows.tolist(), range(start, start + rows.size)),
+                )
+            db.execute("COMMIT")
+            marks = ",".join("?" * len(sources))
+            with self._write_lock, _transaction(db):
+                db.execute(
+                    "INSERT INTO chunks (segment, row, doc_id) SELECT ?, m.new_row, c.doc_id "
+                    "FROM compaction_map m JOIN chunks c ON c.segment = m.segment AND c.row = m.row", (target,)
+                )
+                # 映射中只有开始合并时未删除的行，能关联上的墓碑都是重写期间新增的
+                db.execute(
+                    "INSERT OR IGNORE INTO tombstones (segment, row) SELECT ?, m.new_row "
+                    "FROM compaction_map m JOIN tombstones t ON t.segment = m.segment AND t.row = m.row", (target,)
+                )
+                db.execute(f"DELETE FROM chunks WHERE segment IN ({marks})", sources)
+                db.execute(f"DELETE FROM tombstones WHERE segment IN ({marks})", sources)
+                db.execute(f"DELETE FROM segments WHERE name IN ({marks})", sources)
+                db.execute("UPDATE segments SET count = ? WHERE name = ?", (count, target))
+                _bump_generation(db)
+        finally:
+            db.close()
+
+    def _remove_segment(self, name: str) -> None:
+        """删除已被合并的段文件；其他进程已打开的 mmap 在关闭前仍然有效"""
+        if name != ROOT_SEGMENT:
+            shutil.rmtree(self.segment_path(name), ignore_errors=True)
+            return
+        names = {name + suffix for name in ROOT_INDEX_FILES for suffix in _ROOT_INDEX_SUFFIXES}
+        for entry in os.listdir(self.path):
+            # 元数据倒排数组按代编号命名：metadata-<n>.npy
+            if entry in names or (entry.startswith("metadata-") and entry.endswith(".npy")):
+                try:
+                    os.remove(os.path.join(self.path, entry))
+                except FileNotFoundError:
+                    pass
+
+    def _connect(self) -> sqlite3.Connection:
+        db = sqlite3.connect(
+            os.path.join(self.path, CATALOG_FILE), check_same_thread=False, isolation_level=None, timeout=60
+        )
+        db.execute("PRAGMA journal_mode=WAL")
+        for statement in _SCHEMA:
+            db.execute(statement)
+        return db
+
+    def _catalog(self, create: bool = False) -> Optional[sqlite3.Connection]:
+        """
+        catalog 连接；没有 catalog 的知识库只有导入流水线写入的索引，第一次写入时创建
+        Args:
+            create: 不存在时是否创建（已有的索引登记为 "." 段，导入记录中的文档 id 一并导入）
+        Returns:
+            Optional[sqlite3.Connection]: 连接，不存在且不创建时返回None
+        """
+        with self._db_lock:
+            if self._db is None:
+                if not create and not os.path.exists(os.path.join(self.path, CATALOG_FILE)):
+                    return None
+                os.makedirs(self.path, exist_ok=True)
+                db = self._connect()
+                self._initialize(db)
+                self._db = db
+            return self._db
+
+    def _initialize(self, db: sqlite3.Connection) -> None:
+        ledger = os.path.join(self.path, LEDGER_FILE)
+        attached = os.path.exists(ledger)
+        if attached:
+            db.execute("ATTACH DATABASE ? AS ledger", (ledger,))
+        try:
+            with _transaction(db):
+                if db.execute("SELECT 1 FROM meta WHERE key = 'generation'").fetchone() is not None:
+                    return
+                meta = {"generation": 0, "next_seq": 1, "dtype": "float32", "exact": 0, "lexical": 1}
+                if os.path.exists(os.path.join(self.path, HEADER_FILE)):
+                    header = read_header(self.path)
+                    meta.update(
+                        dtype=header.dtype,
+                        exact=int(header.exact),
+                        lexical=int(os.path.exists(os.path.join(self.path, LEXICAL_FILE))),
+                    )
+                    db.execute(
+                        "INSERT INTO segments (name, seq, count, sealed) VALUES (?, 0, ?, 1)", (ROOT_SEGMENT, header.count)
+                    )
+                    if attached and db.execute(
+                        "SELECT 1 FROM ledger.sqlite_master WHERE name = 'rows'"
+                    ).fetchone() is not None:
+                        db.execute(
+                            "INSERT INTO chunks (segment, row, doc_id) SELECT ?, row, doc_id FROM ledger.rows WHERE row < ?",
+                            (ROOT_SEGMENT, header.count),
+                        )
+                db.executemany("INSERT INTO meta (key, value) VALUES (?, ?)", meta.items())
+        finally:
+            if attached:
+                db.execute("DETACH DATABASE ledger")
+
+    def _load_snapshot(self) -> Snapshot:
+        db = self._catalog()
+        if db is None:
+            if not os.path.exists(os.path.join(self.path, HEADER_FILE)):
+                return Snapshot(0, ())
+            store, lexical, metadata = self._open_segment(ROOT_SEGMENT, None)
+            return Snapshot(0, (Segment(ROOT_SEGMENT, store, lexical, None, metadata),))
+        with self._db_lock:
+            # 在一个读事务中读取，看到的是同一代的 catalog
+            db.execute("BEGIN")
+            try:
+                generation = _meta(db, "generation")
+                rows = db.execute("SELECT name, count FROM segments WHERE count > 0 ORDER BY seq").fetchall()
+                dead: Dict[str, List[int]] = {}
+                for segment, row in db.execute("SELECT segment, row FROM tombstones"):
+                    dead.setdefault(segment, []).append(row)
+                self._data_version = db.execute("PRAGMA data_version").fetchone()[0]
+            finally:
+                db.execute("COMMIT")
+        segments = []
+        for name, count in rows:
+            store, lexical, metadata = self._open_segment(name, count)
+            live = None
+            if name in dead:
+                live = np.ones(count, dtype=bool)
+                live[dead[name]] = False
+            segments.append(Segment(name, store, lexical, live, metadata))
+        return Snapshot(generation, tuple(segments))
+
+    def _open_segment(
+        self, name: str, count: Optional[int]
+    ) -> Tuple[VectorStore, Optional[LexicalIndex], Optional[MetadataIndex]]:
+        """打开段（已打开且行数足够时复用），截取到已提交的条目数"""
+        path = self.segment_path(name)
+        cached = self._opened.get(name)
+        if cached is None or cached[0].size < (count or 0):
+            # 增量段有新提交的行：向量和元数据索引都已重写，重新打开
+            lexical = cached[1] if cached is not None else None
+            cached = self._opened[name] = (load_store(path), lexical or open_lexical(path), open_metadata(path))
+        elif cached[1] is None:
+            cached = self._opened[name] = (cached[0], open_lexical(path), cached[2])
+        store, lexical, metadata = cached
+        if count is not None and count < store.size:
+            store = store.head(count)
+        return store, lexical, metadata
+
+async def upsert_documents(
+    kb: KnowledgeBase,
+    documents: Dict[str, Optional[str]],
+    embedding_model: Embeddings,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    overlap: int = DEFAULT_CHUNK_OVERLAP,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    metadata: Optional[Dict[str, Dict[str, Any]]] = None,
+) -> int:
+    """
+    把文档切块、embedding 后写入知识库，替换这些文档已有的文本块；内容为空或None的文档被删除
+    Args:
+        kb: 知识库
+        documents: 文档 id -> 文档内容
+        embedding_model: embedding模型
+        chunk_size: 块长度（字符数）
+        overlap: 相邻块的重叠字符数
+        batch_size: 每批 embedding 的文本块数
+        metadata: 文档 id -> 元数据
+    Returns:
+        int: 写入的文本块数
+    """
+    doc_ids, texts, chunk_metadata = [], [], []
+    for doc_id, content in documents.items():
+        for chunk in iter_chunks(io.StringIO(content or ""), chunk_size, overlap):
+            doc_ids.append(doc_id)
+            texts.append(chunk)
+            chunk_metadata.append((metadata or {}).get(doc_id))
+    vectors = []
+    for start in range(0, len(texts), batch_size):
+        vectors.extend(await aembed_documents(embedding_model, texts[start:start + batch_size]))
+    if texts:
+        await asyncio.to_thread(kb.upsert, doc_ids, texts, np.asarray(vectors, dtype=np.float32), chunk_metadata)
+    written = set(doc_ids)
+    removed = [doc_id for doc_id in documents if doc_id not in written]
+    if removed:
+        await asyncio.to_thread(kb.delete, removed)
+    return len(texts)
+
+def main() -> None:
+    import argparse
+
+    parser = argparse.ArgumentParser(description="增量更新知识库")
+    parser.add_argument("path", help="知识库目录")
+    parser.add_argument("command", choices=["info", "upsert", "delete", "compact"])
+    parser.add_argument("items", nargs="*", help="upsert 时为文件路径（同时作为文档 id），delete 时为文档 id")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--overlap", type=int, default=DEFAULT_CHUNK_OVERLAP)
+    args = parser.parse_args()
+
+    kb = KnowledgeBase(args.path, auto_compact_segments=0)
+    if args.command == "upsert":
+        from src.models.model_factory import get_model_factory
+
+        documents = {}
+        for item in args.items:
+            with open(item, "r", encoding="utf-8", errors="replace") as f:
+                documents[item] = f.read()
+        count = asyncio.run(upsert_documents(kb, documents, get_model_factory().embedding_model, args.chunk_size, args.overlap))
+        print(f"写入 {len(documents)} 个文档, {count} 个文本块")
+    elif args.command == "delete":
+        print(f"删除 {kb.delete(args.items)} 个文本块")
+    elif args.command == "compact":
+        print(f"合并完成: {kb.compact() or '无需合并'}")
+    snapshot = kb.snapshot
+    print(f"第 {snapshot.generation} 代, {len(snapshot.segments)} 个段, {snapshot.size} 个可见文本块")
+    for segment in snapshot.segments:
+        deleted = 0 if segment.live is None else segment.store.size - int(np.count_nonzero(segment.live))
+        print(f"  {segment.name}: {segment.store.size} 行, 已删除 {deleted}")
+    kb.close()
+
+if __name__ == "__main__":
+    main()
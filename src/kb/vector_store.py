@@ -0,0 +1,306 @@
+import shutil
+from typing import List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .index_format import IndexWriter, MappedIndex, PackedTexts
+
+# 非 float32 存储时按块转换到复用的缓冲区后打分，块足够小以留在CPU缓存中
+SCORE_BLOCK_ROWS = 1024
+# 保存索引时每批写入的行数
+SAVE_BLOCK_ROWS = 65536
+# 掩码选中的行占比不超过该值时只取出选中的行打分，否则全量打分后屏蔽
+MASK_GATHER_RATIO = 0.25
+
+# int8 量化时每行最大绝对值映射到的整数
+INT8_MAX = 127
+
+class SearchHit(NamedTuple):
+    """检索结果"""
+    row: int      # 在索引中的行号
+    score: float  # 余弦相似度
+    text: str     # 文本块内容
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """
+    按行做L2归一化，零向量保持为零
+    Args:
+        matrix: 形状为 (n, dim) 或 (dim,) 的矩阵
+    Returns:
+        np.ndarray: 归一化后的 float32 矩阵
+    """
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+def top_k_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    """
+    取分数最高的k个下标（按分数降序），用 argpartition 避免全量排序
+    Args:
+        scores: 一维分数数组
+        k: 返回数量
+    Returns:
+        np.ndarray: 下标数组
+    """
+    k = min(k, scores.shape[0])
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    if k < scores.shape[0]:
+        candidates = np.argpartition(-scores, k - 1)[:k]
+    else:
+        candidates = np.arange(scores.shape[0])
+    return candidates[np.argsort(-scores[candidates], kind="stable")]
+
+def quantize_rows(matrix: np.ndarray, dtype: str) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """
+    把归一化后的 float32 向量转换为存储类型
+    Args:
+        matrix: 形状为 (n, dim) 的 float32 矩阵
+        dtype: float32、float16 或 int8
+    Returns:
+        (存储矩阵, 每行缩放系数)；只有 int8 有缩放系数，原向量约等于 存储矩阵[i] * 缩放系数[i]
+    """
+    if dtype != "int8":
+        return matrix.astype(dtype), None
+    scales = np.abs(matrix).max(axis=1) / INT8_MAX
+    scales[scales == 0] = 1.0
+    quantized = np.rint(matrix / scales[:, None]).astype(np.int8)
+    return quantized, scales.astype(np.float32)
+
+def score_rows(matrix: np.ndarray, query: np.ndarray, scales: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    计算矩阵每一行与查询向量的内积
+    Args:
+        matrix: 形状为 (n, dim) 的矩阵，可以是 mmap 的 float16/int8 数组
+        query: float32 查询向量
+        scales: int8 存储时每行的缩放系数
+    Returns:
+        np.ndarray: 长度为 n 的 float32 分数
+    """
+    if matrix.dtype == np.float32:
+        return matrix @ query
+    scores = np.empty(matrix.shape[0], dtype=np.float32)
+    buffer = np.empty((min(SCORE_BLOCK_ROWS, matrix.shape[0]), matrix.shape[1]), dtype=np.float32)
+    for start in range(0, matrix.shape[0], SCORE_BLOCK_ROWS):
+        block = matrix[start:start + SCORE_BLOCK_ROWS]
+        converted = buffer[:block.shape[0]]
+        np.copyto(converted, block, casting="unsafe")
+        np.matmul(converted, query, out=scores[start:start + block.shape[0]])
+    if scales is not None:
+        scores *= scales
+    return scores
+
+class VectorStore:
+    """
+    进程内向量库：归一化后的向量矩阵 + 文本，精确余弦 top-k 检索
+    从磁盘加载时向量和文本都是 mmap 的只读视图，不复制到进程内存
+    """
+
+    def __init__(
+        self,
+        embeddings: np.ndarray,
+        texts: Sequence[str],
+        normalized: bool = False,
+        scales: Optional[np.ndarray] = None,
+        exact: Optional[np.ndarray] = None,
+    ):
+        """
+        Args:
+            embeddings: 形状为 (n, dim) 的向量矩阵，可以是 float16 或 int8 量化存储
+            texts: 与向量一一对应的文本块
+            normalized: 向量是否已归一化（或已量化），为 False 时会复制并归一化为 float32
+            scales: int8 存储时每行的缩放系数
+            exact: 量化存储时的 float32 原始向量，用于对候选做精确重打分
+        """
+        if len(texts) != embeddings.shape[0]:
+            raise ValueError(f"向量数 {embeddings.shape[0]} 与文本数 {len(texts)} 不一致")
+        self.embeddings = embeddings if normalized else normalize_rows(embeddings)
+        self.texts = texts
+        self.scales = scales
+        self.exact = exact
+
+    @property
+    def size(self) -> int:
+        """文本块数量"""
+        return self.embeddings.shape[0]
+
+    @property
+    def dim(self) -> int:
+        """向量维度"""
+        return self.embeddings.shape[1]
+
+    @property
+    def dtype(self) -> str:
+        """向量存储类型"""
+        return self.embeddings.dtype.name
+
+    @property
+    def memory_bytes(self) -> int:
+        """打分时需要常驻的向量数据大小（精确重打分用的 float32 向量只按需读取，不计入）"""
+        return self.embeddings.nbytes + (self.scales.nbytes if self.scales is not None else 0)
+
+    def head(self, count: int) -> "VectorStore":
+        """
+        只包含前 count 条的视图，不复制数据
+        Args:
+            count: 条目数
+        Returns:
+            VectorStore: 向量库
+        """
+        texts = self.texts
+        if isinstance(texts, PackedTexts):
+            texts = PackedTexts(texts.offsets[:count + 1], texts.data)
+        else:
+            texts = texts[:count]
+        return VectorStore(
+            self.embeddings[:count],
+            texts,
+            normalized=True,
+            scales=self.scales[:count] if self.scales is not None else None,
+            exact=self.exact[:count] if self.exact is not None else None,
+        )
+
+    def vectors(self, rows) -> np.ndarray:
+        """
+        取若干行的 float32 向量（量化存储时优先取精确向量，否则反量化）
+        Args:
+            rows: 行号数组或切片
+        Returns:
+            np.ndarray: float32 矩阵
+        """
+        if self.exact is not None:
+            return np.asarray(self.exact[rows], dtype=np.float32)
+        block = np.asarray(self.embeddings[rows], dtype=np.float32)
+        if self.scales is not None:
+            block *= np.asarray(self.scales[rows])[:, None]
+        return block
+
+    def quantize(self, dtype: str, keep_exact: bool = False) -> "VectorStore":
+        """
+        转换为另一种存储类型的内存向量库
+        Args:
+            dtype: float32、float16 或 int8
+            keep_exact: 是否保留 float32 向量用于精确重打分
+        Returns:
+            VectorStore: 新的向量库
+        """
+        exact = self.vectors(slice(None))
+        stored, scales = quantize_rows(exact, dtype)
+        keep_exact = keep_exact and dtype != "float32"
+        return VectorStore(stored, self.texts, normalized=True, scales=scales, exact=exact if keep_exact else None)
+
+    def search(
+        self,
+        query: np.ndarray,
+        top_k: int = 3,
+        min_score: Optional[float] = None,
+        nprobe: Optional[int] = None,
+        rescore: int = 0,
+        mask: Optional[np.ndarray] = None,
+    ) -> List[SearchHit]:
+        """
+        余弦相似度 top-k 检索
+        Args:
+            query: 查询向量
+            top_k: 返回数量
+            min_score: 最低相似度，低于该值的结果被丢弃
+            nprobe: 近似索引探测的列表数，精确检索时忽略
+            rescore: 量化存储时用 float32 向量重打分的候选数，0 表示不重打分
+            mask: 长度为 size 的布尔掩码，只返回为 True 的行
+        Returns:
+            List[SearchHit]: 按相似度降序排列的结果
+        """
+        if self.size == 0:
+            return []
+        if mask is not None and np.count_nonzero(mask) <= self.size * MASK_GATHER_RATIO:
+            return self.search_rows(query, np.flatnonzero(mask), top_k, min_score, rescore)
+        query = normalize_rows(query)
+        scores = score_rows(self.embeddings, query, self.scales)
+        if mask is not None:
+            scores[~mask] = -np.inf
+        return self._collect_hits(query, scores, top_k, min_score, rescore)
+
+    def search_rows(
+        self,
+        query: np.ndarray,
+        rows: Sequence[int],
+        top_k: int = 3,
+        min_score: Optional[float] = None,
+        rescore: int = 0,
+        mask: Optional[np.ndarray] = None,
+    ) -> List[SearchHit]:
+        """
+        只在给定的行中做余弦 top-k 检索
+        Args:
+            query: 查询向量
+            rows: 候选行号
+            top_k: 返回数量
+            min_score: 最低相似度，低于该值的结果被丢弃
+            rescore: 量化存储时用 float32 向量重打分的候选数，0 表示不重打分
+            mask: 长度为 size 的布尔掩码，打分前先去掉为 False 的行
+        Returns:
+            List[SearchHit]: 按相似度降序排列的结果
+        """
+        # 行号排序后再取向量，mmap 上按顺序访问页
+        rows = np.sort(np.asarray(rows, dtype=np.int64))
+        if mask is not None:
+            rows = rows[mask[rows]]
+        if rows.size == 0:
+            return []
+        query = normalize_rows(query)
+        scales = self.scales[rows] if self.scales is not None else None
+        return self._collect_hits(query, score_rows(self.embeddings[rows], query, scales), top_k, min_score, rescore, rows)
+
+    def _collect_hits(
+        self,
+        query: np.ndarray,
+        scores: np.ndarray,
+        top_k: int,
+        min_score: Optional[float],
+        rescore: int = 0,
+        rows: Optional[np.ndarray] = None,
+    ) -> List[SearchHit]:
+        """从分数中取 top-k 组装结果，rows 为分数对应的行号（None 表示按下标）"""
+        if rescore and self.exact is not None:
+            # 先用量化分数取 rescore 个候选，再用 float32 向量精确打分
+            candidates = top_k_indices(scores, max(rescore, top_k))
+            # 被掩码排除的行分数为 -inf，不参与重打分
+            candidates = candidates[np.isfinite(scores[candidates])]
+            candidates = np.sort(rows[candidates] if rows is not None else candidates)
+            rows = candidates
+            scores = np.asarray(self.exact[rows], dtype=np.float32) @ query
+        hits = []
+        for i in top_k_indices(scores, top_k):
+            score = float(scores[i])
+            if score == -np.inf or (min_score is not None and score < min_score):
+                break
+            row = int(rows[i]) if rows is not None else int(i)
+            hits.append(SearchHit(row, score, self.texts[row]))
+        return hits
+
+    def save(self, path: str, dtype: str = "float32", keep_exact: bool = False) -> None:
+        """
+        保存为本地索引目录（覆盖已有索引）
+        Args:
+            path: 索引目录
+            dtype: 向量存储类型，float32、float16 或 int8
+            keep_exact: 量化存储时是否另存 float32 向量用于精确重打分
+        """
+        shutil.rmtree(path, ignore_errors=True)
+        with IndexWriter(path, self.dim, dtype, keep_exact) as writer:
+            for start in range(0, self.size, SAVE_BLOCK_ROWS):
+                end = min(start + SAVE_BLOCK_ROWS, self.size)
+                writer.append(self.vectors(slice(start, end)), self.texts[start:end])
+
+    @classmethod
+    def load(cls, path: str) -> "VectorStore":
+        """
+        以 mmap 方式打开本地索引目录，耗时与索引大小无关
+        Args:
+            path: 索引目录
+        Returns:
+            VectorStore: 向量库
+        """
+        index = MappedIndex(path)
+        return cls(index.embeddings, index.texts, normalized=True, scales=index.scales, exact=index.exact)
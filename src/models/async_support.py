@@ -0,0 +1,96 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Callable, List
+
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models import BaseChatModel
+
+# 同步回退线程池大小：不支持异步的客户端最多同时占用这么多线程
+SYNC_FALLBACK_WORKERS = 16
+
+_sync_pool = ThreadPoolExecutor(max_workers=SYNC_FALLBACK_WORKERS, thread_name_prefix="model-sync")
+
+@functools.lru_cache(maxsize=None)
+def _class_supports_native_async(cls: type) -> bool:
+    if issubclass(cls, BaseChatModel):
+        # 基类的 _agenerate/_astream 只是把同步实现丢进默认线程池
+        return cls._agenerate is not BaseChatModel._agenerate or cls._astream is not BaseChatModel._astream
+    if issubclass(cls, Embeddings):
+        return cls.aembed_query is not Embeddings.aembed_query
+    return hasattr(cls, "ainvoke")
+
+def supports_native_async(model: Any) -> bool:
+    """
+    判断模型客户端是否原生支持异步调用
+    Args:
+        model: 模型客户端
+    Returns:
+        bool: 原生支持异步返回True
+    """
+    return _class_supports_native_async(type(model))
+
+async def run_sync(func: Callable, *args, **kwargs) -> Any:
+    """
+    在有界线程池中执行同步函数，避免阻塞事件循环
+    Args:
+        func: 同步函数
+    Returns:
+        Any: 函数返回值
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_sync_pool, functools.partial(func, *args, **kwargs))
+
+async def ainvoke_chat(model: BaseChatModel, prompt: Any, **kwargs) -> Any:
+    """
+    异步调用chat模型，不支持异步的客户端回退到有界线程池
+    Args:
+        model: chat模型
+        prompt: 提示词或消息列表
+    Returns:
+        模型返回的消息
+    """
+    if supports_native_async(model):
+        return await model.ainvoke(prompt, **kwargs)
+    return await run_sync(model.invoke, prompt, **kwargs)
+
+async def astream_chat(model: BaseChatModel, prompt: Any, **kwargs) -> AsyncIterator[Any]:
+    """
+    异步流式调用chat模型，逐块产出消息；不支持异步的客户端在有界线程池中整体调用后一次性产出
+    Args:
+        model: chat模型
+        prompt: 提示词或消息列表
+    Returns:
+        AsyncIterator: 消息块
+    """
+    if supports_native_async(model):
+        async for chunk in model.astream(prompt, **kwargs):
+            yield chunk
+    else:
+        yield await run_sync(model.invoke, prompt, **kwargs)
+
+async def aembed_query(model: Embeddings, text: str) -> List[float]:
+    """
+    异步计算查询文本的向量，不支持异步的客户端回退到有界线程池
+    Args:
+        model: embedding模型
+        text: 查询文本
+    Returns:
+        List[float]: 向量
+    """
+    if supports_native_async(model):
+        return await model.aembed_query(text)
+    return await run_sync(model.embed_query, text)
+
+async def aembed_documents(model: Embeddings, texts: List[str]) -> List[List[float]]:
+    """
+    异步批量计算文档向量，不支持异步的客户端回退到有界线程池
+    Args:
+        model: embedding模型
+        texts: 文本列表
+    Returns:
+        List[List[float]]: 向量列表
+    """
+    if supports_native_async(model):
+        return await model.aembed_documents(texts)
+    return await run_sync(model.embed_documents, texts)
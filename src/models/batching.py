@@ -0,0 +1,222 @@
+import asyncio
+import weakref
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models import BaseChatModel
+
+from .async_support import aembed_documents, supports_native_async, run_sync
+
+# 默认攒批窗口（秒）与批大小
+DEFAULT_MAX_WAIT = 0.005
+DEFAULT_MAX_BATCH_SIZE = 32
+
+@dataclass
+class BatchMetrics:
+    """微批合并指标"""
+    batches: int = 0                 # 批量调用次数
+    items: int = 0                   # 合并的请求数
+    max_batch_size: int = 0          # 最大批大小
+    total_queue_delay: float = 0.0   # 请求从提交到所在批次发出的等待时间之和（秒）
+    max_queue_delay: float = 0.0     # 最大等待时间（秒）
+    batch_sizes: Counter = field(default_factory=Counter)  # 批大小 -> 次数
+
+    def record(self, delays: List[float]) -> None:
+        self.batches += 1
+        self.items += len(delays)
+        self.max_batch_size = max(self.max_batch_size, len(delays))
+        self.total_queue_delay += sum(delays)
+        self.max_queue_delay = max(self.max_queue_delay, max(delays))
+        self.batch_sizes[len(delays)] += 1
+
+    def merge(self, other: "BatchMetrics") -> None:
+        self.batches += other.batches
+        self.items += other.items
+        self.max_batch_size = max(self.max_batch_size, other.max_batch_size)
+        self.total_queue_delay += other.total_queue_delay
+        self.max_queue_delay = max(self.max_queue_delay, other.max_queue_delay)
+        self.batch_sizes.update(other.batch_sizes)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """汇总为便于输出的字典，延迟单位为毫秒"""
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "avg_batch_size": self.items / self.batches if self.batches else 0.0,
+            "max_batch_size": self.max_batch_size,
+            "avg_queue_delay_ms": self.total_queue_delay / self.items * 1000 if self.items else 0.0,
+            "max_queue_delay_ms": self.max_queue_delay * 1000,
+            "batch_sizes": dict(sorted(self.batch_sizes.items())),
+        }
+
+class MicroBatcher:
+    """
+    微批合并器：把一个时间窗口内并发提交的请求合并为一次批量调用，再把结果分发回各调用方
+    flush 接收请求列表，返回等长的结果列表；结果为异常对象时只让对应的调用方失败
+    """
+
+    def __init__(
+        self,
+        flush: Callable[[List[Any]], Awaitable[List[Any]]],
+        max_batch_size: int = DEFAULT_MAX_BATCH_SIZE,
+        max_wait: float = DEFAULT_MAX_WAIT,
+    ):
+        self.flush = flush
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.metrics = BatchMetrics()
+        # (请求, 结果 future, 提交时间)
+        self._pending: List[Tuple[Any, asyncio.Future, float]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def submit(self, item: Any) -> Any:
+        """
+        提交一个请求并等待其结果
+        Args:
+            item: 请求
+        Returns:
+            Any: 批量调用中对应位置的结果
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((item, future, loop.time()))
+        if len(self._pending) >= self.max_batch_size:
+            self._flush_pending()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush_pending)
+        return await future
+
+    def _flush_pending(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, []
+        now = asyncio.get_running_loop().time()
+        self.metrics.record([now - submitted for _, _, submitted in batch])
+        task = asyncio.ensure_future(self._run_batch(batch))
+        # 持有任务引用，防止批量调用进行中被回收
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run_batch(self, batch: List[Tuple[Any, asyncio.Future, float]]) -> None:
+        try:
+            results = await self.flush([item for item, _, _ in batch])
+        except Exception as e:
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future, _), result in zip(batch, results):
+            if future.done():
+                continue
+            if isinstance(result, BaseException):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+async def abatch_chat(model: BaseChatModel, prompts: List[Any], **kwargs) -> List[Any]:
+    """
+    批量调用chat模型，单条失败以异常对象返回；不支持异步的客户端回退到有界线程池
+    Args:
+        model: chat模型
+        prompts: 提示词列表
+    Returns:
+        List[Any]: 与输入等长的消息或异常列表
+    """
+    if supports_native_async(model):
+        return await model.abatch(prompts, return_exceptions=True, **kwargs)
+    return await run_sync(model.batch, prompts, return_exceptions=True, **kwargs)
+
+class ChatBatcher:
+    """按模型客户端分组的chat调用合并器，同一批次运行中的所有工作流实例共享"""
+
+    def __init__(self, max_batch_size: int = DEFAULT_MAX_BATCH_SIZE, max_wait: float = DEFAULT_MAX_WAIT):
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self._batchers: Dict[int, MicroBatcher] = {}
+
+    async def invoke(self, model: BaseChatModel, prompt: Any) -> Any:
+        """
+        提交一次chat调用，与同一窗口内其他调用合并为一次 abatch
+        Args:
+            model: chat模型
+            prompt: 提示词或消息列表
+        Returns:
+            模型返回的消息
+        """
+        batcher = self._batchers.get(id(model))
+        if batcher is None:
+            async def flush(prompts: List[Any]) -> List[Any]:
+                return await abatch_chat(model, prompts)
+            batcher = MicroBatcher(flush, self.max_batch_size, self.max_wait)
+            self._batchers[id(model)] = batcher
+        return await batcher.submit(prompt)
+
+    def stats(self) -> Dict[str, Any]:
+        """所有模型合并器的批大小和排队延迟指标"""
+        metrics = BatchMetrics()
+        for batcher in self._batchers.values():
+            metrics.merge(batcher.metrics)
+        return metrics.snapshot()
+
+class CoalescingEmbeddings(Embeddings):
+    """
+    查询向量合并器：把同一时间窗口内并发的 aembed_query 调用合并为一次 aembed_documents 请求，
+    再把向量分发回各调用方；窗口内重复的文本只请求一次。
+    合并器按事件循环分别创建，同步方法和 aembed_documents 直接转发给实际模型。
+    """
+
+    def __init__(
+        self,
+        model: Embeddings,
+        max_batch_size: int = DEFAULT_MAX_BATCH_SIZE,
+        max_wait: float = DEFAULT_MAX_WAIT,
+    ):
+        """
+        Args:
+            model: 实际的 embedding 模型
+            max_batch_size: 每批最多合并的查询数
+            max_wait: 攒批窗口（秒）
+        """
+        self.model = model
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self._batchers: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, MicroBatcher]" = weakref.WeakKeyDictionary()
+        # 已结束的事件循环上的指标
+        self._retired = BatchMetrics()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.model.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.model.embed_query(text)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return await aembed_documents(self.model, texts)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        """提交一个查询，与同一窗口内的其他查询合并请求"""
+        loop = asyncio.get_running_loop()
+        batcher = self._batchers.get(loop)
+        if batcher is None:
+            batcher = self._batchers[loop] = MicroBatcher(self._flush, self.max_batch_size, self.max_wait)
+            weakref.finalize(loop, self._retired.merge, batcher.metrics)
+        return await batcher.submit(text)
+
+    async def _flush(self, texts: List[str]) -> List[List[float]]:
+        unique = list(dict.fromkeys(texts))
+        vectors = dict(zip(unique, await aembed_documents(self.model, unique)))
+        return [vectors[text] for text in texts]
+
+    def stats(self) -> Dict[str, Any]:
+        """批大小和排队延迟指标"""
+        metrics = BatchMetrics()
+        metrics.merge(self._retired)
+        for batcher in list(self._batchers.values()):
+            metrics.merge(batcher.metrics)
+        return metrics.snapshot()
@@ -0,0 +1,89 @@
+import functools
+from typing import Any, Dict, NamedTuple, Optional
+
+from langchain_core.language_models import BaseChatModel
+from langchain_openai import ChatOpenAI
+
+from .http_pool import PoolConfig, get_async_http_client, get_http_client, origin_of
+
+class ModelEndpoint(NamedTuple):
+    """chat模型接口：地址、密钥和模型名"""
+    base_url: str
+    api_key: str
+    model: str
+
+class GenerationParams(NamedTuple):
+    """生成参数，为None时使用服务端默认值"""
+    temperature: Optional[float] = None
+    top_p: Optional[float] = None
+    max_tokens: Optional[int] = None
+
+class LLMConfig(NamedTuple):
+    """LLM节点在编译期从 llmParam 解析出的模型配置"""
+    model_type: Optional[str] = None      # modelType，用于在 CHAT_MODEL_MAP 中查找接口
+    model_name: Optional[str] = None      # modleName，modelType 未配置映射时按名称查找
+    params: GenerationParams = GenerationParams()
+
+def _optional_number(settings: Dict[str, Any], name: str, convert, owner_id: str) -> Any:
+    value = settings.get(name)
+    if value is None or value == "":
+        return None
+    try:
+        return convert(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"LLM节点 {owner_id} 的参数 {name} 不是数字: {value!r}") from None
+
+def compile_llm_config(settings: Dict[str, Any], owner_id: str) -> LLMConfig:
+    """
+    把 llmParam 中的字面量配置编译为模型配置
+    Args:
+        settings: llmParam 中的字面量配置，按名称索引
+        owner_id: LLM节点ID（用于报错信息）
+    Returns:
+        LLMConfig: 模型配置
+    """
+    max_tokens = _optional_number(settings, "maxTokens", int, owner_id)
+    model_type = settings.get("modelType")
+    return LLMConfig(
+        model_type=str(model_type) if model_type not in (None, "") else None,
+        model_name=settings.get("modleName") or None,
+        params=GenerationParams(
+            temperature=_optional_number(settings, "temperature", float, owner_id),
+            top_p=_optional_number(settings, "topP", float, owner_id),
+            max_tokens=max_tokens if max_tokens and max_tokens > 0 else None,
+        ),
+    )
+
+@functools.lru_cache(maxsize=None)
+def get_chat_client(endpoint: ModelEndpoint, pool: PoolConfig = PoolConfig()) -> BaseChatModel:
+    """
+    获取进程级共享的chat客户端，同一接口只创建一次；HTTP请求走按源共享的长连接池
+    Args:
+        endpoint: 模型接口
+        pool: 连接池配置
+    Returns:
+        BaseChatModel: chat模型
+    """
+    origin = origin_of(endpoint.base_url)
+    return ChatOpenAI(
+        api_key=endpoint.api_key,
+        base_url=endpoint.base_url,
+        model=endpoint.model,
+        http_client=get_http_client(origin, pool),
+        http_async_client=get_async_http_client(origin, pool),
+    )
+
+@functools.lru_cache(maxsize=None)
+def get_bound_chat_model(endpoint: ModelEndpoint, params: GenerationParams, pool: PoolConfig = PoolConfig()) -> BaseChatModel:
+    """
+    获取绑定了生成参数的chat模型：在共享客户端上浅拷贝出参数不同的实例，HTTP客户端不重新创建
+    Args:
+        endpoint: 模型接口
+        params: 生成参数
+        pool: 连接池配置
+    Returns:
+        BaseChatModel: chat模型
+    """
+    client = get_chat_client(endpoint, pool)
+    update = {name: value for name, value in params._asdict().items() if value is not None}
+    return client.model_copy(update=update) if update else client
@@ -0,0 +1,126 @@
+import asyncio
+import threading
+import weakref
+from typing import Any, Dict, NamedTuple, Tuple
+from urllib.parse import urlsplit
+
+import httpx
+
+# 与 openai 客户端默认值一致：单次请求最长 10 分钟，建连 5 秒；实际超时由模型客户端按请求传入
+DEFAULT_TIMEOUT = httpx.Timeout(600.0, connect=5.0)
+
+class PoolConfig(NamedTuple):
+    """HTTP连接池配置"""
+    max_connections: int = 100          # 每个主机的最大连接数
+    max_keepalive_connections: int = 20 # 每个主机保持的空闲长连接数
+    keepalive_expiry: float = 30.0      # 空闲长连接的保留时间（秒）
+    http2: bool = False                 # 是否启用 HTTP/2（需要安装 h2）
+
+def origin_of(url: str) -> str:
+    """
+    取URL的源（协议、主机和端口），同一个源上的模型客户端共享连接池
+    Args:
+        url: 接口地址
+    Returns:
+        str: 形如 https://host:443 的源
+    """
+    parts = urlsplit(url)
+    port = parts.port or (443 if parts.scheme == "https" else 80)
+    return f"{parts.scheme}://{parts.hostname}:{port}"
+
+def _client_options(config: PoolConfig) -> Dict[str, Any]:
+    return {
+        "limits": httpx.Limits(
+            max_connections=config.max_connections,
+            max_keepalive_connections=config.max_keepalive_connections,
+            keepalive_expiry=config.keepalive_expiry,
+        ),
+        "http2": config.http2,
+        "timeout": DEFAULT_TIMEOUT,
+        "follow_redirects": True,
+    }
+
+class LoopLocalAsyncClient(httpx.AsyncClient):
+    """
+    按事件循环分配连接池的异步HTTP客户端
+    对模型客户端而言是一个进程级共享的客户端；请求转发给当前事件循环专属的内部客户端，
+    连接只在创建它的事件循环上复用，事件循环结束（被回收）后其连接池随之释放
+    """
+
+    def __init__(self, config: PoolConfig):
+        """
+        Args:
+            config: 连接池配置，每个事件循环上的内部客户端都按它创建
+        """
+        super().__init__(**_client_options(config))
+        self.config = config
+        self._loop_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = weakref.WeakKeyDictionary()
+        self._loop_lock = threading.Lock()
+
+    def for_loop(self) -> httpx.AsyncClient:
+        """当前事件循环专属的内部客户端，首次使用时创建"""
+        loop = asyncio.get_running_loop()
+        client = self._loop_clients.get(loop)
+        if client is None:
+            with self._loop_lock:
+                client = self._loop_clients.get(loop)
+                if client is None:
+                    client = self._loop_clients[loop] = httpx.AsyncClient(**_client_options(self.config))
+        return client
+
+    async def send(self, request: httpx.Request, **kwargs) -> httpx.Response:
+        return await self.for_loop().send(request, **kwargs)
+
+    async def aclose(self) -> None:
+        """关闭当前事件循环上的连接池，其他事件循环上的连接池不受影响"""
+        client = self._loop_clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.aclose()
+
+_async_clients: Dict[Tuple[str, PoolConfig], LoopLocalAsyncClient] = {}
+_sync_clients: Dict[Tuple[str, PoolConfig], httpx.Client] = {}
+_clients_lock = threading.Lock()
+
+def get_async_http_client(origin: str, config: PoolConfig = PoolConfig()) -> httpx.AsyncClient:
+    """
+    获取进程级共享的异步HTTP客户端：每个源一个，连接保持长连接，
+    所有访问该源的模型客户端复用同一批TCP/TLS连接（按事件循环隔离，见 LoopLocalAsyncClient）
+    Args:
+        origin: 源，见 origin_of
+        config: 连接池配置
+    Returns:
+        httpx.AsyncClient: 异步HTTP客户端
+    """
+    key = (origin, config)
+    client = _async_clients.get(key)
+    if client is None:
+        with _clients_lock:
+            client = _async_clients.get(key)
+            if client is None:
+                client = _async_clients[key] = LoopLocalAsyncClient(config)
+    return client
+
+def get_http_client(origin: str, config: PoolConfig = PoolConfig()) -> httpx.Client:
+    """
+    获取进程级共享的同步HTTP客户端（同步调用和线程池回退使用）
+    Args:
+        origin: 源，见 origin_of
+        config: 连接池配置
+    Returns:
+        httpx.Client: 同步HTTP客户端
+    """
+    key = (origin, config)
+    client = _sync_clients.get(key)
+    if client is None:
+        with _clients_lock:
+            client = _sync_clients.get(key)
+            if client is None:
+                client = _sync_clients[key] = httpx.Client(**_client_options(config))
+    return client
+
+async def aclose_http_clients() -> None:
+    """关闭当前事件循环上的所有异步连接池（事件循环结束前调用），之后在该事件循环上请求时重新建立连接"""
+    with _clients_lock:
+        clients = list(_async_clients.values())
+    for client in clients:
+        await client.aclose()
@@ -1,34 +1,124 @@
-from typing import Optional
+import threading
+from typing import Dict, Optional
 from langchain_core.language_models import BaseChatModel
 from langchain_core.embeddings import Embeddings
-from langchain_openai import ChatOpenAI
 from langchain_openai import OpenAIEmbeddings
-from ..config.settings import Settings
+from ..cache.embedding_cache import CachedEmbeddings
+from ..config.settings import Settings, get_settings, reload_settings
+from .batching import CoalescingEmbeddings
+from .chat_models import LLMConfig, ModelEndpoint, get_bound_chat_model, get_chat_client
+from .http_pool import PoolConfig, get_async_http_client, get_http_client, origin_of
 
 class ModelFactory:
-    def __init__(self):
-        self.settings = Settings()
+    def __init__(self, settings: Optional[Settings] = None):
+        """
+        Args:
+            settings: 配置，默认使用进程级共享的配置
+        """
+        self.settings = settings or get_settings()
         self._chat_model: Optional[BaseChatModel] = None
         self._embedding_model: Optional[Embeddings] = None
+        self._node_models: Dict[LLMConfig, BaseChatModel] = {}
+        self.pool_config = PoolConfig(
+            max_connections=self.settings.HTTP_MAX_CONNECTIONS_PER_HOST,
+            max_keepalive_connections=self.settings.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=self.settings.HTTP_KEEPALIVE_EXPIRY,
+            http2=self.settings.HTTP2,
+        )
     
     @property
     def chat_model(self) -> BaseChatModel:
         """获取chat模型实例（单例模式）"""
         if self._chat_model is None:
-            self._chat_model = ChatOpenAI(
-                api_key=self.settings.CHAT_API_KEY,
-                base_url=self.settings.CHAT_BASE_URL,
-                model=self.settings.CHAT_MODEL,
-            )
+            self._chat_model = get_chat_client(self.endpoint_for(LLMConfig()), self.pool_config)
         return self._chat_model
+
+    def endpoint_for(self, config: LLMConfig) -> ModelEndpoint:
+        """
+        按 modelType、modleName 的顺序在 CHAT_MODEL_MAP 中查找节点使用的模型接口，未配置的字段使用默认chat模型配置
+        Args:
+            config: 节点的模型配置
+        Returns:
+            ModelEndpoint: 模型接口
+        """
+        model_map = self.settings.CHAT_MODEL_MAP
+        entry = model_map.get(config.model_type) or model_map.get(config.model_name) or {}
+        return ModelEndpoint(
+            base_url=entry.get("base_url", self.settings.CHAT_BASE_URL),
+            api_key=entry.get("api_key", self.settings.CHAT_API_KEY),
+            model=entry.get("model", self.settings.CHAT_MODEL),
+        )
+
+    def chat_model_for(self, config: LLMConfig) -> BaseChatModel:
+        """
+        获取LLM节点使用的chat模型：按 (接口, 模型) 共享客户端，生成参数只绑定一次
+        Args:
+            config: 节点的模型配置
+        Returns:
+            BaseChatModel: chat模型
+        """
+        model = self._node_models.get(config)
+        if model is None:
+            model = self._node_models[config] = get_bound_chat_model(self.endpoint_for(config), config.params, self.pool_config)
+        return model
     
     @property
     def embedding_model(self) -> Embeddings:
-        """获取embedding模型实例（单例模式）"""
+        """
+        获取embedding模型实例（单例模式）
+        外层为按 (模型名, 文本哈希) 的向量缓存，缓存未命中的并发查询再经合并器合并为批量请求
+        """
         if self._embedding_model is None:
-            self._embedding_model = OpenAIEmbeddings(
+            origin = origin_of(self.settings.EMBEDDING_BASE_URL)
+            model = OpenAIEmbeddings(
                 api_key=self.settings.EMBEDDING_API_KEY,
                 base_url=self.settings.EMBEDDING_BASE_URL,
                 model=self.settings.EMBEDDING_MODEL,
+                http_client=get_http_client(origin, self.pool_config),
+                http_async_client=get_async_http_client(origin, self.pool_config),
+            )
+            coalescer = CoalescingEmbeddings(
+                model,
+                max_batch_size=self.settings.EMBEDDING_COALESCE_MAX_BATCH,
+                max_wait=self.settings.EMBEDDING_COALESCE_WAIT,
             )
-        return self._embedding_model 
\ No newline at end of file
+            self._embedding_model = CachedEmbeddings(
+                coalescer,
+                model_name=self.settings.EMBEDDING_MODEL,
+                max_entries=self.settings.EMBEDDING_CACHE_SIZE,
+                disk_path=self.settings.EMBEDDING_CACHE_PATH or None,
+                batch_size=self.settings.EMBEDDING_BATCH_SIZE,
+            )
+        return self._embedding_model
+
+_factory: Optional[ModelFactory] = None
+_factory_lock = threading.Lock()
+
+def get_model_factory() -> ModelFactory:
+    """
+    获取进程级共享的模型工厂，首次调用时创建；模型客户端在所有执行器和工作流之间复用
+    Returns:
+        ModelFactory: 模型工厂
+    """
+    global _factory
+    factory = _factory
+    if factory is None:
+        with _factory_lock:
+            if _factory is None:
+                _factory = ModelFactory()
+            factory = _factory
+    return factory
+
+def reload_model_factory(reload_config: bool = True) -> ModelFactory:
+    """
+    重建进程级模型工厂，之后创建的执行器使用新的模型配置；已创建的执行器继续持有旧工厂
+    Args:
+        reload_config: 是否同时重新读取配置
+    Returns:
+        ModelFactory: 新的模型工厂
+    """
+    global _factory
+    with _factory_lock:
+        settings = reload_settings() if reload_config else get_settings()
+        _factory = ModelFactory(settings)
+        return _factory
@@ -0,0 +1,133 @@
+"""测试用的假模型、假工厂和工作流构造工具"""
+import asyncio
+import hashlib
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+from src.graphs.workflow_executor import WorkflowExecutor
+from src.graphs.workflow import WorkflowJson, create_workflow_from_json
+
+class FakeChatModel(BaseChatModel):
+    """
+    按提示词返回预设回复的chat模型：replies 中同一提示词的回复按调用顺序依次取用，
+    没有预设时回复 "echo:" + 提示词；流式调用逐字符产出
+    """
+    replies: Dict[str, List[str]] = {}
+    delay: float = 0.0
+    calls: List[str] = []
+    produced: int = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake"
+
+    def _reply(self, messages) -> str:
+        prompt = messages[-1].content
+        self.calls.append(prompt)
+        queue = self.replies.get(prompt)
+        if queue:
+            return queue.pop(0) if len(queue) > 1 else queue[0]
+        return f"echo:{prompt}"
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(self._reply(messages)))])
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        for char in self._reply(messages):
+            await asyncio.sleep(self.delay)
+            self.produced += 1
+            yield ChatGenerationChunk(message=AIMessageChunk(content=char))
+
+def fake_vector(text: str, dim: int = 8) -> List[float]:
+    """按文本哈希生成的确定性向量"""
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:4], "little")
+    return np.random.default_rng(seed).normal(size=dim).astype(np.float32).tolist()
+
+class FakeEmbeddings(Embeddings):
+    """确定性的假 embedding 模型，记录请求次数"""
+
+    def __init__(self, dim: int = 8):
+        self.dim = dim
+        self.requests = 0
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        self.requests += 1
+        return [fake_vector(text, self.dim) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embed_documents(texts)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return self.embed_query(text)
+
+class FakeModelFactory:
+    """替代 ModelFactory：所有LLM节点使用同一个假模型"""
+
+    def __init__(self, chat_model: BaseChatModel, embedding_model: Optional[Embeddings] = None, kb_dir: str = "data/kb"):
+        self.settings = SimpleNamespace(KB_INDEX_DIR=kb_dir)
+        self.chat_model = chat_model
+        self.embedding_model = embedding_model or FakeEmbeddings()
+
+    def chat_model_for(self, config: Any) -> BaseChatModel:
+        return self.chat_model
+
+def make_executor(workflow: Any, chat_model: Optional[BaseChatModel] = None, embedding_model: Optional[Embeddings] = None, **options) -> WorkflowExecutor:
+    """创建使用假模型的执行器"""
+    factory = FakeModelFactory(chat_model or FakeChatModel(), embedding_model)
+    return WorkflowExecutor(workflow, model_factory=factory, **options)
+
+def ref(block_id: str, name: str) -> Dict[str, Any]:
+    return {"type": "string", "value": {"type": "ref", "content": {"blockID": block_id, "name": name, "source": "block-output"}}}
+
+def literal(value: Any, value_type: str = "string") -> Dict[str, Any]:
+    return {"type": value_type, "value": {"type": "literal", "content": value}}
+
+def _meta(title: str) -> Dict[str, str]:
+    return {"description": "", "icon": "", "subTitle": "", "title": title}
+
+def start_node(node_id: str = "start") -> Dict[str, Any]:
+    return {"id": node_id, "type": "1", "meta": {}, "data": {
+        "nodeMeta": _meta("开始"), "outputs": [{"name": "question", "type": "string", "required": True}]}}
+
+def end_node(source: str, output: str = "output", node_id: str = "end") -> Dict[str, Any]:
+    return {"id": node_id, "type": "2", "meta": {}, "data": {
+        "nodeMeta": _meta("结束"),
+        "inputs": {"inputParameters": [{"name": "output", "input": ref(source, output)}], "terminatePlan": "returnVariables"}}}
+
+def llm_node(node_id: str, inputs: Dict[str, Dict[str, Any]], llm_params: Optional[Dict[str, Dict[str, Any]]] = None) -> Dict[str, Any]:
+    return {"id": node_id, "type": "3", "meta": {}, "data": {
+        "nodeMeta": _meta("大模型"), "outputs": [{"name": "output", "type": "string"}],
+        "inputs": {
+            "inputParameters": [{"name": name, "input": value} for name, value in inputs.items()],
+            "llmParam": [{"name": name, "input": value} for name, value in (llm_params or {}).items()],
+        }}}
+
+def kb_node(node_id: str, query: Dict[str, Any], dataset_params: Optional[Dict[str, Dict[str, Any]]] = None) -> Dict[str, Any]:
+    return {"id": node_id, "type": "4", "meta": {}, "data": {
+        "nodeMeta": _meta("知识库"), "outputs": [{"name": "context", "type": "string"}],
+        "inputs": {
+            "inputParameters": [{"name": "query", "input": query}],
+            "datasetParam": [{"name": name, "input": value} for name, value in (dataset_params or {}).items()],
+        }}}
+
+def condition_node(node_id: str, left: Dict[str, Any], operator: int, right: Dict[str, Any]) -> Dict[str, Any]:
+    return {"id": node_id, "type": "8", "meta": {}, "data": {
+        "nodeMeta": _meta("选择器"),
+        "inputs": {"branches": [{"condition": {"logic": 2, "conditions": [
+            {"left": {"input": left}, "operator": operator, "right": {"input": right}}]}}]}}}
+
+def edge(source: str, target: str, port: str = "") -> Dict[str, str]:
+    return {"sourceNodeID": source, "targetNodeID": target, "sourcePortID": port}
+
+def build_workflow(nodes: List[Dict[str, Any]], edges: List[Dict[str, str]]):
+    """由节点和边的JSON构造工作流"""
+    return create_workflow_from_json(WorkflowJson(nodes=nodes, edges=edges, versions={"loop": "v2"}))
@@ -0,0 +1,35 @@
+import asyncio
+
+import pytest
+
+from src import app
+from src.graphs import workflow_executor
+from src.graphs.compiler import CompiledWorkflow
+from tests.fakes import FakeChatModel, FakeModelFactory, build_workflow, edge, end_node, llm_node, ref, start_node
+
+@pytest.fixture
+def factory(monkeypatch):
+    factory = FakeModelFactory(FakeChatModel())
+    monkeypatch.setattr(app, "get_settings", lambda: factory.settings)
+    monkeypatch.setattr(app, "get_model_factory", lambda: factory)
+    return factory
+
+def test_app_compiles_once_and_streams_output(factory, monkeypatch):
+    workflow = build_workflow(
+        [start_node(), llm_node("llm", {"question": ref("start", "question")}), end_node("llm")],
+        [edge("start", "llm"), edge("llm", "end")],
+    )
+    agent = app.AgentApp(workflow)
+    assert isinstance(agent.workflow, CompiledWorkflow)
+    # 运行时直接使用编译结果，不再按内容哈希查找
+    monkeypatch.setattr(workflow_executor, "get_compiled_workflow", pytest.fail)
+
+    async def collect():
+        return "".join([chunk async for chunk in agent.run({"question": "q"})])
+
+    assert asyncio.run(collect()) == "echo:q"
+    assert agent.llm is factory.chat_model
+
+def test_app_loads_workflow_file(factory):
+    agent = app.AgentApp.from_file("template.json")
+    assert agent.workflow.workflow.validate()
@@ -0,0 +1,49 @@
+import asyncio
+import threading
+
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+from src.models.async_support import aembed_documents, aembed_query, ainvoke_chat, supports_native_async
+from tests.fakes import FakeChatModel, FakeEmbeddings
+
+class SyncOnlyChatModel(BaseChatModel):
+    """只有同步实现的chat模型，记录执行线程"""
+    threads: list = []
+
+    @property
+    def _llm_type(self) -> str:
+        return "sync-only"
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        self.threads.append(threading.current_thread().name)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage("sync"))])
+
+class SyncOnlyEmbeddings(Embeddings):
+    def embed_documents(self, texts):
+        return [[float(len(text))] for text in texts]
+
+    def embed_query(self, text):
+        return [float(len(text)), threading.current_thread().name.startswith("model-sync")]
+
+def test_native_async_detection():
+    assert supports_native_async(FakeChatModel())
+    assert supports_native_async(FakeEmbeddings())
+    assert not supports_native_async(SyncOnlyChatModel())
+    assert not supports_native_async(SyncOnlyEmbeddings())
+
+def test_sync_clients_fall_back_to_bounded_pool():
+    model = SyncOnlyChatModel(threads=[])
+    message = asyncio.run(ainvoke_chat(model, "hi"))
+    assert message.content == "sync"
+    assert model.threads[0].startswith("model-sync")
+    assert asyncio.run(aembed_query(SyncOnlyEmbeddings(), "abc")) == [3.0, True]
+    assert asyncio.run(aembed_documents(SyncOnlyEmbeddings(), ["a", "bb"])) == [[1.0], [2.0]]
+
+def test_native_clients_are_awaited_directly():
+    model = FakeChatModel(replies={"hi": ["hello"]})
+    assert asyncio.run(ainvoke_chat(model, "hi")).content == "hello"
+    embeddings = FakeEmbeddings()
+    assert asyncio.run(aembed_query(embeddings, "x")) == embeddings.embed_query("x")
@@ -0,0 +1,56 @@
+import asyncio
+
+import pytest
+
+from src.graphs.compiler import compile_workflow
+from src.models.batching import CoalescingEmbeddings, MicroBatcher
+from tests.fakes import FakeChatModel, FakeEmbeddings, build_workflow, edge, end_node, fake_vector, llm_node, make_executor, ref, start_node
+
+def _llm_workflow():
+    return compile_workflow(build_workflow(
+        [start_node(), llm_node("llm", {"question": ref("start", "question")}), end_node("llm")],
+        [edge("start", "llm"), edge("llm", "end")],
+    ))
+
+def test_run_batch_keeps_input_order():
+    executor = make_executor(_llm_workflow(), FakeChatModel())
+    inputs = [{"question": f"q{i}"} for i in range(10)]
+    outputs = asyncio.run(executor.run_batch(inputs, max_concurrency=3))
+    assert outputs == [f"echo:q{i}" for i in range(10)]
+
+def test_run_batch_return_exceptions():
+    executor = make_executor(_llm_workflow(), FakeChatModel())
+    outputs = asyncio.run(executor.run_batch([{"question": "a"}, {}], return_exceptions=True))
+    assert outputs[0] == "echo:a"
+    assert isinstance(outputs[1], KeyError)
+    with pytest.raises(KeyError):
+        asyncio.run(executor.run_batch([{}]))
+
+def test_micro_batcher_coalesces_and_routes_failures():
+    batches = []
+
+    async def flush(items):
+        batches.append(list(items))
+        return [ValueError(item) if item == "bad" else item.upper() for item in items]
+
+    async def scenario():
+        batcher = MicroBatcher(flush, max_batch_size=8, max_wait=0.01)
+        return await asyncio.gather(*(batcher.submit(item) for item in ["a", "bad", "c"]), return_exceptions=True)
+
+    results = asyncio.run(scenario())
+    assert batches == [["a", "bad", "c"]]
+    assert results[0] == "A" and results[2] == "C"
+    assert isinstance(results[1], ValueError)
+
+def test_concurrent_queries_are_coalesced_into_one_request():
+    model = FakeEmbeddings()
+    embeddings = CoalescingEmbeddings(model, max_batch_size=16, max_wait=0.01)
+
+    async def scenario():
+        return await asyncio.gather(*(embeddings.aembed_query(text) for text in ["a", "b", "a", "c"]))
+
+    vectors = asyncio.run(scenario())
+    assert model.requests == 1
+    assert vectors[0] == vectors[2] == fake_vector("a")
+    stats = embeddings.stats()
+    assert (stats["batches"], stats["items"], stats["batch_sizes"]) == (1, 4, {4: 1})
@@ -0,0 +1,36 @@
+import asyncio
+
+import pytest
+
+from src.graphs.bindings import Binding, resolve
+from src.graphs.compiler import compile_workflow
+from tests.fakes import FakeChatModel, build_workflow, edge, end_node, literal, llm_node, make_executor, ref, start_node
+
+def _workflow(inputs, llm_params=None):
+    return build_workflow(
+        [start_node(), llm_node("llm", inputs, llm_params), end_node("llm")],
+        [edge("start", "llm"), edge("llm", "end")],
+    )
+
+def test_parameters_compile_to_flat_bindings():
+    compiled = compile_workflow(_workflow(
+        {"question": ref("start", "question"), "count": literal("3", "integer")},
+        {"temperature": literal("0.5", "float"), "stream": literal("yes", "boolean")},
+    ))
+    node = compiled.nodes["llm"]
+    assert node.inputs == (Binding("question", "string", "start", "question"), Binding("count", "integer", None, None, 3))
+    assert [binding.literal for binding in node.llm_params] == [0.5, True]
+    assert node.ref_sources == {"start"}
+    assert resolve(node.inputs[0], {"start": {"question": {"value": "q", "type": "string"}}}) == "q"
+
+def test_bad_references_fail_at_compile_time():
+    with pytest.raises(ValueError, match="不存在的节点"):
+        compile_workflow(_workflow({"question": ref("ghost", "question")}))
+    with pytest.raises(ValueError, match="不存在的输出"):
+        compile_workflow(_workflow({"question": ref("start", "missing")}))
+    with pytest.raises(ValueError, match="无法转换"):
+        compile_workflow(_workflow({"count": literal("many", "integer")}))
+
+def test_typed_literals_are_joined_as_text():
+    executor = make_executor(compile_workflow(_workflow({"question": ref("start", "question"), "n": literal(2, "integer")})), FakeChatModel())
+    assert asyncio.run(executor.run_batch([{"question": "q"}])) == ["echo:q2"]
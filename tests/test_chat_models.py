@@ -0,0 +1,56 @@
+import asyncio
+
+import pytest
+
+from src.graphs.compiler import compile_workflow
+from src.models.chat_models import GenerationParams, ModelEndpoint, compile_llm_config, get_bound_chat_model, get_chat_client
+from src.models.http_pool import PoolConfig
+from tests.fakes import FakeChatModel, build_workflow, edge, end_node, literal, llm_node, make_executor, ref, start_node
+
+ENDPOINT = ModelEndpoint("http://localhost:1/v1", "key", "model-a")
+
+def llm_workflow(llm_params):
+    nodes = [start_node(), llm_node("llm", {"question": ref("start", "question")}, llm_params), end_node("llm")]
+    return compile_workflow(build_workflow(nodes, [edge("start", "llm"), edge("llm", "end")]))
+
+def test_llm_params_compile_to_config():
+    compiled = llm_workflow({
+        "modelType": literal(7, "integer"),
+        "temperature": literal("0.2"),
+        "maxTokens": literal(0, "integer"),
+        "systemPrompt": literal("be brief"),
+    })
+    config = compiled.nodes["llm"].llm_config
+    assert config.model_type == "7"
+    assert config.params == GenerationParams(temperature=0.2)
+
+def test_invalid_number_fails_at_compile_time():
+    with pytest.raises(ValueError, match="topP"):
+        compile_llm_config({"topP": "high"}, "llm")
+
+def test_bound_models_share_the_client():
+    params = GenerationParams(temperature=0.1, max_tokens=16)
+    bound = get_bound_chat_model(ENDPOINT, params, PoolConfig())
+    client = get_chat_client(ENDPOINT, PoolConfig())
+    assert get_bound_chat_model(ENDPOINT, params, PoolConfig()) is bound
+    assert get_bound_chat_model(ENDPOINT, GenerationParams(), PoolConfig()) is client
+    assert bound.temperature == 0.1 and bound.max_tokens == 16
+    assert bound.root_async_client is client.root_async_client
+
+class RecordingChatModel(FakeChatModel):
+    """记录每次调用的消息类型"""
+    message_types: list = []
+
+    def _reply(self, messages) -> str:
+        self.message_types.append([message.type for message in messages])
+        return super()._reply(messages)
+
+def test_system_prompt_precedes_user_input():
+    model = RecordingChatModel()
+    executor = make_executor(llm_workflow({"systemPrompt": literal("be brief")}), model)
+
+    async def run():
+        return [token async for token in executor.run({"question": "q"})]
+
+    assert "".join(asyncio.run(run())) == "echo:q"
+    assert model.message_types == [["system", "human"]]
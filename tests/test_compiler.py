@@ -0,0 +1,39 @@
+import pytest
+
+from src.graphs.compiler import (
+    clear_compiled_workflow_cache,
+    compile_workflow,
+    get_compiled_workflow,
+    workflow_content_hash,
+)
+from src.graphs.workflow import WorkflowJson
+from tests.fakes import build_workflow, edge, end_node, llm_node, ref, start_node
+
+def _nodes():
+    return [start_node(), llm_node("llm", {"question": ref("start", "question")}), end_node("llm")]
+
+def _edges():
+    return [edge("start", "llm"), edge("llm", "end")]
+
+def test_content_hash_ignores_key_order():
+    reordered = [dict(reversed(list(node.items()))) for node in _nodes()]
+    assert workflow_content_hash(build_workflow(_nodes(), _edges())) == workflow_content_hash(build_workflow(reordered, _edges()))
+    assert workflow_content_hash(build_workflow(_nodes(), _edges())) == workflow_content_hash(
+        WorkflowJson(nodes=_nodes(), edges=_edges(), versions={"loop": "v2"}))
+    assert workflow_content_hash(build_workflow(_nodes(), _edges())) != workflow_content_hash(
+        build_workflow(_nodes(), _edges()[:1]))
+
+def test_same_content_compiles_once():
+    clear_compiled_workflow_cache()
+    first = get_compiled_workflow(build_workflow(_nodes(), _edges()))
+    second = get_compiled_workflow(WorkflowJson(nodes=_nodes(), edges=_edges(), versions={"loop": "v2"}))
+    assert first is second
+    clear_compiled_workflow_cache()
+    assert get_compiled_workflow(build_workflow(_nodes(), _edges())) is not first
+
+def test_invalid_workflows_are_rejected():
+    with pytest.raises(ValueError):
+        compile_workflow(build_workflow([start_node()], []))
+    unknown = dict(llm_node("llm", {}), type="99")
+    with pytest.raises(ValueError):
+        compile_workflow(build_workflow([start_node(), unknown, end_node("llm")], _edges()))
@@ -0,0 +1,72 @@
+import pytest
+
+from src.graphs.bindings import Binding
+from src.graphs.compiler import compile_workflow
+from src.graphs.conditions import (
+    LOGIC_AND,
+    LOGIC_OR,
+    OPERATOR_EQUAL,
+    OPERATOR_LENGTH_GT,
+    OPERATOR_LENGTH_LT,
+    CompiledCondition,
+    compile_branch_predicate,
+)
+from tests.fakes import build_workflow, edge, end_node, literal, llm_node, ref, start_node
+
+def _outputs(text):
+    return {"llm": {"output": {"value": text, "type": "string"}}}
+
+def _condition(operator, right):
+    return {"left": {"input": ref("llm", "output")}, "operator": operator, "right": {"input": literal(right)}}
+
+def _router_workflow(branches, ports=("true", "false")):
+    cond = {"id": "cond", "type": "8", "meta": {}, "data": {"nodeMeta": {}, "inputs": {"branches": [
+        {"condition": {"logic": logic, "conditions": conditions}} for logic, conditions in branches]}}}
+    nodes = [start_node(), llm_node("llm", {"question": ref("start", "question")}), cond, end_node("llm")]
+    edges = [edge("start", "llm"), edge("llm", "cond")] + [edge("cond", "end", port) for port in ports]
+    return compile_workflow(build_workflow(nodes, edges))
+
+def test_router_picks_first_matching_branch():
+    compiled = _router_workflow([
+        (LOGIC_AND, [_condition(OPERATOR_EQUAL, "stop")]),
+        (LOGIC_OR, [_condition(OPERATOR_LENGTH_GT, "10"), _condition(OPERATOR_EQUAL, "go")]),
+    ])
+    route = compiled.nodes["cond"].route
+    assert route(_outputs("stop")) == "true"
+    assert route(_outputs("go")) == "true_1"
+    assert route(_outputs("a long enough answer")) == "true_1"
+    assert route(_outputs("nope")) == "false"
+
+def test_and_logic_short_circuits():
+    seen = []
+    left = Binding("x", "string", "llm", "output")
+    conditions = (
+        CompiledCondition(left, OPERATOR_LENGTH_LT, Binding("n", "string", None, None, "3")),
+        CompiledCondition(left, OPERATOR_EQUAL, Binding("y", "string", None, None, "ab")),
+    )
+    predicate = compile_branch_predicate(conditions, LOGIC_AND, "cond")
+
+    class Outputs(dict):
+        def __getitem__(self, key):
+            seen.append(key)
+            return super().__getitem__(key)
+
+    assert not predicate(Outputs(_outputs("abcdef")))
+    assert seen == ["llm"]
+    assert predicate(_outputs("ab"))
+
+def test_invalid_conditions_fail_at_compile_time():
+    with pytest.raises(ValueError, match="不是整数"):
+        _router_workflow([(LOGIC_AND, [_condition(OPERATOR_LENGTH_GT, "many")])])
+    with pytest.raises(ValueError, match="不支持的操作符"):
+        _router_workflow([(LOGIC_AND, [_condition(99, "x")])])
+
+def test_unknown_ports_fail_at_compile_time():
+    branches = [(LOGIC_AND, [_condition(OPERATOR_EQUAL, "stop")]), (LOGIC_AND, [_condition(OPERATOR_EQUAL, "go")])]
+    _router_workflow(branches, ("true", "true_1", "false"))
+    for port in ("true_2", "True", "else"):
+        with pytest.raises(ValueError, match=f"cond.*{port}"):
+            _router_workflow(branches, ("true", port))
+    # 没有配置分支的条件节点只有 true 和 false 端口
+    with pytest.raises(ValueError, match="true_1"):
+        _router_workflow([], ("true_1",))
@@ -0,0 +1,34 @@
+import asyncio
+
+import numpy as np
+
+from src.cache.embedding_cache import CachedEmbeddings
+from tests.fakes import FakeEmbeddings
+
+def test_embedding_cache_requests_only_misses(tmp_path):
+    model = FakeEmbeddings()
+    cache = CachedEmbeddings(model, "fake", disk_path=str(tmp_path / "embeddings.sqlite"), batch_size=2)
+    first = cache.embed_documents(["a", "b", "c"])
+    assert model.requests == 2
+    assert cache.embed_documents(["c", "a"]) == [first[2], first[0]]
+    assert model.requests == 2
+    assert np.allclose(cache.embed_query("b"), first[1])
+    assert cache.stats()["hits"] == 3
+    cache.close()
+
+    # 磁盘层在新实例中命中；换模型名后不复用
+    reopened = CachedEmbeddings(model, "fake", disk_path=str(tmp_path / "embeddings.sqlite"))
+    assert np.allclose(asyncio.run(reopened.aembed_query("a")), first[0])
+    assert model.requests == 2
+    other = CachedEmbeddings(model, "other-model", disk_path=str(tmp_path / "embeddings.sqlite"))
+    other.embed_query("a")
+    assert model.requests == 3
+    reopened.close()
+    other.close()
+
+def test_memory_only_cache_deduplicates_input():
+    model = FakeEmbeddings()
+    cache = CachedEmbeddings(model, "fake")
+    vectors = asyncio.run(cache.aembed_documents(["x", "y", "x"]))
+    assert model.requests == 1
+    assert vectors[0] == vectors[2]
@@ -0,0 +1,71 @@
+import asyncio
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from src.models.chat_models import ModelEndpoint, get_chat_client
+from src.models.http_pool import PoolConfig, aclose_http_clients, get_async_http_client, origin_of
+
+class _ChatHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    connections = set()
+
+    def do_POST(self):
+        self.connections.add(self.client_address)
+        self.rfile.read(int(self.headers["Content-Length"]))
+        body = json.dumps({
+            "id": "1", "object": "chat.completion", "created": 0, "model": "m",
+            "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": "pong"}}],
+        }).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def chat_server():
+    _ChatHandler.connections = set()
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _ChatHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/v1"
+    server.shutdown()
+    server.server_close()
+
+def test_origin_of():
+    assert origin_of("https://api.example.com/v1") == "https://api.example.com:443"
+    assert origin_of("http://localhost:8000/v1") == "http://localhost:8000"
+
+def test_clients_are_shared_per_origin_and_config():
+    config = PoolConfig(max_connections=7)
+    assert get_async_http_client("http://a:1", config) is get_async_http_client("http://a:1", config)
+    assert get_async_http_client("http://a:1", config) is not get_async_http_client("http://b:1", config)
+
+def test_shared_client_survives_new_event_loops_and_keeps_connections_alive(chat_server):
+    model = get_chat_client(ModelEndpoint(chat_server, "key", "m"), PoolConfig(max_connections=4))
+
+    async def ask_three_times():
+        return [(await model.ainvoke("ping")).content for _ in range(3)]
+
+    # 每次 asyncio.run 都是新的事件循环：不能复用绑定在已关闭循环上的连接
+    for _ in range(2):
+        assert asyncio.run(ask_three_times()) == ["pong"] * 3
+    # 同一事件循环内的顺序请求复用同一条长连接
+    assert len(_ChatHandler.connections) == 2
+
+def test_aclose_resets_pool_for_current_loop(chat_server):
+    model = get_chat_client(ModelEndpoint(chat_server, "key", "m"), PoolConfig(max_connections=5))
+
+    async def scenario():
+        await model.ainvoke("ping")
+        await aclose_http_clients()
+        return (await model.ainvoke("ping")).content
+
+    assert asyncio.run(scenario()) == "pong"
+    assert len(_ChatHandler.connections) == 2
@@ -0,0 +1,102 @@
+import numpy as np
+import pytest
+
+from src.kb.hybrid import (
+    SEARCH_MODE_HYBRID,
+    SEARCH_MODE_LEXICAL,
+    SEARCH_MODE_VECTOR,
+    merge_hits,
+    reciprocal_rank_fusion,
+    retrieve,
+)
+from src.kb.lexical import build_lexical, tokenize
+from src.kb.vector_store import SearchHit, VectorStore
+
+TEXTS = [
+    "订单退款流程 refund-policy",
+    "发票开具说明",
+    "物流配送时效",
+    "退款到账时间说明",
+    "会员积分规则",
+    "账号注销流程",
+]
+
+def make_store(dim: int = 8) -> VectorStore:
+    embeddings = np.random.default_rng(0).normal(size=(len(TEXTS), dim)).astype(np.float32)
+    return VectorStore(embeddings, TEXTS)
+
+@pytest.fixture
+def kb(tmp_path):
+    store = make_store()
+    lexical = build_lexical(str(tmp_path), TEXTS)
+    yield store, lexical
+    lexical.close()
+
+def test_reciprocal_rank_fusion_rewards_agreement():
+    fused = reciprocal_rank_fusion([[1, 2, 3], [2, 1, 4]], k=60)
+    assert [row for row, _ in fused][:2] in ([1, 2], [2, 1])
+    assert dict(fused)[4] < dict(fused)[1]
+
+def test_tokenize_normalises_codes_and_cjk():
+    assert tokenize("退款流程") == ["退款", "款流", "流程"]
+    assert {"ab1234", "ab", "1234"} <= set(tokenize("AB-1234"))
+    assert "ab1234" in tokenize("ab_1234")
+
+def test_lexical_mode_matches_terms(kb):
+    store, lexical = kb
+    hits = retrieve(store, lexical, "退款", None, top_k=2, mode=SEARCH_MODE_LEXICAL)
+    assert {hit.row for hit in hits} == {0, 3}
+
+def test_lexical_mode_respects_mask(kb):
+    store, lexical = kb
+    mask = np.ones(store.size, dtype=bool)
+    mask[0] = False
+    hits = retrieve(store, lexical, "退款", None, top_k=2, mode=SEARCH_MODE_LEXICAL, mask=mask)
+    assert [hit.row for hit in hits] == [3]
+
+def test_vector_mode_returns_nearest_row(kb):
+    store, lexical = kb
+    hits = retrieve(store, lexical, "", store.embeddings[4], top_k=1, mode=SEARCH_MODE_VECTOR)
+    assert hits[0].row == 4
+    assert hits[0].score == pytest.approx(1.0, abs=1e-5)
+
+def test_hybrid_mode_fuses_both_rankings(kb):
+    store, lexical = kb
+    hits = retrieve(store, lexical, "退款", store.embeddings[3], top_k=3, mode=SEARCH_MODE_HYBRID)
+    # 行 3 同时是向量最近邻和关键词命中，融合后排第一
+    assert hits[0].row == 3
+    assert 0 in {hit.row for hit in hits}
+
+def test_prefilter_scores_only_lexical_candidates(kb):
+    store, lexical = kb
+    hits = retrieve(store, lexical, "退款", store.embeddings[4], top_k=2, prefilter=True)
+    assert {hit.row for hit in hits} == {0, 3}
+
+@pytest.mark.parametrize("mode,prefilter", [
+    (SEARCH_MODE_LEXICAL, False),
+    (SEARCH_MODE_HYBRID, False),
+    (SEARCH_MODE_VECTOR, True),
+])
+def test_lexical_retrieval_without_index_is_rejected(mode, prefilter):
+    store = make_store()
+    with pytest.raises(ValueError, match="倒排索引"):
+        retrieve(store, None, "退款", store.embeddings[0], mode=mode, prefilter=prefilter)
+
+def test_vector_mode_without_index_is_allowed():
+    store = make_store()
+    assert retrieve(store, None, "退款", store.embeddings[2], top_k=1)[0].row == 2
+
+def test_merge_hits_orders_vector_results_by_score():
+    first = [SearchHit(0, 0.9, "a"), SearchHit(1, 0.2, "b")]
+    second = [SearchHit(0, 0.5, "c")]
+    assert [hit.text for hit in merge_hits([first, second], 3)] == ["a", "c", "b"]
+
+def test_merge_hits_fuses_lexical_results_by_rank():
+    # BM25 分数在不同索引间不可比：分数很高的第二名不能排到另一个索引的第一名之前
+    first = [SearchHit(0, 2.0, "a"), SearchHit(1, 1.9, "b")]
+    second = [SearchHit(0, 0.3, "c"), SearchHit(1, 0.1, "d")]
+    merged = merge_hits([first, second], 3, SEARCH_MODE_LEXICAL)
+    assert [hit.text for hit in merged] == ["a", "c", "b"]
+    assert merged[0].score == pytest.approx(1 / 61)
+    # 只有一路结果时原样返回
+    assert merge_hits([first, []], 1, SEARCH_MODE_HYBRID) == first[:1]
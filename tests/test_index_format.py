@@ -0,0 +1,68 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+from src.kb.index_format import FORMAT_VERSION, HEADER_FILE, IndexWriter, MappedIndex, read_header
+from src.kb.vector_store import VectorStore
+
+def write_index(path, dtype="float32", count=16, dim=8, seed=0):
+    vectors = np.random.default_rng(seed).normal(size=(count, dim)).astype(np.float32)
+    with IndexWriter(str(path), dtype=dtype) as writer:
+        writer.append(vectors, [f"text {i}" for i in range(count)])
+    return vectors
+
+def rewrite_header(path, **fields):
+    header_path = os.path.join(str(path), HEADER_FILE)
+    with open(header_path, encoding="utf-8") as f:
+        header = json.load(f)
+    header.update(fields)
+    with open(header_path, "w", encoding="utf-8") as f:
+        json.dump(header, f)
+
+def test_round_trip_is_memory_mapped(tmp_path):
+    vectors = write_index(tmp_path)
+    store = VectorStore.load(str(tmp_path))
+    assert (store.size, store.dim) == (16, 8)
+    assert isinstance(store.embeddings, np.memmap)
+    assert store.texts[3] == "text 3"
+    assert store.search(vectors[5], top_k=1)[0].row == 5
+
+def test_append_commits_rows_on_flush(tmp_path):
+    write_index(tmp_path, count=4)
+    writer = IndexWriter(str(tmp_path))
+    assert writer.append(np.ones((2, 8), dtype=np.float32), ["x", "中文"]) == range(4, 6)
+    # 未 flush 前读者只看到已提交的条目
+    assert MappedIndex(str(tmp_path)).header.count == 4
+    writer.close()
+    index = MappedIndex(str(tmp_path))
+    assert index.header.count == 6
+    assert list(index.texts[4:6]) == ["x", "中文"]
+
+def test_float16_storage(tmp_path):
+    vectors = write_index(tmp_path, dtype="float16")
+    store = VectorStore.load(str(tmp_path))
+    assert store.embeddings.dtype == np.float16
+    assert store.search(vectors[2], top_k=1)[0].row == 2
+
+def test_new_indexes_are_written_with_current_version(tmp_path):
+    write_index(tmp_path, dtype="int8")
+    assert read_header(str(tmp_path))["version"] == FORMAT_VERSION == 2
+
+def test_version_1_float32_index_is_still_readable(tmp_path):
+    write_index(tmp_path)
+    rewrite_header(tmp_path, version=1)
+    assert VectorStore.load(str(tmp_path)).size == 16
+
+def test_version_1_header_with_quantized_storage_is_rejected(tmp_path):
+    write_index(tmp_path, dtype="int8")
+    rewrite_header(tmp_path, version=1)
+    with pytest.raises(ValueError):
+        read_header(str(tmp_path))
+
+def test_unknown_version_is_rejected(tmp_path):
+    write_index(tmp_path)
+    rewrite_header(tmp_path, version=99)
+    with pytest.raises(ValueError):
+        read_header(str(tmp_path))
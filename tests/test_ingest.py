@@ -0,0 +1,56 @@
+import asyncio
+import io
+
+import pytest
+
+from src.kb.ingest import ingest_directory, iter_chunks
+from src.kb.lexical import open_lexical
+from src.kb.metadata import open_metadata
+from src.kb.vector_store import VectorStore
+from tests.fakes import FakeEmbeddings
+
+def test_chunks_respect_size_overlap_and_separators():
+    text = "第一段内容。" * 20 + "\n\n" + "b" * 120
+    chunks = list(iter_chunks(io.StringIO(text), chunk_size=100, overlap=10))
+    assert all(len(chunk) <= 100 for chunk in chunks)
+    # 优先在句末切分
+    assert chunks[0].endswith("。")
+    assert chunks[-1].endswith("b")
+    with pytest.raises(ValueError):
+        list(iter_chunks(io.StringIO(text), chunk_size=100, overlap=50))
+
+def test_ingest_dedupes_and_resumes(tmp_path):
+    docs = tmp_path / "docs"
+    docs.mkdir()
+    (docs / "a.md").write_text("alpha", encoding="utf-8")
+    (docs / "b.txt").write_text("shared", encoding="utf-8")
+    (docs / "c.md").write_text("shared", encoding="utf-8")
+    (docs / "skip.bin").write_text("ignored", encoding="utf-8")
+    (docs / "d.md").write_text("repeated\n\nrepeated", encoding="utf-8")
+    index_path = str(tmp_path / "kb")
+    model = FakeEmbeddings()
+
+    stats = asyncio.run(ingest_directory(str(docs), index_path, model, batch_size=1, chunk_size=10, overlap=0))
+    # 同一文档内的重复块被跳过，不同文档共有的块各自导入
+    assert (stats.files, stats.chunks, stats.duplicates, stats.embedded) == (4, 5, 1, 4)
+    assert sorted(VectorStore.load(index_path).texts) == ["alpha", "repeated", "shared", "shared"]
+    lexical = open_lexical(index_path)
+    assert lexical.size == 4
+    lexical.close()
+
+    # 重新导入时已提交的文本块全部跳过
+    stats = asyncio.run(ingest_directory(str(docs), index_path, model, chunk_size=10, overlap=0))
+    assert (stats.embedded, stats.duplicates) == (0, 5)
+    assert VectorStore.load(index_path).size == 4
+
+def test_shared_chunk_keeps_metadata_of_every_document(tmp_path):
+    docs = tmp_path / "docs"
+    docs.mkdir()
+    for name, tenant in (("a.md", "acme"), ("b.md", "globex")):
+        (docs / name).write_text("shared", encoding="utf-8")
+        (docs / (name + ".meta.json")).write_text(f'{{"tenant": "{tenant}"}}', encoding="utf-8")
+    index_path = str(tmp_path / "kb")
+    asyncio.run(ingest_directory(str(docs), index_path, FakeEmbeddings()))
+    index = open_metadata(index_path)
+    acme, globex = index.value_rows("tenant", "acme").tolist(), index.value_rows("tenant", "globex").tolist()
+    assert len(acme) == len(globex) == 1 and acme != globex
@@ -0,0 +1,49 @@
+import numpy as np
+
+from src.kb.ivf import IVFVectorStore, build_ivf, load_store
+from src.kb.vector_store import VectorStore
+
+def make_store(count: int = 200, dim: int = 16, seed: int = 0) -> VectorStore:
+    embeddings = np.random.default_rng(seed).normal(size=(count, dim)).astype(np.float32)
+    return VectorStore(embeddings, [f"text-{i}" for i in range(count)])
+
+def test_ivf_with_all_lists_probed_matches_exact_search():
+    store = make_store()
+    ivf = IVFVectorStore.build(store, nlist=8)
+    query = store.embeddings[17]
+    assert [hit.row for hit in ivf.search(query, 5, nprobe=8)] == [hit.row for hit in store.search(query, 5)]
+
+def test_head_keeps_ivf_index():
+    ivf = IVFVectorStore.build(make_store(), nlist=8)
+    head = ivf.head(120)
+    assert isinstance(head, IVFVectorStore)
+    assert head.size == 120
+    assert head.nlist == ivf.nlist
+    assert head.centroids is ivf.centroids
+
+def test_head_search_skips_rows_beyond_count():
+    store = make_store()
+    head = IVFVectorStore.build(store, nlist=8).head(120)
+    # 截取范围之外的行即使是最近邻也不返回
+    hits = head.search(store.embeddings[150], 10, nprobe=8)
+    assert hits and all(hit.row < 120 for hit in hits)
+    assert [hit.row for hit in hits] == [hit.row for hit in store.head(120).search(store.embeddings[150], 10)]
+
+def test_head_search_with_mask():
+    store = make_store()
+    head = IVFVectorStore.build(store, nlist=8).head(120)
+    mask = np.zeros(120, dtype=bool)
+    mask[::3] = True
+    hits = head.search(store.embeddings[3], 5, nprobe=2, mask=mask)
+    assert hits[0].row == 3
+    assert all(hit.row < 120 and hit.row % 3 == 0 for hit in hits)
+
+def test_load_store_reopens_saved_ivf(tmp_path):
+    store = make_store()
+    store.save(str(tmp_path))
+    built = build_ivf(str(tmp_path), nlist=8, nprobe=4)
+    loaded = load_store(str(tmp_path))
+    assert isinstance(loaded, IVFVectorStore)
+    assert loaded.nprobe == 4
+    assert np.array_equal(loaded.lists, built.lists)
+    assert loaded.search(store.embeddings[42], 1)[0].row == 42
@@ -0,0 +1,138 @@
+import asyncio
+import logging
+import threading
+
+import numpy as np
+import pytest
+
+from src.cache.node_cache import NodeOutputCache
+from src.graphs.compiler import compile_workflow
+from src.graphs.run_context import RunContext
+from src.kb.registry import KnowledgeBaseRegistry
+from src.kb.segments import KnowledgeBase
+from src.kb.vector_store import SearchHit, VectorStore
+from tests.fakes import (
+    FakeChatModel,
+    FakeEmbeddings,
+    build_workflow,
+    edge,
+    end_node,
+    fake_vector,
+    kb_node,
+    literal,
+    llm_node,
+    make_executor,
+    ref,
+    start_node,
+)
+
+def kb_workflow(dataset_params=None):
+    nodes = [start_node(), kb_node("kb", ref("start", "question"), dataset_params), end_node("kb", "context")]
+    return compile_workflow(build_workflow(nodes, [edge("start", "kb"), edge("kb", "end")]))
+
+class RecordingKB:
+    def __init__(self, hits):
+        self.hits = hits
+        self.threads = []
+        self.options = []
+
+    def retrieve(self, query, vector, top_k, **options):
+        self.threads.append(threading.current_thread())
+        self.options.append(options)
+        return self.hits
+
+class RecordingRegistry:
+    def __init__(self, kbs):
+        self.kbs = kbs
+
+    def get(self, name):
+        return self.kbs[name]
+
+def run(executor, question="q"):
+    return asyncio.run(executor._execute({"question": question}, RunContext()))
+
+def test_retrieval_runs_off_the_event_loop():
+    kb = RecordingKB([SearchHit(0, 0.9, "a"), SearchHit(1, 0.5, "b")])
+    executor = make_executor(kb_workflow(), kb_registry=RecordingRegistry({"default": kb}))
+    assert run(executor)["final_output"] == "a\n\nb"
+    assert kb.threads and kb.threads[0] is not threading.main_thread()
+
+def test_hits_from_several_kbs_are_merged_by_score():
+    registry = RecordingRegistry({
+        "a": RecordingKB([SearchHit(0, 0.2, "low"), SearchHit(1, 0.9, "high")]),
+        "b": RecordingKB([SearchHit(0, 0.5, "mid")]),
+    })
+    compiled = kb_workflow({"datasetList": literal(["a", "b"], "list"), "topK": literal("2", "integer")})
+    executor = make_executor(compiled, kb_registry=registry)
+    assert run(executor)["final_output"] == "high\n\nmid"
+
+def test_missing_kb_degrades_to_empty_context(tmp_path, caplog):
+    executor = make_executor(kb_workflow(), kb_registry=KnowledgeBaseRegistry(str(tmp_path)))
+    with caplog.at_level(logging.WARNING):
+        state = run(executor)
+    assert state["node_outputs"]["kb"]["context"]["value"] == ""
+    assert "default" in caplog.text
+
+def test_saved_store_is_loaded_by_name(tmp_path):
+    texts = ["alpha", "beta", "gamma"]
+    VectorStore(np.asarray(FakeEmbeddings().embed_documents(texts)), texts).save(str(tmp_path / "default"))
+    executor = make_executor(kb_workflow({"topK": literal("1", "integer")}), kb_registry=KnowledgeBaseRegistry(str(tmp_path)))
+    assert run(executor, "beta")["final_output"] == "beta"
+
+@pytest.mark.parametrize("name", ["", "..", "../outside", "a/b", "/etc"])
+def test_registry_rejects_names_outside_root(tmp_path, name):
+    (tmp_path / "outside").mkdir()
+    registry = KnowledgeBaseRegistry(str(tmp_path / "root"))
+    with pytest.raises(ValueError, match="知识库名称"):
+        registry.get(name)
+
+def test_literal_filter_is_compiled_and_passed_to_retrieval():
+    kb = RecordingKB([SearchHit(0, 0.9, "a")])
+    compiled = kb_workflow({"filter": literal('tenant == "acme"')})
+    assert compiled.nodes["kb"].kb_filter is not None
+    run(make_executor(compiled, kb_registry=RecordingRegistry({"default": kb})))
+    assert kb.options[0]["metadata_filter"] is compiled.nodes["kb"].kb_filter
+
+def test_invalid_literal_filter_fails_at_compile_time():
+    with pytest.raises(ValueError, match="过滤表达式"):
+        kb_workflow({"filter": literal("tenant ==")})
+
+def write_kb(root, name, doc_ids, texts, kb=None):
+    kb = kb or KnowledgeBase(str(root / name), auto_compact_segments=0)
+    kb.upsert(doc_ids, texts, np.array([fake_vector(text) for text in texts], dtype=np.float32))
+    return kb
+
+def cached_executor(compiled, root, cache, model=None):
+    return make_executor(compiled, model, node_cache=cache, kb_registry=KnowledgeBaseRegistry(str(root)))
+
+def test_kb_cache_hits_until_knowledge_base_changes(tmp_path):
+    kb = write_kb(tmp_path, "docs", ["d1"], ["first version"])
+    cache = NodeOutputCache()
+    compiled = kb_workflow({"datasetList": literal("docs")})
+    assert run(cached_executor(compiled, tmp_path, cache))["final_output"] == "first version"
+    assert run(cached_executor(compiled, tmp_path, cache))["final_output"] == "first version"
+    assert cache.stats()["hits"] == 1
+
+    write_kb(tmp_path, "docs", ["d1"], ["second version"], kb)
+    kb.close()
+    assert run(cached_executor(compiled, tmp_path, cache))["final_output"] == "second version"
+
+def test_kb_cache_key_includes_ref_bound_dataset(tmp_path):
+    write_kb(tmp_path, "a", ["d1"], ["from a"]).close()
+    write_kb(tmp_path, "b", ["d1"], ["from b"]).close()
+    cache = NodeOutputCache()
+
+    def workflow(temperature):
+        # 上游LLM选择知识库；两个工作流只有LLM参数不同，知识库节点的配置和查询完全相同
+        nodes = [
+            start_node(),
+            llm_node("pick", {"question": ref("start", "question")}, {"temperature": literal(temperature, "float")}),
+            kb_node("kb", ref("start", "question"), {"datasetList": ref("pick", "output")}),
+            end_node("kb", "context"),
+        ]
+        return compile_workflow(build_workflow(nodes, [edge("start", "pick"), edge("pick", "kb"), edge("kb", "end")]))
+
+    first = cached_executor(workflow(0.1), tmp_path, cache, FakeChatModel(replies={"q": ["a"]}))
+    second = cached_executor(workflow(0.2), tmp_path, cache, FakeChatModel(replies={"q": ["b"]}))
+    assert run(first)["final_output"] == "from a"
+    assert run(second)["final_output"] == "from b"
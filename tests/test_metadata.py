@@ -0,0 +1,76 @@
+import os
+
+import numpy as np
+import pytest
+
+from src.kb.metadata import METADATA_FILE, compile_filter, filter_mask, open_metadata, write_metadata
+
+DOCUMENTS = [
+    ([0, 1], {"tenant": "acme", "language": "zh", "date": "2024-01-05", "tags": ["faq", "billing"]}),
+    ([2], {"tenant": "acme", "language": "en", "date": "2024-02-10", "tags": ["faq"]}),
+    ([3, 4], {"tenant": "globex", "language": "zh", "date": "2023-12-31", "tags": None}),
+    ([5], {"tenant": "globex", "language": "中文", "date": "2024-03-01"}),
+    ([6], None),
+]
+
+def rows_of(mask):
+    return np.flatnonzero(mask).tolist()
+
+@pytest.fixture
+def index(tmp_path):
+    # 传入生成器，写入时只遍历一遍
+    write_metadata(str(tmp_path), 7, (group for group in DOCUMENTS))
+    return open_metadata(str(tmp_path))
+
+def test_write_metadata_builds_sorted_postings(index):
+    values, offsets = index.fields["tenant"]
+    assert values == ["acme", "globex"]
+    assert index.rows[offsets[0]:offsets[1]].tolist() == [0, 1, 2]
+    assert index.fields["language"][0] == sorted(["zh", "en", "中文"])
+    assert index.value_rows("tags", "faq").tolist() == [0, 1, 2]
+    assert index.value_rows("tags", "missing").size == 0
+
+def test_write_metadata_merges_duplicate_rows(tmp_path):
+    write_metadata(str(tmp_path), 3, [([0, 1], {"tenant": "acme"}), ([1, 2], {"tenant": "acme"}), ([1], {"tenant": "acme"})])
+    assert open_metadata(str(tmp_path)).value_rows("tenant", "acme").tolist() == [0, 1, 2]
+
+def test_write_metadata_leaves_only_current_files(tmp_path):
+    write_metadata(str(tmp_path), 7, DOCUMENTS)
+    write_metadata(str(tmp_path), 7, DOCUMENTS[:2])
+    files = sorted(os.listdir(tmp_path))
+    assert files == ["metadata-000002.npy", METADATA_FILE]
+    assert open_metadata(str(tmp_path)).value_rows("tenant", "globex").size == 0
+
+def test_write_metadata_without_values(tmp_path):
+    write_metadata(str(tmp_path), 2, [([0, 1], None)])
+    index = open_metadata(str(tmp_path))
+    assert index.fields == {}
+    assert rows_of(filter_mask(index, compile_filter({"tenant": "acme"}), 2)) == []
+
+@pytest.mark.parametrize("expression,expected", [
+    ('tenant == "acme"', [0, 1, 2]),
+    ('tenant == "acme" and language in ["zh", "en"]', [0, 1, 2]),
+    ('language != "zh"', [2, 5, 6]),
+    ('date >= "2024-01-01"', [0, 1, 2, 5]),
+    ('"2024-01-01" <= date < "2024-03-01"', [0, 1, 2]),
+    ('tags == "billing" or tenant == "globex"', [0, 1, 3, 4, 5]),
+    ({"tenant": "globex", "date": {"lt": "2024-01-01"}}, [3, 4]),
+    ('{"language": ["en", "中文"]}', [2, 5]),
+    # 空列表：in 不匹配任何行，not in 匹配全部行
+    ({"language": []}, []),
+    ("language in []", []),
+    ("language not in []", [0, 1, 2, 3, 4, 5, 6]),
+    ({"language": {"not_in": []}}, [0, 1, 2, 3, 4, 5, 6]),
+])
+def test_filter_masks(index, expression, expected):
+    assert rows_of(index.mask(compile_filter(expression))) == expected
+
+def test_filter_mask_excludes_rows_beyond_index(index):
+    mask = filter_mask(index, compile_filter('tenant == "acme"'), 9)
+    assert mask.shape == (9,)
+    assert rows_of(mask) == [0, 1, 2]
+
+@pytest.mark.parametrize("expression", ["tenant", "tenant == other", "tenant in 'acme'", "tenant +"])
+def test_invalid_filters_are_rejected(expression):
+    with pytest.raises(ValueError):
+        compile_filter(expression)
@@ -0,0 +1,61 @@
+import asyncio
+
+from src.cache.node_cache import NodeOutputCache, stable_hash
+from src.graphs.compiler import compile_workflow
+from tests.fakes import FakeChatModel, build_workflow, edge, end_node, llm_node, make_executor, ref, start_node
+
+def test_stable_hash_ignores_key_order():
+    assert stable_hash({"a": 1, "b": [1, 2]}) == stable_hash({"b": [1, 2], "a": 1})
+    assert stable_hash({"a": 1}) != stable_hash({"a": 2})
+
+def test_node_cache_memory_hit_and_lru_eviction():
+    cache = NodeOutputCache(max_entries=2)
+    keys = [cache.make_key(f"n{i}", "cfg", {"x": i}) for i in range(3)]
+    cache.set(keys[0], {"v": 0})
+    cache.set(keys[1], {"v": 1})
+    assert cache.get(keys[0]) == {"v": 0}
+    # keys[0] 刚被访问过，写入第三条时淘汰 keys[1]
+    cache.set(keys[2], {"v": 2})
+    assert cache.get(keys[1]) is None
+    assert cache.get(keys[0]) == {"v": 0}
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["evictions"], stats["size"]) == (2, 1, 1, 2)
+
+def test_node_cache_ttl_expires_entries():
+    cache = NodeOutputCache(ttl=60)
+    cache.set("live", 1)
+    cache.set("expired", 2, ttl=0)
+    assert cache.get("live") == 1
+    assert cache.get("expired") is None
+    assert cache.stats()["expirations"] == 1
+
+def test_node_cache_disk_layer_survives_restart(tmp_path):
+    # 磁盘层所在的目录不存在时自动创建
+    path = str(tmp_path / "cache" / "node_cache.sqlite")
+    cache = NodeOutputCache(disk_path=path)
+    asyncio.run(cache.aset("k", {"output": {"value": "x", "type": "string"}}))
+    cache.close()
+
+    reopened = NodeOutputCache(disk_path=path)
+    assert asyncio.run(reopened.aget("k")) == {"output": {"value": "x", "type": "string"}}
+    assert reopened.stats()["disk_hits"] == 1
+    # 回填内存层后再次读取不访问磁盘
+    assert reopened.get("k") is not None
+    assert reopened.stats()["memory_hits"] == 1
+    reopened.clear()
+    assert reopened.get("k") is None
+    reopened.close()
+
+def test_llm_node_output_is_served_from_cache():
+    nodes = [start_node(), llm_node("llm", {"question": ref("start", "question")}), end_node("llm")]
+    compiled = compile_workflow(build_workflow(nodes, [edge("start", "llm"), edge("llm", "end")]))
+    model = FakeChatModel()
+    executor = make_executor(compiled, model, node_cache=NodeOutputCache())
+
+    async def answer(question):
+        return "".join([token async for token in executor.run({"question": question})])
+
+    assert asyncio.run(answer("q")) == "echo:q"
+    assert asyncio.run(answer("q")) == "echo:q"
+    assert asyncio.run(answer("other")) == "echo:other"
+    assert model.calls == ["q", "other"]
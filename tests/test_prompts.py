@@ -0,0 +1,51 @@
+import pytest
+
+from src.graphs.compiler import compile_workflow
+from src.graphs.prompts import compile_template, render_segments, to_text
+from tests.fakes import build_workflow, edge, end_node, literal, llm_node, ref, start_node
+
+def compile_llm(inputs, llm_params):
+    nodes = [start_node(), llm_node("llm", inputs, llm_params), end_node("llm")]
+    return compile_workflow(build_workflow(nodes, [edge("start", "llm"), edge("llm", "end")])).nodes["llm"]
+
+def outputs(question):
+    return {"start": {"question": {"value": question}}}
+
+def test_literal_inputs_are_merged_into_static_text():
+    node = compile_llm(
+        {"question": ref("start", "question"), "lang": literal("zh")},
+        {"prompt": literal("[{{lang}}] Q: {{ question }}!")},
+    )
+    assert node.prompt.user[0] == "[zh] Q: "
+    assert node.prompt.user[2] == "!"
+    messages, text = node.prompt.render(outputs("why"))
+    assert [message.type for message in messages] == ["human"]
+    assert text == messages[0].content == "[zh] Q: why!"
+
+def test_unknown_variable_fails_at_compile_time():
+    with pytest.raises(ValueError, match="missing"):
+        compile_llm({"question": ref("start", "question")}, {"prompt": literal("{{missing}}")})
+
+def test_static_system_prompt_is_prebuilt():
+    node = compile_llm({"question": ref("start", "question")}, {"systemPrompt": literal("be brief")})
+    messages, text = node.prompt.render(outputs("q"))
+    assert messages[0] is node.prompt.system_message
+    assert [message.content for message in messages] == ["be brief", "q"]
+    assert text == "q"
+
+def test_system_prompt_with_variables_is_part_of_cache_text():
+    node = compile_llm({"question": ref("start", "question")}, {"systemPrompt": literal("answer {{question}}")})
+    messages, text = node.prompt.render(outputs("q"))
+    assert node.prompt.system_message is None
+    assert [message.content for message in messages] == ["answer q", "q"]
+    assert text == "answer q\n\nq"
+
+def test_inputs_are_concatenated_without_prompt():
+    node = compile_llm({"question": ref("start", "question"), "suffix": literal("!")}, None)
+    assert node.prompt.render(outputs("q"))[1] == "q!"
+
+def test_non_string_values_are_serialized():
+    assert to_text({"a": "中"}) == '{"a": "中"}'
+    assert to_text(None) == ""
+    assert to_text(3) == "3"
+    assert render_segments(compile_template("x", (), "llm"), {}) == "x"
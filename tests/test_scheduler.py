@@ -0,0 +1,108 @@
+import asyncio
+import time
+
+from src.graphs.compiler import compile_workflow
+from src.graphs.conditions import OPERATOR_LENGTH_GT, OPERATOR_LENGTH_LT
+from src.graphs.run_context import RunContext
+from tests.fakes import (
+    FakeChatModel,
+    build_workflow,
+    condition_node,
+    edge,
+    end_node,
+    literal,
+    llm_node,
+    make_executor,
+    ref,
+    start_node,
+)
+
+def loop_workflow(operator: int, end_source: str = "llm", downstream: bool = False):
+    """start -> llm -> cond；true 端口离开循环（可选经过下游LLM），false 端口回到 llm"""
+    nodes = [
+        start_node(),
+        llm_node("llm", {"question": ref("start", "question")}),
+        condition_node("cond", ref("llm", "output"), operator, literal("5")),
+    ]
+    edges = [edge("start", "llm"), edge("llm", "cond"), edge("cond", "llm", "false")]
+    if downstream:
+        nodes += [llm_node("after", {"text": ref("llm", "output")}), end_node("after")]
+        edges += [edge("cond", "after", "true"), edge("after", "end")]
+    else:
+        nodes.append(end_node(end_source, "question" if end_source == "start" else "output"))
+        edges.append(edge("cond", "end", "true"))
+    return compile_workflow(build_workflow(nodes, edges))
+
+def run_executor(compiled, replies, delay=0.001):
+    model = FakeChatModel(replies=replies, delay=delay)
+    return make_executor(compiled, model), model
+
+async def collect(executor, question="q"):
+    tokens = []
+    async for token in executor.run({"question": question}):
+        tokens.append(token)
+    return "".join(tokens)
+
+def test_plan_tags_back_and_exit_edges():
+    plan = loop_workflow(OPERATOR_LENGTH_GT).plan
+    edges = {(source, out.target): out for source, outs in plan.out_edges.items() for out in outs}
+    assert edges[("cond", "llm")].is_back
+    assert edges[("cond", "end")].is_exit and not edges[("cond", "end")].is_back
+    assert not edges[("start", "llm")].is_back
+    assert plan.data_deps["end"] == frozenset({"llm"})
+
+def test_compiles_early_decision_for_loop_condition():
+    compiled = loop_workflow(OPERATOR_LENGTH_GT)
+    (decision,) = compiled.early_decisions["llm"]
+    assert decision.condition_id == "cond"
+    assert decision.discard_ports == {"false"}
+    assert decision.final_ports == {"true"}
+    assert decision.route("abc") is None
+    assert decision.route("abcdef") == "true"
+
+def test_loop_end_reads_output_of_final_iteration():
+    executor, model = run_executor(loop_workflow(OPERATOR_LENGTH_GT), {"q": ["hi", "abcdefghijklmnop"]})
+    state = asyncio.run(executor._execute({"question": "q"}, RunContext()))
+    assert state["final_output"] == "abcdefghijklmnop"
+    assert model.calls == ["q", "q"]
+
+def test_loop_downstream_llm_reads_output_of_final_iteration():
+    executor, model = run_executor(loop_workflow(OPERATOR_LENGTH_GT, downstream=True), {"q": ["hi", "abcdefghijklmnop"]})
+    assert asyncio.run(collect(executor)) == "echo:abcdefghijklmnop"
+    assert model.calls == ["q", "q", "abcdefghijklmnop"]
+
+def test_loop_streams_only_final_iteration():
+    executor, model = run_executor(loop_workflow(OPERATOR_LENGTH_GT), {"q": ["hi", "abcdefghijklmnop"]})
+    assert asyncio.run(collect(executor)) == "abcdefghijklmnop"
+    assert model.calls == ["q", "q"]
+
+def test_discard_port_cancels_generation():
+    executor, model = run_executor(loop_workflow(OPERATOR_LENGTH_LT), {"q": ["abcdefghijklmnop", "abc"]})
+    assert asyncio.run(collect(executor)) == "abc"
+    # 第一次生成在长度达到 5 时即被取消
+    assert model.produced == 5 + 3
+
+def test_early_decision_wakes_scheduler_for_independent_successors():
+    # 结束节点不引用LLM输出：条件提前判定后立即结束，不必等生成完成
+    compiled = loop_workflow(OPERATOR_LENGTH_GT, end_source="start")
+    executor, model = run_executor(compiled, {"q": ["x" * 200]}, delay=0.01)
+    started = time.perf_counter()
+    state = asyncio.run(executor._execute({"question": "q"}, RunContext()))
+    assert state["final_output"] == "q"
+    assert time.perf_counter() - started < 1.0
+    assert model.produced < 200
+
+def test_join_node_runs_after_all_parallel_branches():
+    nodes = [
+        start_node(),
+        llm_node("a", {"question": ref("start", "question")}),
+        llm_node("b", {"question": ref("start", "question"), "suffix": literal("!")}),
+        llm_node("join", {"x": ref("a", "output"), "y": ref("b", "output")}),
+        end_node("join"),
+    ]
+    edges = [edge("start", "a"), edge("start", "b"), edge("a", "join"), edge("b", "join"), edge("join", "end")]
+    executor, model = run_executor(compile_workflow(build_workflow(nodes, edges)), {"q": ["A" * 20], "q!": ["B"]})
+    assert asyncio.run(collect(executor)) == "echo:" + "A" * 20 + "B"
+    # 两个分支同时启动，汇合节点在两者都完成后才执行
+    assert sorted(model.calls[:2]) == ["q", "q!"]
+    assert model.calls[2:] == ["A" * 20 + "B"]
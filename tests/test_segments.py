@@ -0,0 +1,161 @@
+import os
+import sqlite3
+
+import numpy as np
+
+from src.kb.hybrid import SEARCH_MODE_HYBRID, SEARCH_MODE_LEXICAL
+from src.kb.index_format import IndexWriter
+from src.kb.ingest import LEDGER_FILE
+from src.kb.ivf import build_ivf
+from src.kb.lexical import build_lexical
+from src.kb.metadata import compile_filter, write_metadata
+from src.kb.segments import ROOT_SEGMENT, KnowledgeBase
+from tests.fakes import fake_vector
+
+DIM = 8
+
+def vectors_for(texts):
+    return np.array([fake_vector(text, DIM) for text in texts], dtype=np.float32)
+
+def texts_of(hits):
+    return sorted(hit.text for hit in hits)
+
+def populated_kb(path, **options):
+    kb = KnowledgeBase(str(path), auto_compact_segments=0, **options)
+    texts = ["退款流程说明", "发票开具说明", "物流配送时效", "会员积分规则"]
+    kb.append(["d1", "d2", "d3", "d4"], texts, vectors_for(texts), [
+        {"tenant": "acme", "lang": "zh"},
+        {"tenant": "acme", "lang": "en"},
+        {"tenant": "globex", "lang": "zh"},
+        {"tenant": "globex", "lang": "zh", "tags": ["vip"]},
+    ])
+    kb.upsert(["d2"], ["发票开具说明（新版）"], vectors_for(["发票开具说明（新版）"]), [{"tenant": "acme", "lang": "zh"}])
+    assert kb.delete(["d3"]) == 1
+    return kb
+
+def check_live_rows(kb):
+    query = vectors_for(["物流配送时效"])[0]
+    assert texts_of(kb.retrieve("", query, top_k=10)) == ["会员积分规则", "发票开具说明（新版）", "退款流程说明"]
+    filtered = kb.retrieve("", query, top_k=10, metadata_filter=compile_filter('tenant == "acme" and lang == "zh"'))
+    assert texts_of(filtered) == ["发票开具说明（新版）", "退款流程说明"]
+    assert texts_of(kb.retrieve("", query, top_k=10, metadata_filter=compile_filter({"tags": "vip"}))) == ["会员积分规则"]
+    assert texts_of(kb.retrieve("发票", None, top_k=10, mode=SEARCH_MODE_LEXICAL)) == ["发票开具说明（新版）"]
+    hybrid = kb.retrieve("退款", vectors_for(["退款流程说明"])[0], top_k=2, mode=SEARCH_MODE_HYBRID)
+    assert hybrid[0].text == "退款流程说明"
+
+def test_tombstoned_rows_are_hidden_before_compaction(tmp_path):
+    kb = populated_kb(tmp_path)
+    assert kb.snapshot.size == 3
+    check_live_rows(kb)
+    kb.close()
+
+def test_compaction_drops_tombstoned_rows(tmp_path):
+    kb = populated_kb(tmp_path, max_delta_rows=2)
+    assert len(kb.snapshot.segments) > 1
+    generation = kb.snapshot.generation
+    target = kb.compact()
+    assert target is not None
+    (segment,) = kb.snapshot.segments
+    assert segment.name == target and segment.store.size == 3 and segment.live is None
+    assert kb.snapshot.generation > generation
+    check_live_rows(kb)
+    # 旧段的目录已删除
+    assert os.listdir(tmp_path / "segments") == [target]
+    kb.close()
+
+    reopened = KnowledgeBase(str(tmp_path), auto_compact_segments=0)
+    check_live_rows(reopened)
+    # 只有一个没有墓碑的段，无需再合并
+    assert reopened.compact() is None
+    reopened.close()
+
+def test_writes_after_compaction_go_to_new_delta_segment(tmp_path):
+    kb = populated_kb(tmp_path)
+    kb.compact()
+    kb.upsert(["d1"], ["退款流程说明（新版）"], vectors_for(["退款流程说明（新版）"]), [{"tenant": "acme", "lang": "zh"}])
+    assert len(kb.snapshot.segments) == 2
+    query = vectors_for(["退款流程说明（新版）"])[0]
+    assert texts_of(kb.retrieve("", query, top_k=10)) == ["会员积分规则", "发票开具说明（新版）", "退款流程说明（新版）"]
+    filtered = kb.retrieve("", query, top_k=10, metadata_filter=compile_filter({"tenant": "acme"}))
+    assert texts_of(filtered) == ["发票开具说明（新版）", "退款流程说明（新版）"]
+    kb.close()
+
+def test_other_handles_see_commits(tmp_path):
+    writer = populated_kb(tmp_path)
+    reader = KnowledgeBase(str(tmp_path), auto_compact_segments=0)
+    assert reader.snapshot.size == 3
+    writer.delete(["d4"])
+    assert reader.refresh_if_changed().size == 2
+    writer.close()
+    reader.close()
+
+def write_root_index(path, doc_ids, texts):
+    """按导入流水线的布局在知识库目录下直接写入索引和导入记录"""
+    with IndexWriter(str(path)) as writer:
+        writer.append(vectors_for(texts), texts)
+    build_lexical(str(path), texts).close()
+    write_metadata(str(path), len(texts), [([row], {"doc": doc_id}) for row, doc_id in enumerate(doc_ids)])
+    build_ivf(str(path), nlist=2)
+    ledger = sqlite3.connect(os.path.join(str(path), LEDGER_FILE))
+    ledger.execute("CREATE TABLE rows (row INTEGER PRIMARY KEY, doc_id TEXT NOT NULL)")
+    ledger.executemany("INSERT INTO rows VALUES (?, ?)", enumerate(doc_ids))
+    ledger.commit()
+    ledger.close()
+
+def test_compacting_root_segment_keeps_ledger_and_user_files(tmp_path):
+    doc_ids = ["a", "b", "c", "d"]
+    texts = ["alpha", "bravo", "charlie", "delta"]
+    write_root_index(tmp_path, doc_ids, texts)
+    (tmp_path / "README.md").write_text("notes", encoding="utf-8")
+    (tmp_path / "sources").mkdir()
+    (tmp_path / "sources" / "doc.txt").write_text("raw", encoding="utf-8")
+
+    kb = KnowledgeBase(str(tmp_path), auto_compact_segments=0)
+    assert kb.delete(["b"]) == 1
+    target = kb.compact()
+    kb.close()
+
+    assert target != ROOT_SEGMENT
+    remaining = set(os.listdir(tmp_path))
+    assert {LEDGER_FILE, "README.md", "sources", "segments"} <= remaining
+    assert (tmp_path / "sources" / "doc.txt").read_text(encoding="utf-8") == "raw"
+    # 根目录段的索引文件全部删除
+    assert not any(name.startswith(("header", "embeddings", "texts", "ivf", "lexical", "metadata")) for name in remaining)
+
+    kb = KnowledgeBase(str(tmp_path), auto_compact_segments=0)
+    hits = kb.retrieve("charlie", vectors_for(["charlie"])[0], top_k=4)
+    kb.close()
+    assert hits[0].text == "charlie"
+    assert sorted(hit.text for hit in hits) == ["alpha", "charlie", "delta"]
+
+def is_closed(lexical):
+    try:
+        lexical._db.execute("SELECT 1")
+    except sqlite3.ProgrammingError:
+        return True
+    return False
+
+def test_refresh_and_close_release_segment_handles(tmp_path):
+    kb = populated_kb(tmp_path, max_delta_rows=2)
+    before = {name: lexical for name, (_, lexical, _) in kb._opened.items()}
+    target = kb.compact()
+    assert set(kb._opened) == {target}
+    # 合并后被移出快照的段的倒排索引已关闭
+    assert before and all(is_closed(lexical) for lexical in before.values())
+    (_, lexical, metadata) = kb._opened[target]
+    kb.close()
+    assert kb._opened == {}
+    assert is_closed(lexical) and metadata.rows.size == 0
+
+def test_lexical_results_are_fused_by_rank_across_segments(tmp_path):
+    kb = KnowledgeBase(str(tmp_path), max_delta_rows=2, auto_compact_segments=0)
+    first = ["退款 退款 退款", "发票开具"]
+    second = ["退款说明与物流说明以及很多其他无关的内容", "会员积分"]
+    kb.append(["d1", "d2"], first, vectors_for(first))
+    kb.append(["d3", "d4"], second, vectors_for(second))
+    assert len(kb.snapshot.segments) == 2
+    hits = kb.retrieve("退款", None, top_k=2, mode=SEARCH_MODE_LEXICAL)
+    # 每段的第一名都进入结果，分数为跨段 RRF 分数
+    assert texts_of(hits) == sorted([first[0], second[0]])
+    assert hits[0].score == hits[1].score
+    kb.close()
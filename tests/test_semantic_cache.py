@@ -0,0 +1,54 @@
+import asyncio
+
+from src.cache.semantic_cache import SemanticCache
+from src.graphs.compiler import compile_workflow
+from tests.fakes import FakeChatModel, FakeEmbeddings, build_workflow, edge, end_node, literal, llm_node, make_executor, ref, start_node
+
+def test_semantic_cache_hits_within_scope_and_evicts_oldest():
+    model = FakeEmbeddings(dim=64)
+    cache = SemanticCache(model, max_entries=2, threshold=0.95)
+
+    async def scenario():
+        lookup = await cache.alookup("node:cfg", "prompt one")
+        assert lookup.completion is None
+        cache.add("node:cfg", lookup.embedding, "answer one")
+        assert (await cache.alookup("node:cfg", "prompt one")).completion == "answer one"
+        # 其他作用域和不相近的提示词不命中
+        assert (await cache.alookup("other:cfg", "prompt one")).completion is None
+        assert (await cache.alookup("node:cfg", "prompt two")).completion is None
+
+        # 相同提示词覆盖旧结果，不新增条目
+        cache.add("node:cfg", lookup.embedding, "answer one v2")
+        assert cache.stats()["size"] == 1
+        for prompt in ("prompt two", "prompt three"):
+            cache.add("node:cfg", (await cache.alookup("node:cfg", prompt)).embedding, prompt.upper())
+        assert cache.stats()["size"] == 2
+        assert (await cache.alookup("node:cfg", "prompt one")).completion is None
+        assert (await cache.alookup("node:cfg", "prompt three")).completion == "PROMPT THREE"
+
+    asyncio.run(scenario())
+    # 同一提示词只计算一次向量
+    assert model.requests == 3
+
+def _answer(executor, question):
+    async def run():
+        return "".join([token async for token in executor.run({"question": question})])
+    return asyncio.run(run())
+
+def test_llm_node_consults_semantic_cache_unless_opted_out():
+    def compiled(llm_params=None):
+        nodes = [start_node(), llm_node("llm", {"question": ref("start", "question")}, llm_params), end_node("llm")]
+        return compile_workflow(build_workflow(nodes, [edge("start", "llm"), edge("llm", "end")]))
+
+    model = FakeChatModel()
+    executor = make_executor(compiled(), model, semantic_cache=SemanticCache(FakeEmbeddings(dim=64)))
+    assert _answer(executor, "q") == "echo:q"
+    assert _answer(executor, "q") == "echo:q"
+    assert model.calls == ["q"]
+
+    model = FakeChatModel()
+    opted_out = compiled({"semanticCache": literal(False, "boolean")})
+    executor = make_executor(opted_out, model, semantic_cache=SemanticCache(FakeEmbeddings(dim=64)))
+    _answer(executor, "q")
+    _answer(executor, "q")
+    assert model.calls == ["q", "q"]
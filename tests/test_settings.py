@@ -0,0 +1,38 @@
+import pytest
+
+from src.config import settings as settings_module
+from src.models import model_factory
+
+REQUIRED = {
+    "CHAT_API_KEY": "key",
+    "CHAT_BASE_URL": "http://localhost:1/v1",
+    "CHAT_MODEL": "chat",
+    "EMBEDDING_API_KEY": "key",
+    "EMBEDDING_BASE_URL": "http://localhost:1/v1",
+    "EMBEDDING_MODEL": "embedding",
+}
+
+@pytest.fixture
+def env(monkeypatch):
+    for name, value in REQUIRED.items():
+        monkeypatch.setenv(name, value)
+    settings_module.get_settings.cache_clear()
+    monkeypatch.setattr(model_factory, "_factory", None)
+    yield monkeypatch
+    settings_module.get_settings.cache_clear()
+
+def test_settings_are_loaded_once(env):
+    first = settings_module.get_settings()
+    env.setenv("CHAT_MODEL", "other")
+    assert settings_module.get_settings() is first
+    reloaded = settings_module.reload_settings()
+    assert reloaded is not first and reloaded.CHAT_MODEL == "other"
+
+def test_model_factory_is_shared_until_reloaded(env):
+    factory = model_factory.get_model_factory()
+    assert model_factory.get_model_factory() is factory
+    assert factory.settings is settings_module.get_settings()
+    env.setenv("CHAT_MODEL", "other")
+    reloaded = model_factory.reload_model_factory()
+    assert reloaded is not factory and model_factory.get_model_factory() is reloaded
+    assert reloaded.settings.CHAT_MODEL == "other"
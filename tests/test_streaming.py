@@ -0,0 +1,42 @@
+import asyncio
+
+from src.graphs.compiler import compile_workflow
+from src.graphs.run_context import TokenStream
+from tests.fakes import FakeChatModel, build_workflow, edge, end_node, llm_node, make_executor, ref, start_node
+
+def _llm_workflow(end_source: str = "llm"):
+    return compile_workflow(build_workflow(
+        [start_node(), llm_node("llm", {"question": ref("start", "question")}), end_node(end_source, "question" if end_source == "start" else "output")],
+        [edge("start", "llm"), edge("llm", "end")],
+    ))
+
+async def _collect(executor, question="q"):
+    return [token async for token in executor.run({"question": question})]
+
+def test_compile_records_stream_source():
+    compiled = _llm_workflow()
+    assert compiled.stream_node_id == "llm"
+    assert not compiled.stream_buffered
+    assert _llm_workflow("start").stream_node_id is None
+
+def test_run_streams_tokens_of_end_source():
+    executor = make_executor(_llm_workflow(), FakeChatModel(replies={"q": ["hello"]}))
+    assert asyncio.run(_collect(executor)) == list("hello")
+
+def test_run_returns_non_llm_output_once():
+    executor = make_executor(_llm_workflow("start"), FakeChatModel())
+    assert asyncio.run(_collect(executor, "plain")) == ["plain"]
+
+def test_buffered_stream_drops_uncommitted_attempts():
+    async def scenario():
+        stream = TokenStream("llm", buffered=True)
+        stream.begin_attempt("llm")
+        stream.push("llm", "retry")
+        stream.push("other", "ignored")
+        stream.begin_attempt("llm")
+        stream.push("llm", "fin")
+        stream.commit()
+        stream.push("llm", "al")
+        stream.close()
+        return [token async for token in stream]
+    assert asyncio.run(scenario()) == ["fin", "al"]
@@ -0,0 +1,84 @@
+import numpy as np
+import pytest
+
+from src.kb.index_format import read_header
+from src.kb.vector_store import VectorStore, normalize_rows
+from tests.fakes import fake_vector
+
+def test_search_returns_top_k_by_cosine():
+    texts = [f"doc {i}" for i in range(20)]
+    store = VectorStore(np.asarray([fake_vector(text) for text in texts]), texts)
+    assert (store.size, store.dim) == (20, 8)
+    hits = store.search(np.asarray(fake_vector("doc 7")), top_k=3)
+    assert hits[0].text == "doc 7" and hits[0].row == 7
+    assert np.isclose(hits[0].score, 1.0)
+    assert [hit.score for hit in hits] == sorted((hit.score for hit in hits), reverse=True)
+    assert all(hit.score >= 0.5 for hit in store.search(np.asarray(fake_vector("doc 7")), top_k=20, min_score=0.5))
+
+def test_save_and_load_round_trip(tmp_path):
+    texts = ["a", "b", "c"]
+    store = VectorStore(np.asarray([fake_vector(text) for text in texts]), texts)
+    store.save(str(tmp_path / "kb"))
+    loaded = VectorStore.load(str(tmp_path / "kb"))
+    query = np.asarray(fake_vector("b"))
+    assert [(hit.row, hit.text) for hit in loaded.search(query, 2)] == [(hit.row, hit.text) for hit in store.search(query, 2)]
+
+DTYPES = ["float32", "float16", "int8"]
+# 各存储类型反量化后与原向量的最大误差（向量已归一化）
+TOLERANCE = {"float32": 1e-6, "float16": 1e-3, "int8": 1e-2}
+
+def make_store(count: int = 300, dim: int = 32, seed: int = 0) -> VectorStore:
+    embeddings = np.random.default_rng(seed).normal(size=(count, dim)).astype(np.float32)
+    return VectorStore(embeddings, [f"块 {i}" for i in range(count)])
+
+@pytest.mark.parametrize("dtype", DTYPES)
+@pytest.mark.parametrize("keep_exact", [False, True])
+def test_save_and_load_round_trip(tmp_path, dtype, keep_exact):
+    store = make_store()
+    store.save(str(tmp_path), dtype=dtype, keep_exact=keep_exact)
+    header = read_header(str(tmp_path))
+    assert header.dtype == dtype
+    assert header.exact == (keep_exact and dtype != "float32")
+
+    loaded = VectorStore.load(str(tmp_path))
+    assert loaded.size == store.size and loaded.dim == store.dim
+    assert loaded.dtype == dtype
+    assert loaded.texts[7] == "块 7"
+    assert (loaded.scales is not None) == (dtype == "int8")
+    assert np.abs(loaded.vectors(slice(None)) - store.embeddings).max() < TOLERANCE[dtype]
+    if keep_exact and dtype != "float32":
+        assert np.allclose(loaded.vectors(np.arange(5)), store.embeddings[:5], atol=1e-6)
+
+@pytest.mark.parametrize("dtype", DTYPES)
+def test_quantized_search_finds_query_row(dtype):
+    store = make_store()
+    quantized = store.quantize(dtype)
+    for row in (0, 123, 299):
+        hit = quantized.search(store.embeddings[row], top_k=1)[0]
+        assert hit.row == row
+        assert hit.score == pytest.approx(1.0, abs=TOLERANCE[dtype] * 10)
+
+def test_quantized_storage_is_smaller():
+    store = make_store()
+    sizes = {dtype: store.quantize(dtype).memory_bytes for dtype in DTYPES}
+    assert sizes["float16"] * 2 == sizes["float32"]
+    assert sizes["int8"] < sizes["float16"]
+
+@pytest.mark.parametrize("dtype", ["float16", "int8"])
+def test_rescore_uses_exact_vectors(tmp_path, dtype):
+    store = make_store()
+    store.save(str(tmp_path), dtype=dtype, keep_exact=True)
+    loaded = VectorStore.load(str(tmp_path))
+    query = normalize_rows(np.random.default_rng(1).normal(size=store.dim).astype(np.float32))
+    expected = store.search(query, top_k=5)
+    rescored = loaded.search(query, top_k=5, rescore=50)
+    assert [hit.row for hit in rescored] == [hit.row for hit in expected]
+    assert [hit.score for hit in rescored] == pytest.approx([hit.score for hit in expected], abs=1e-5)
+
+def test_search_with_mask_and_min_score():
+    store = make_store()
+    mask = np.zeros(store.size, dtype=bool)
+    mask[10:20] = True
+    hits = store.search(store.embeddings[15], top_k=3, mask=mask)
+    assert hits[0].row == 15 and all(10 <= hit.row < 20 for hit in hits)
+    assert [hit.row for hit in store.search(store.embeddings[15], top_k=5, min_score=0.99)] == [15]
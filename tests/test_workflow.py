@@ -0,0 +1,49 @@
+from tests.fakes import build_workflow, condition_node, edge, end_node, kb_node, literal, llm_node, ref, start_node
+
+def _loop_workflow():
+    """start -> kb -> llm -> cond -(false)-> llm，cond -(true)-> end"""
+    return build_workflow(
+        [
+            end_node("llm"),
+            start_node(),
+            kb_node("kb", ref("start", "question")),
+            llm_node("llm", {"context": ref("kb", "context")}),
+            condition_node("cond", ref("llm", "output"), 1, literal("done")),
+        ],
+        [
+            edge("start", "kb"),
+            edge("kb", "llm"),
+            edge("llm", "cond"),
+            edge("cond", "end", "true"),
+            edge("cond", "llm", "false"),
+        ],
+    )
+
+def test_index_and_adjacency():
+    workflow = _loop_workflow()
+    assert workflow.get_node_by_id("kb").type == "4"
+    assert workflow.get_node_by_id("missing") is None
+    assert [node.id for node in workflow.get_next_nodes("cond")] == ["end", "llm"]
+    assert [node.id for node in workflow.get_prev_nodes("llm")] == ["kb", "cond"]
+    assert workflow.get_port_targets("cond", "true") == ["end"]
+    assert workflow.get_port_targets("cond", "false") == ["llm"]
+    assert workflow.get_port_targets("kb", "true") == []
+
+def test_start_end_and_validate():
+    workflow = _loop_workflow()
+    assert workflow.start_node.id == "start"
+    assert workflow.end_node.id == "end"
+    assert workflow.validate()
+    assert not build_workflow([start_node()], []).validate()
+
+def test_topological_order_and_cycles():
+    workflow = _loop_workflow()
+    order = workflow.topological_order
+    assert order.index("start") < order.index("kb") < order.index("llm") < order.index("end")
+    assert workflow.cycle_groups == [["llm", "cond"]]
+    assert workflow.in_cycle("cond") and not workflow.in_cycle("kb")
+
+def test_edges_to_unknown_nodes_are_ignored():
+    workflow = build_workflow([start_node(), end_node("start", "question")], [edge("start", "end"), edge("start", "ghost")])
+    assert workflow.successors["start"] == ["end"]
+    assert workflow.topological_order == ["start", "end"]